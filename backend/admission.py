@@ -0,0 +1,123 @@
+"""Admission control per lane: bounded concurrency, a bounded wait, then 429.
+
+Each lane lets `limit` calculations run at once and up to `queue_limit` more
+wait for a slot, first come first served. A request beyond that, or one that
+waited longer than its `max_wait`, is turned away with Overloaded so the
+client can retry later instead of piling onto a saturated lane. The lanes
+are independent: a queue of expensive calculations never delays a cheap one.
+"""
+import asyncio
+import os
+from collections import deque
+from contextlib import asynccontextmanager
+
+from executor import compute_executor
+from metrics import record
+
+
+# Estimated cost (see cost.py) from which a calculation goes to the slow lane
+SLOW_COST = float(os.environ.get("AREA_SLOW_COST", "100"))
+
+
+class Overloaded(Exception):
+    """Raised when a lane can't take a request now; `retry_after` is a hint in seconds."""
+
+    def __init__(self, lane: str, retry_after: float):
+        super().__init__(f"Too many calculations like this one in progress, retry in {retry_after:g}s")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class Lane:
+    """Slots for one lane of calculations, used from the event loop's thread only."""
+
+    def __init__(self, name: str, limit: int, queue_limit: int, retry_after: float = 1.0):
+        self.name = name
+        self.limit = limit
+        self.queue_limit = queue_limit
+        self.retry_after = retry_after
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        # Futures of the requests waiting for a slot, oldest first
+        self._waiters = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    @asynccontextmanager
+    async def slot(self, max_wait: float = None):
+        """Hold one of the lane's slots for the enclosed block.
+
+        Raises Overloaded right away if the lane and its queue are full, or
+        once `max_wait` seconds pass without a slot coming free.
+        """
+        await self._acquire(max_wait)
+        try:
+            yield
+        finally:
+            self._release()
+
+    async def _acquire(self, max_wait: float):
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.queue_limit:
+            self._reject()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the wait ended; pass it on
+                self._release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self._reject()
+            raise
+        self.admitted += 1
+
+    def _release(self):
+        # A freed slot goes straight to the oldest waiter, so `active` stays
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def _reject(self):
+        self.rejected += 1
+        record("rejected", (self.name,))
+        raise Overloaded(self.name, self.retry_after)
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "queue_limit": self.queue_limit, "active": self.active,
+                "waiting": self.waiting, "admitted": self.admitted, "rejected": self.rejected}
+
+
+def _slow_limit() -> int:
+    # One running calculation per slow lane worker; more would only queue in its pool
+    return compute_executor.slow_workers or max(1, compute_executor.max_workers // 2)
+
+
+lanes = {
+    # Generous: cheap calculations are only turned away under a real flood
+    "fast": Lane("fast", limit=8 * compute_executor.max_workers, queue_limit=256),
+    "slow": Lane("slow", limit=int(os.environ.get("AREA_SLOW_LIMIT", "0")) or _slow_limit(),
+                 queue_limit=int(os.environ.get("AREA_SLOW_QUEUE", "0")) or 4 * _slow_limit(),
+                 retry_after=5.0),
+}
+
+
+def lane_for(cost: float) -> str:
+    return "slow" if cost >= SLOW_COST else "fast"
+
+
+def admission_stats() -> dict:
+    return {name: lane.stats() for name, lane in lanes.items()}
@@ -0,0 +1,91 @@
+import asyncio
+import math
+
+from admission import lane_for, lanes
+from deadlines import ENDPOINT_DEADLINES, STAGE_DEADLINES
+from dispatch import ASSESS_MARGIN
+from executor import compute_executor
+from metrics import record
+from models import BatchItemResult, BatchResponse
+
+
+def plan_chunks(jobs: list, workers: int) -> list:
+    """Split job indices into chunks to run in parallel, one chunk per executor task.
+
+    Jobs are grouped by function string so each expression is parsed and
+    compiled by as few workers as possible. Small groups are packed together
+    and large ones split, so the chunks come out roughly even across workers.
+    """
+    groups = {}
+    for index, job in enumerate(jobs):
+        groups.setdefault(job.function_string, []).append(index)
+
+    chunk_size = max(1, math.ceil(len(jobs) / max(workers, 1)))
+    chunks, current = [], []
+    for indices in groups.values():
+        for index in indices:
+            current.append(index)
+            if len(current) == chunk_size:
+                chunks.append(current)
+                current = []
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def plan_lanes(jobs: list, costs: list) -> list:
+    """(lane, job indices) chunks: each job goes to the lane its estimated cost
+    picks, as a single request would, then each lane's jobs are chunked
+    across the workers that lane runs on."""
+    by_lane = {}
+    for index, (job, cost) in enumerate(zip(jobs, costs)):
+        lane = lane_for(cost)
+        record("lane", (job.type, lane))
+        by_lane.setdefault(lane, []).append(index)
+
+    workers = {"fast": compute_executor.max_workers, "slow": lanes["slow"].limit}
+    planned = []
+    for lane, indices in by_lane.items():
+        for chunk in plan_chunks([jobs[index] for index in indices], workers[lane]):
+            planned.append((lane, [indices[position] for position in chunk]))
+    return planned
+
+
+async def _estimate(jobs: list) -> list:
+    """Cost of each job, estimated in a compute worker so parsing stays off the event loop.
+
+    The estimate holds a fast lane slot, as a single request's does.
+    """
+    distinct = len({job.function_string for job in jobs})
+    try:
+        async with lanes["fast"].slot(max_wait=max(ENDPOINT_DEADLINES[job.type] for job in jobs) / 2):
+            return await compute_executor.run("cost:estimate_jobs", jobs,
+                                              timeout=distinct * STAGE_DEADLINES["parse"] + ASSESS_MARGIN)
+    except Exception:
+        # Jobs that can't be estimated are left to fail quickly, as in dispatch.py
+        return [0.0] * len(jobs)
+
+
+async def _run_chunk(jobs: list, indices: list, lane: str) -> list:
+    chunk = [jobs[index] for index in indices]
+    # Each job is bounded inside the worker; this only catches a worker that stops responding
+    deadline = sum(ENDPOINT_DEADLINES[job.type] for job in chunk)
+    try:
+        # A chunk holds one of its lane's slots, so a batch of expensive jobs
+        # queues with the other slow calculations instead of taking the fast workers
+        async with lanes[lane].slot(max_wait=max(ENDPOINT_DEADLINES[job.type] for job in chunk) / 2):
+            return await compute_executor.run("calculations:compute_batch", chunk, timeout=deadline, lane=lane)
+    except Exception as e:
+        return [(None, str(e))] * len(chunk)
+
+
+async def run_batch(jobs: list) -> BatchResponse:
+    """Run every job of a batch request and return the results in request order."""
+    chunks = plan_lanes(jobs, await _estimate(jobs))
+    outcomes = await asyncio.gather(*(_run_chunk(jobs, indices, lane) for lane, indices in chunks))
+
+    results = [None] * len(jobs)
+    for (_, indices), chunk_outcomes in zip(chunks, outcomes):
+        for index, (result, error) in zip(indices, chunk_outcomes):
+            results[index] = BatchItemResult(type=jobs[index].type, result=result, error=error)
+    return BatchResponse(results=results)
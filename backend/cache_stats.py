@@ -0,0 +1,42 @@
+"""Merging the cache counters worker processes report with their results.
+
+Only sums dicts, so the API process can serve /stats and /metrics without
+importing the caches' own modules, and with them SymPy (see startup.py).
+"""
+
+
+def _hit_ratio(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def combine_expression_stats(snapshots: list) -> dict:
+    """Merge expression_cache.cache_stats() snapshots from several worker processes into one view."""
+    hits = sum(s["hits"] for s in snapshots)
+    misses = sum(s["misses"] for s in snapshots)
+    canonical_hits = sum(s["canonical_hits"] for s in snapshots)
+    return {
+        "size": sum(s["size"] for s in snapshots),
+        "maxsize": sum(s["maxsize"] for s in snapshots),
+        "aliases": sum(s["aliases"] for s in snapshots),
+        "hits": hits,
+        "misses": misses,
+        "canonical_hits": canonical_hits,
+        "fallback_parses": sum(s["fallback_parses"] for s in snapshots),
+        "hit_ratio": _hit_ratio(hits, misses),
+        "dedup_ratio": (hits + canonical_hits) / (hits + misses) if hits + misses else 0.0,
+        "workers": len(snapshots),
+    }
+
+
+def combine_store_stats(snapshots: list) -> dict:
+    """Merge symbolic_store.store_stats() snapshots from several worker processes into one view."""
+    hits = sum(s["hits"] for s in snapshots)
+    misses = sum(s["misses"] for s in snapshots)
+    return {
+        "path": snapshots[0]["path"] if snapshots else None,
+        "hits": hits,
+        "misses": misses,
+        "errors": sum(s["errors"] for s in snapshots),
+        "hit_ratio": _hit_ratio(hits, misses),
+        "workers": len(snapshots),
+    }
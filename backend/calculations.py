@@ -0,0 +1,278 @@
+"""Synchronous math behind each endpoint.
+
+These functions are CPU-bound and run on the compute executor rather than
+the asyncio event loop, so they take and return plain request/response
+models that can be pickled across process boundaries.
+"""
+from sympy import latex, solve, limit, oo
+import numpy as np
+
+from deadlines import ENDPOINT_DEADLINES, StageTimeout, stage_deadline
+from critical_points import SEARCH_POINTS, classify, find_roots
+from expression_cache import parse_function
+from integration import definite_integral
+from limits import decimal, numeric_limit, snap
+from metrics import timed
+from sampling import sample_function
+from symbolic_store import MISSING, symbolic_store
+from models import (IntegralRequest, IntegralResponse, DerivativeRequest, DerivativeResponse,
+                    CriticalPointsRequest, CriticalPointsResponse, LimitRequest, LimitResponse, PlotColumns)
+
+
+def _to_points(x_values, y_values) -> list:
+    """Build the [{"x", "y"}] plot list.
+
+    Each run of undefined (NaN) samples becomes a single {"x", "y": None}
+    gap marker, so charts break the line there instead of joining across it.
+    """
+    defined = ~np.isnan(y_values)
+    # Keep defined points and the first sample of every undefined run
+    keep = defined | np.concatenate(([True], defined[:-1]))
+    return [{"x": x_val, "y": y_val if is_defined else None}
+            for x_val, y_val, is_defined in zip(x_values[keep].tolist(), y_values[keep].tolist(), defined[keep].tolist())]
+
+
+def _to_column(y_values) -> list:
+    """A y array as a JSON-ready list with None for undefined (NaN) samples."""
+    column = y_values.astype(object)
+    column[np.isnan(y_values)] = None
+    return column.tolist()
+
+
+def _plot_data(request, x_values, **series) -> dict:
+    """Response fields for the sampled curves, in the point format the client asked for."""
+    if request.point_format == "columnar":
+        # Built straight from the arrays; skip re-validating what we just produced
+        columns = PlotColumns.model_construct(
+            x=x_values.tolist(), series={name: _to_column(y_values) for name, y_values in series.items()})
+        return {"columns": columns}
+    return {f"{name}_points": _to_points(x_values, y_values) for name, y_values in series.items()}
+
+
+def compute_integral(request: IntegralRequest) -> IntegralResponse:
+    # Parsing and compiling are cached across requests for the same function string
+    with stage_deadline("parse"):
+        parsed = parse_function(request.function_string)
+
+    # Generate function points for plotting
+    with timed("sampling"):
+        x_values, (y_values,) = sample_function([parsed.compiled.evaluate], request.start_x, request.end_x,
+                                                pixel_width=request.pixel_width)
+
+    # Calculate the definite integral, in closed form when that's safe over the interval
+    area, error, method = definite_integral(parsed, request.start_x, request.end_x, x_values, y_values)
+
+    return IntegralResponse(
+        latex_expression=parsed.latex,
+        canonical_key=parsed.canonical_key,
+        area=area,
+        method=method,
+        **_plot_data(request, x_values, function=y_values),
+        error=None if error < 1e-10 else f"Numerical error: {error}"
+    )
+
+
+def compute_derivative(request: DerivativeRequest) -> DerivativeResponse:
+    with stage_deadline("parse"):
+        parsed = parse_function(request.function_string)
+
+    # Calculate the derivative (kept on the parsed expression for later requests)
+    with stage_deadline("diff"):
+        derivative_expr = parsed.derivative(1)
+
+    # Generate LaTeX strings
+    latex_expr = parsed.latex
+    with timed("latex"):
+        derivative_latex = latex(derivative_expr)
+
+    # Calculate derivative value at evaluation point if provided
+    derivative_value = None
+    if request.eval_point is not None:
+        try:
+            derivative_value = parsed.compiled_derivative(1)(request.eval_point)
+        except ValueError:
+            derivative_value = None
+
+    # Generate function and derivative points for plotting
+    plot_data = {}
+
+    if request.start_x is not None and request.end_x is not None:
+        # f and f' share most of their terms: compute both in one pass per grid,
+        # refined wherever either of them needs it
+        with timed("sampling"):
+            x_values, (y_values, dy_values) = sample_function(parsed.joint(1).evaluate, request.start_x,
+                                                              request.end_x, pixel_width=request.pixel_width)
+        plot_data = _plot_data(request, x_values, function=y_values, derivative=dy_values)
+
+    return DerivativeResponse(
+        latex_expression=latex_expr,
+        canonical_key=parsed.canonical_key,
+        derivative_latex=derivative_latex,
+        derivative_value=derivative_value,
+        **plot_data,
+        error=None
+    )
+
+
+def _merge_roots(numeric_roots: list, exact_roots: list, start_x: float, end_x: float) -> list:
+    """Exact roots plus any numeric root that solve() didn't find (e.g. it
+    returned only some branches), dropping numeric roots an exact one replaces."""
+    tolerance = 1e-6 * max(1.0, abs(end_x - start_x))
+    extra = [root for root in numeric_roots if all(abs(root - exact) > tolerance for exact in exact_roots)]
+    return sorted(set(exact_roots) | set(extra))
+
+
+def compute_critical_points(request: CriticalPointsRequest) -> CriticalPointsResponse:
+    with stage_deadline("parse"):
+        parsed = parse_function(request.function_string)
+    x = parsed.symbol
+
+    with stage_deadline("diff"):
+        # First derivative for the roots, second for classification
+        first_derivative = parsed.derivative(1)
+        parsed.derivative(2)
+
+    joint = parsed.joint(2)
+    roots = []
+    if request.method != "symbolic":
+        # Milliseconds, and only ever looks inside the requested interval
+        roots = find_roots(joint, parsed.compiled_derivative(1), parsed.compiled_derivative(2),
+                           request.start_x, request.end_x)
+
+    # solve() can run for minutes on transcendental derivatives; if it does,
+    # keep the numeric roots, or in symbolic mode still return the plot and
+    # report the search as timed out
+    error = None
+    if request.method != "numeric":
+        try:
+            solutions = symbolic_store.get("solve", (parsed.canonical_key,))
+            if solutions is MISSING:
+                with stage_deadline("solve"):
+                    solutions = solve(first_derivative, x)
+                symbolic_store.put("solve", (parsed.canonical_key,), solutions)
+        except StageTimeout as e:
+            solutions = None
+            if request.method == "symbolic":
+                error = f"Critical point search timed out: {e}"
+        except Exception:
+            if request.method == "symbolic":
+                raise
+            # No algorithm for this equation; the numeric roots stand
+            solutions = None
+        if solutions is not None:
+            exact_roots = []
+            for sol in solutions:
+                try:
+                    sol_float = float(sol)
+                except (TypeError, ValueError):
+                    # Skip complex or non-numeric solutions
+                    continue
+                if request.start_x <= sol_float <= request.end_x:
+                    exact_roots.append(sol_float)
+            roots = _merge_roots(roots, exact_roots, request.start_x, request.end_x)
+
+    # Classify each critical point by the sign of the second derivative
+    step = abs(request.end_x - request.start_x) / SEARCH_POINTS
+    critical_points = [{"x": root, "y": y_val, "type": point_type}
+                       for root, y_val, point_type in classify(joint, roots, step)]
+
+    # Generate function points for plotting
+    with timed("sampling"):
+        x_values, (y_values,) = sample_function([parsed.compiled.evaluate], request.start_x, request.end_x,
+                                                pixel_width=request.pixel_width)
+
+    return CriticalPointsResponse(
+        latex_expression=parsed.latex,
+        canonical_key=parsed.canonical_key,
+        method=request.method,
+        critical_points=critical_points,
+        **_plot_data(request, x_values, function=y_values),
+        error=error
+    )
+
+
+def compute_limit(request: LimitRequest) -> LimitResponse:
+    with stage_deadline("parse"):
+        parsed = parse_function(request.function_string)
+    expr, x = parsed.expr, parsed.symbol
+
+    # Continuous functions and removable singularities are answered by
+    # evaluating f near the point; only the rest goes to SymPy's limit()
+    numeric = numeric_limit(parsed.compiled, request.approach_value, request.direction)
+    if numeric is not None:
+        value, tier = numeric
+        # f(a) is exact as computed; only extrapolated values are snapped
+        limit_value, limit_latex = snap(value) if tier == "numeric" else decimal(value)
+        return LimitResponse(
+            latex_expression=parsed.latex,
+            canonical_key=parsed.canonical_key,
+            limit_value=limit_value,
+            limit_latex=limit_latex,
+            tier=tier,
+            error=None
+        )
+
+    # Calculate limit based on direction
+    store_key = (parsed.canonical_key, request.approach_value, request.direction)
+    limit_result = symbolic_store.get("limit", store_key)
+    if limit_result is MISSING:
+        with stage_deadline("limit"):
+            if request.direction == '+':
+                limit_result = limit(expr, x, request.approach_value, '+')
+            elif request.direction == '-':
+                limit_result = limit(expr, x, request.approach_value, '-')
+            else:
+                limit_result = limit(expr, x, request.approach_value)
+        symbolic_store.put("limit", store_key, limit_result)
+
+    # Try to convert to float
+    limit_value = None
+    try:
+        if limit_result == oo:
+            limit_latex = r"\infty"
+        elif limit_result == -oo:
+            limit_latex = r"-\infty"
+        else:
+            limit_value = float(limit_result)
+            limit_latex = latex(limit_result)
+    except (TypeError, ValueError):
+        limit_latex = latex(limit_result)
+
+    return LimitResponse(
+        latex_expression=parsed.latex,
+        canonical_key=parsed.canonical_key,
+        limit_value=limit_value,
+        limit_latex=limit_latex,
+        tier="symbolic",
+        error=None
+    )
+
+
+COMPUTATIONS = {
+    "integral": compute_integral,
+    "derivative": compute_derivative,
+    "critical_points": compute_critical_points,
+    "limit": compute_limit,
+}
+
+
+def compute(endpoint: str, request):
+    """The calculation of `endpoint` on `request`, as sent to the workers by name."""
+    return COMPUTATIONS[endpoint](request)
+
+
+def compute_batch(jobs: list) -> list:
+    """Run a chunk of batch jobs in one worker and return (result, error) for each.
+
+    Jobs for the same function string sit next to each other, so the
+    expression is parsed and compiled once and then served from the cache.
+    Each job gets its endpoint's deadline; a failure only affects that item.
+    """
+    outcomes = []
+    for job in jobs:
+        try:
+            with stage_deadline(job.type, ENDPOINT_DEADLINES[job.type]):
+                outcomes.append((COMPUTATIONS[job.type](job), None))
+        except Exception as e:
+            outcomes.append((None, str(e)))
+    return outcomes
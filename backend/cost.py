@@ -0,0 +1,156 @@
+"""Up-front cost estimates that route calculations to the fast or slow lane.
+
+Some requests finish in a millisecond and others keep SymPy busy until their
+deadline, and which is which can mostly be told from the parsed expression:
+its size, its operators, the degree of a polynomial, how deeply
+transcendental functions are nested, and how wide the interval is. The
+estimate is a unitless score; admission.lane_for sends anything at or above
+SLOW_COST to the slow lane.
+"""
+import math
+
+from sympy import Abs, Function, Pow, Symbol, exp, log, sign
+from sympy.functions.elementary.hyperbolic import HyperbolicFunction
+from sympy.functions.elementary.piecewise import Piecewise
+from sympy.functions.elementary.trigonometric import InverseTrigonometricFunction, TrigonometricFunction
+
+from deadlines import stage_deadline
+from expression_cache import parse_function
+
+TRANSCENDENTAL = (TrigonometricFunction, InverseTrigonometricFunction, HyperbolicFunction, exp, log)
+# Functions SymPy handles casewise, which multiplies the work of solve() and limit()
+CASEWISE = (Abs, sign, Piecewise)
+
+# How much the symbolic step of each endpoint is worth compared to diff();
+# critical points solve the derivative, the hardest symbolic step there is
+ENDPOINT_WEIGHTS = {
+    "derivative": 0.2,
+    "integral": 1.5,
+    "limit": 0.5,
+    "critical_points": 3.0,
+}
+# Share of that weight left when a critical point search doesn't call solve()
+NUMERIC_SEARCH_WEIGHT = 0.1
+
+
+class CostFeatures:
+    """What the estimate looks at in an expression tree."""
+
+    __slots__ = ("nodes", "transcendental", "casewise", "other_functions", "fractional_powers",
+                 "denominators", "nesting", "degree")
+
+    def __init__(self, expr, symbol: Symbol):
+        self.nodes = 0
+        self.transcendental = 0
+        self.casewise = 0
+        self.other_functions = 0
+        self.fractional_powers = 0
+        # Divisions by a sum, e.g. 1/(x^3 - 2x + 5)
+        self.denominators = 0
+        # Deepest chain of transcendental functions applied to one another
+        self.nesting = 0
+        self._walk(expr, 0)
+        # None unless the expression is a polynomial in the symbol
+        self.degree = polynomial_degree(expr, symbol)
+
+    def _walk(self, node, depth: int):
+        self.nodes += 1
+        if isinstance(node, TRANSCENDENTAL):
+            depth += 1
+            self.transcendental += 1
+            self.nesting = max(self.nesting, depth)
+        elif isinstance(node, CASEWISE):
+            self.casewise += 1
+        elif isinstance(node, Function):
+            self.other_functions += 1
+        elif isinstance(node, Pow) and not node.exp.is_Integer:
+            self.fractional_powers += 1
+        elif isinstance(node, Pow) and node.exp.is_negative and node.base.is_Add:
+            self.denominators += 1
+        for arg in node.args:
+            self._walk(arg, depth)
+
+
+def polynomial_degree(expr, symbol: Symbol):
+    """Degree of a polynomial in `symbol` read off its tree, or None if it isn't one.
+
+    Unlike as_poly() nothing is expanded, so (x^2 + x + 1)^2000 costs as
+    much as its six nodes. Terms cancelling in an expansion aren't seen, so
+    this is an upper bound, which is all the estimate needs.
+    """
+    if expr == symbol:
+        return 1
+    if symbol not in expr.free_symbols:
+        return 0
+    if expr.is_Add or expr.is_Mul:
+        degrees = [polynomial_degree(arg, symbol) for arg in expr.args]
+        if None in degrees:
+            return None
+        return max(degrees) if expr.is_Add else sum(degrees)
+    if expr.is_Pow and expr.exp.is_Integer and expr.exp >= 0:
+        degree = polynomial_degree(expr.base, symbol)
+        return None if degree is None else int(expr.exp) * degree
+    return None
+
+
+def features(parsed) -> CostFeatures:
+    """The cost features of a ParsedExpression, computed once and kept with it."""
+    if "cost_features" not in parsed.derived:
+        parsed.derived["cost_features"] = CostFeatures(parsed.expr, parsed.symbol)
+    return parsed.derived["cost_features"]
+
+
+def expression_cost(found: CostFeatures) -> float:
+    """Score for the symbolic work on an expression, before the endpoint's weight."""
+    if found.degree is not None:
+        # solve() has formulas up to degree 4; beyond, it falls back to
+        # factoring and RootOf
+        return found.nodes + 2 * max(0, found.degree - 4)
+    return (found.nodes
+            + 12 * found.transcendental
+            + 6 * found.fractional_powers
+            + 8 * found.denominators
+            + 10 * found.casewise
+            + 12 * found.other_functions
+            # Each level of nesting compounds: sin(exp(cos(x))) is far
+            # harder to solve than sin(x) + exp(x) + cos(x)
+            + 15 * max(0, found.nesting - 1) ** 2)
+
+
+def interval_factor(found: CostFeatures, request) -> float:
+    """Growth with the interval width: wide intervals of oscillating functions
+    mean more roots to polish and more subintervals for quad()."""
+    start, end = getattr(request, "start_x", None), getattr(request, "end_x", None)
+    if start is None or end is None or not found.transcendental:
+        return 1.0
+    return 1.0 + 0.25 * math.log1p(abs(end - start))
+
+
+def assess(endpoint: str, request) -> tuple:
+    """(canonical key of the function string, estimated cost) of a request.
+
+    Run in a compute worker (see dispatch.assess_request), where parsing is
+    bounded by its stage deadline and goes through that worker's parse
+    cache. A string that doesn't parse has no key and costs nothing: the
+    calculation will fail straight away.
+    """
+    try:
+        with stage_deadline("parse"):
+            parsed = parse_function(request.function_string)
+    except Exception:
+        return None, 0.0
+    found = features(parsed)
+    weight = ENDPOINT_WEIGHTS[endpoint]
+    if endpoint == "critical_points" and getattr(request, "method", None) == "numeric":
+        weight *= NUMERIC_SEARCH_WEIGHT
+    return parsed.canonical_key, weight * expression_cost(found) * interval_factor(found, request)
+
+
+def estimate(endpoint: str, request) -> float:
+    """Estimated cost of running `request` on `endpoint`."""
+    return assess(endpoint, request)[1]
+
+
+def estimate_jobs(jobs: list) -> list:
+    """Estimated cost of each batch job, in one worker task."""
+    return [estimate(job.type, job) for job in jobs]
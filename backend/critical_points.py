@@ -0,0 +1,109 @@
+import numpy as np
+from scipy import optimize
+
+# Grid the first derivative is sampled on; roots closer together than one
+# grid step can be missed
+SEARCH_POINTS = 4096
+# |f'(x)| at an accepted root, relative to the largest |f'| on the grid
+ROOT_TOLERANCE = 1e-8
+# |f''(x)| below this (relative, like ROOT_TOLERANCE) counts as zero and the
+# point is classified by the sign of f' on either side instead
+CURVATURE_TOLERANCE = 1e-8
+
+
+def _brentq(fn, a: float, b: float):
+    try:
+        return optimize.brentq(fn, a, b, xtol=1e-14, rtol=4 * np.finfo(float).eps)
+    except (ValueError, RuntimeError):
+        # Undefined somewhere inside the bracket, or no convergence
+        return None
+
+
+def find_roots(joint, first_derivative, second_derivative, start_x: float, end_x: float) -> list:
+    """x values in [start_x, end_x] where the first derivative is zero, ascending.
+
+    `joint` evaluates f, f' and f'' together (ParsedExpression.joint(2));
+    the two compiled derivatives are the scalar functions the root finder
+    calls. f' and f'' are sampled on a grid in one pass. Sign changes of f'
+    between neighbouring defined samples are refined with Brent's method; a
+    change that is really a pole or jump of f' fails the |f'| check
+    afterwards. Roots where f' only touches zero (x^3 at 0) show up as sign
+    changes of f'' next to a small |f'|, and are refined on f'' the same way.
+    """
+    low, high = min(start_x, end_x), max(start_x, end_x)
+    if not joint.is_numeric or low == high:
+        return []
+    x_values = np.linspace(low, high, SEARCH_POINTS)
+    _, d_values, dd_values = joint.evaluate(x_values)
+    defined = ~np.isnan(d_values)
+    if not defined.any():
+        return []
+    tolerance = ROOT_TOLERANCE * max(1.0, np.nanmax(np.abs(d_values)))
+
+    def accept(root):
+        try:
+            return root is not None and abs(first_derivative(root)) <= tolerance
+        except ValueError:
+            return False
+
+    roots = []
+    signs = np.sign(d_values)
+    both_defined = defined[:-1] & defined[1:]
+
+    # Exact zeros on the grid, except on flat stretches where f' is zero throughout
+    zero = signs == 0
+    isolated = zero & ~np.concatenate(([False], zero[:-1])) & ~np.concatenate((zero[1:], [False]))
+    roots.extend(x_values[isolated].tolist())
+
+    for i in np.nonzero(both_defined & (signs[:-1] * signs[1:] < 0))[0]:
+        root = _brentq(first_derivative, x_values[i], x_values[i + 1])
+        if accept(root):
+            roots.append(root)
+
+    # Local minima of |f'| that don't cross zero: look for the root of f'' there
+    magnitude = np.where(defined, np.abs(d_values), np.inf)
+    dips = np.nonzero((magnitude[1:-1] <= magnitude[:-2]) & (magnitude[1:-1] <= magnitude[2:])
+                      & ~zero[1:-1] & (signs[:-2] * signs[2:] > 0)
+                      & (dd_values[:-2] * dd_values[2:] < 0))[0] + 1
+    for i in dips:
+        root = _brentq(second_derivative, x_values[i - 1], x_values[i + 1])
+        if accept(root):
+            roots.append(root)
+
+    roots.sort()
+    # Drop duplicates found by more than one of the searches above
+    step = (high - low) / (SEARCH_POINTS - 1)
+    return [root for i, root in enumerate(roots) if i == 0 or root - roots[i - 1] > step * 1e-6]
+
+
+def classify(joint, roots: list, step: float) -> list:
+    """(x, f(x), type) for each root of f' where f is defined, type being
+    "minimum", "maximum" or "inflection".
+
+    f, f' and f'' at every root and `step` either side of it come from one
+    pass of `joint`. The sign of f'' decides where it is clearly nonzero,
+    otherwise the sign of f' on either side (which also handles x^4).
+    """
+    if not roots:
+        return []
+    roots = np.asarray(roots, dtype=float)
+    y_values, d_values, dd_values = joint.evaluate(np.concatenate((roots, roots - step, roots + step))).reshape(3, 3, -1)
+    curvature = dd_values[0]
+    # fmax skips NaN, so an undefined f'' beside the root doesn't poison the scale
+    scale = np.fmax(1.0, np.fmax.reduce(np.abs(dd_values), axis=0))
+    left, right = d_values[1], d_values[2]
+
+    points = []
+    for i, root in enumerate(roots.tolist()):
+        if np.isnan(y_values[0, i]):
+            continue
+        if abs(curvature[i]) > CURVATURE_TOLERANCE * scale[i]:
+            point_type = "minimum" if curvature[i] > 0 else "maximum"
+        elif left[i] < 0 < right[i]:
+            point_type = "minimum"
+        elif left[i] > 0 > right[i]:
+            point_type = "maximum"
+        else:
+            point_type = "inflection"
+        points.append((root, float(y_values[0, i]), point_type))
+    return points
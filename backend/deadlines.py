@@ -0,0 +1,101 @@
+import os
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import timed
+
+# Wall-clock budget in seconds for a whole request, enforced by the executor
+# killing the worker process that runs it
+ENDPOINT_DEADLINES = {
+    "integral": 10.0,
+    "derivative": 10.0,
+    "critical_points": 15.0,
+    "limit": 10.0,
+}
+
+# Budget for individual stages inside a calculation, enforced in the worker
+STAGE_DEADLINES = {
+    "parse": 2.0,
+    "diff": 5.0,
+    "quad": 5.0,
+    "antiderivative": 1.0,
+    "solve": 5.0,
+    "limit": 5.0,
+}
+
+
+def _load_overrides(value: str):
+    """Apply AREA_DEADLINES overrides, e.g. "solve=3,critical_points=8"."""
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, seconds = item.partition("=")
+        name = name.strip()
+        if name in ENDPOINT_DEADLINES:
+            ENDPOINT_DEADLINES[name] = float(seconds)
+        elif name in STAGE_DEADLINES:
+            STAGE_DEADLINES[name] = float(seconds)
+        else:
+            raise ValueError(f"Unknown deadline '{name}' in AREA_DEADLINES")
+
+
+_load_overrides(os.environ.get("AREA_DEADLINES", ""))
+
+
+class StageTimeout(Exception):
+    """Raised inside a calculation when one of its stages runs past its deadline."""
+
+    def __init__(self, stage: str, seconds: float):
+        super().__init__(stage, seconds)
+        self.stage = stage
+        self.seconds = seconds
+
+    def __str__(self):
+        return f"{self.stage} took longer than {self.seconds:g}s"
+
+
+def deadlines_enforced() -> bool:
+    # SIGALRM can only be handled on the main thread, which is where worker
+    # processes run calculations; elsewhere the endpoint deadline still applies
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+@contextmanager
+def stage_deadline(stage: str, seconds: float = None):
+    """Interrupt the enclosed block with StageTimeout once `seconds` have elapsed.
+
+    The time the block took is recorded as the stage's duration for /metrics,
+    whether or not a deadline applies.
+    """
+    with timed(stage), _alarm(stage, seconds):
+        yield
+
+
+@contextmanager
+def _alarm(stage: str, seconds: float = None):
+    seconds = STAGE_DEADLINES.get(stage) if seconds is None else seconds
+    if not seconds or not deadlines_enforced():
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        if outer_expires_first and callable(previous_handler):
+            previous_handler(signum, frame)
+        raise StageTimeout(stage, seconds)
+
+    started = time.monotonic()
+    previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+    previous_delay, _ = signal.setitimer(signal.ITIMER_REAL, seconds)
+    outer_expires_first = 0 < previous_delay < seconds
+    if outer_expires_first:
+        # An enclosing stage expires first, keep its deadline
+        signal.setitimer(signal.ITIMER_REAL, previous_delay)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+        if previous_delay:
+            # Re-arm the enclosing stage's alarm with whatever time it has left
+            remaining = previous_delay - (time.monotonic() - started)
+            signal.setitimer(signal.ITIMER_REAL, max(remaining, 1e-3))
@@ -0,0 +1,168 @@
+import math
+import threading
+from collections import OrderedDict
+
+from fastapi import HTTPException
+
+from admission import Overloaded, lane_for, lanes
+from deadlines import ENDPOINT_DEADLINES, STAGE_DEADLINES, StageTimeout
+from executor import compute_executor, ComputeTimeout, ComputeUnavailable
+from metrics import record, timed
+from profiling import profile_call
+from response_cache import CachedResponse, request_key, response_cache
+from single_flight import single_flight
+
+
+# Spare time for the round trip when a worker assesses a request
+ASSESS_MARGIN = 1.0
+
+
+class ExpressionKeys:
+    """Bounded LRU map from function strings to their canonical keys.
+
+    Filled from the workers' assessments, so a function string seen before
+    finds its cached responses without being parsed again anywhere.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, function_string: str):
+        with self._lock:
+            key = self._keys.get(function_string)
+            if key is not None:
+                self._keys.move_to_end(function_string)
+            return key
+
+    def put(self, function_string: str, key: str):
+        with self._lock:
+            self._keys[function_string] = key
+            self._keys.move_to_end(function_string)
+            while len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+
+
+expression_keys = ExpressionKeys()
+
+
+async def assess_request(endpoint: str, request) -> tuple:
+    """(canonical key or None, estimated cost) of a request, worked out in a compute worker.
+
+    Parsing stays off the event loop and under the parse stage deadline.
+    The round trip holds a fast lane slot like any calculation, and answers
+    429 if it can't get one. If the worker doesn't answer, the request goes
+    keyless to the fast lane, where the calculation reports whatever is
+    wrong with it.
+    """
+    try:
+        async with lanes["fast"].slot(max_wait=ENDPOINT_DEADLINES[endpoint] / 2):
+            key, cost = await compute_executor.run("cost:assess", endpoint, request,
+                                                   timeout=STAGE_DEADLINES["parse"] + ASSESS_MARGIN)
+    except Overloaded as e:
+        raise _overloaded(endpoint, e)
+    except Exception:
+        return None, 0.0
+    if key is not None:
+        expression_keys.put(request.function_string, key)
+    return key, cost
+
+
+async def cached_calculation(endpoint: str, request) -> CachedResponse:
+    """The encoded response for a request, from the response cache when possible.
+
+    Used by the HTTP endpoints and WebSocket sessions alike, so they share
+    cached responses. Identical requests (by canonical key) arriving while
+    one is being calculated wait for that calculation instead of starting
+    their own. The canonical key of a function string not seen before comes
+    from a compute worker, together with the cost estimate, so this process
+    never parses on its event loop.
+    """
+    expression = expression_keys.get(request.function_string)
+    cost = None
+    if expression is None:
+        expression, cost = await assess_request(endpoint, request)
+    key = request_key(endpoint, request, expression)
+    entry = response_cache.get(key)
+    if entry is None:
+        entry = await single_flight.run(key, lambda: _calculate(endpoint, request, key, cost), group=endpoint)
+    return entry
+
+
+async def _calculate(endpoint: str, request, key: str, cost: float = None) -> CachedResponse:
+    result = await run_calculation(endpoint, request, cost=cost)
+    with timed("serialization"):
+        entry = response_cache.create(result.model_dump_json().encode())
+    # Results that carry an error (e.g. a timed out solve) may differ next time
+    if getattr(result, "error", None) is None:
+        response_cache.put(key, entry)
+    return entry
+
+
+async def run_calculation(endpoint: str, request, profile: bool = False, cost: float = None):
+    """Run one calculation on the compute executor and map failures to HTTP errors.
+
+    `endpoint` names both the calculation and its deadline ("integral",
+    "derivative", "critical_points" or "limit"). Shared by the HTTP endpoints
+    and WebSocket sessions, so both report errors the same way. Failures are
+    counted for /metrics by exception type.
+
+    With `profile` the calculation runs under cProfile in its worker and
+    (result, report) is returned instead of the result alone.
+
+    The calculation's estimated cost picks its lane; pass `cost` if the
+    request was already assessed. A lane that is full, or has no slot free
+    within half the deadline, answers 429.
+    """
+    deadline = ENDPOINT_DEADLINES[endpoint]
+    if cost is None:
+        _, cost = await assess_request(endpoint, request)
+    lane = lane_for(cost)
+    record("lane", (endpoint, lane))
+    if profile:
+        # Opt-in and rare; the only place this process imports the calculations
+        from calculations import COMPUTATIONS
+        call = (profile_call, COMPUTATIONS[endpoint], request)
+    else:
+        # Named rather than imported, so this process never loads SymPy and SciPy
+        call = ("calculations:compute", endpoint, request)
+    try:
+        async with lanes[lane].slot(max_wait=deadline / 2):
+            return await compute_executor.run(*call, timeout=deadline, lane=lane)
+    except Overloaded as e:
+        raise _overloaded(endpoint, e)
+    except ComputeTimeout as e:
+        record("error", (endpoint, type(e).__name__))
+        raise HTTPException(
+            status_code=504,
+            detail={"error": "timeout", "message": str(e), "endpoint": endpoint,
+                    "stage": None, "deadline_seconds": deadline}
+        )
+    except StageTimeout as e:
+        record("error", (endpoint, type(e).__name__))
+        raise HTTPException(
+            status_code=504,
+            detail={"error": "timeout", "message": str(e), "endpoint": endpoint,
+                    "stage": e.stage, "deadline_seconds": e.seconds}
+        )
+    except ComputeUnavailable as e:
+        record("error", (endpoint, type(e).__name__))
+        raise HTTPException(
+            status_code=503,
+            detail=str(e)
+        )
+    except Exception as e:
+        record("error", (endpoint, type(e).__name__))
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
+        )
+
+
+def _overloaded(endpoint: str, e: Overloaded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail={"error": "overloaded", "message": str(e), "endpoint": endpoint, "lane": e.lane},
+        headers={"Retry-After": str(math.ceil(e.retry_after))}
+    )
@@ -0,0 +1,154 @@
+import numpy as np
+from sympy import Symbol, lambdify
+
+from numeric_plan import NumericPlan, Uncompilable
+
+
+class Overflow(ValueError):
+    """Raised by the scalar path where the value is too large for a float, rather than undefined."""
+
+
+class CompiledExpression:
+    """A SymPy expression compiled to NumPy for fast numerical evaluation.
+
+    The expression is compiled to a NumericPlan, or lambdified if it has
+    parts a plan can't compute. `evaluate` works on whole arrays and marks
+    undefined points (poles, complex values, unknown symbols) as NaN.
+    Calling the object with a single float is the scalar path used by
+    `integrate.quad`; it raises ValueError at undefined points, just like
+    `float(expr.subs(x, x_val))` used to, and its subclass Overflow where
+    the value is out of float range.
+    """
+
+    def __init__(self, expr, symbol: Symbol):
+        self.expr = expr
+        self.symbol = symbol
+        # Anything besides x left in the expression can't be turned into a number
+        self.is_numeric = expr.free_symbols <= {symbol}
+        self._plan = None
+        self._fn = None
+        if self.is_numeric:
+            try:
+                self._plan = NumericPlan([expr], symbol)
+            except Uncompilable:
+                try:
+                    self._fn = lambdify(symbol, expr, modules=["scipy", "numpy"])
+                except Exception:
+                    # Parts NumPy/SciPy can't print at all: no number anywhere
+                    self.is_numeric = False
+        self._vectorized = True
+
+    def evaluate(self, x_values) -> np.ndarray:
+        """Evaluate at every point of `x_values`, returning NaN where undefined."""
+        x_values = np.asarray(x_values, dtype=float)
+        if not self.is_numeric:
+            return np.full(x_values.shape, np.nan)
+        if self._plan is not None:
+            return self._plan.evaluate(x_values)[0]
+
+        if self._vectorized:
+            try:
+                with np.errstate(all="ignore"):
+                    y_values = self._fn(x_values)
+                return _clean(y_values, x_values.shape)
+            except Exception:
+                # Some functions (factorial, gamma via math, ...) only take scalars
+                self._vectorized = False
+
+        y_values = np.empty(x_values.shape)
+        for i, x_val in enumerate(x_values.flat):
+            try:
+                y_values.flat[i] = self(x_val)
+            except Exception:
+                # Undefined here, or a function NumPy/SciPy doesn't provide at all
+                y_values.flat[i] = np.nan
+        return y_values
+
+    def __call__(self, x_val: float) -> float:
+        if not self.is_numeric:
+            raise ValueError(f"Cannot evaluate {self.expr} numerically")
+        if self._plan is not None:
+            y_val = self._plan.value_at(x_val, overflow=np.inf)
+            if np.isnan(y_val):
+                raise ValueError(f"Function is undefined at x = {x_val}")
+            if np.isinf(y_val):
+                raise Overflow(f"Function is too large to represent at x = {x_val}")
+            return y_val
+        try:
+            with np.errstate(all="ignore"):
+                y_val = complex(self._fn(x_val))
+        except Exception as e:
+            # Plain-float arithmetic (e.g. 0.0**-2) raises instead of returning inf,
+            # and functions NumPy/SciPy don't provide (Derivative, DiracDelta) are unknown names
+            raise ValueError(f"Function is undefined at x = {x_val}") from e
+        if y_val.imag != 0 or not np.isfinite(y_val.real):
+            raise ValueError(f"Function is undefined at x = {x_val}")
+        return y_val.real
+
+
+class JointExpression:
+    """Several expressions in x compiled into one evaluator, e.g. f, f' and f''.
+
+    The expressions are compiled into one NumericPlan (or lambdified
+    together with common subexpression elimination), so a term they share
+    (exp(x/5) in f and f') is computed once per point, and one vectorized
+    pass returns every row. Falls back to evaluating the expressions one by
+    one, as CompiledExpression does, if the combined function can't take
+    arrays.
+    """
+
+    def __init__(self, exprs, symbol: Symbol):
+        self.exprs = list(exprs)
+        self.symbol = symbol
+        self.is_numeric = all(expr.free_symbols <= {symbol} for expr in self.exprs)
+        self._plan = None
+        self._fn = None
+        if self.is_numeric:
+            try:
+                self._plan = NumericPlan(self.exprs, symbol)
+            except Uncompilable:
+                try:
+                    self._fn = lambdify(symbol, self.exprs, modules=["scipy", "numpy"], cse=True)
+                except Exception:
+                    # CSE output with a part NumPy/SciPy can't print isn't valid
+                    # Python; evaluate the expressions one by one instead
+                    self._fn = None
+        self._parts = None
+
+    def evaluate(self, x_values) -> np.ndarray:
+        """Evaluate every expression at `x_values`: one row each, NaN where undefined."""
+        x_values = np.asarray(x_values, dtype=float)
+        if self._plan is not None:
+            return self._plan.evaluate(x_values)
+        if self._fn is not None:
+            try:
+                with np.errstate(all="ignore"):
+                    rows = self._fn(x_values)
+                return np.stack([_clean(row, x_values.shape) for row in rows])
+            except Exception:
+                self._fn = None
+        if self._parts is None:
+            self._parts = [CompiledExpression(expr, self.symbol) for expr in self.exprs]
+        return np.stack([part.evaluate(x_values) for part in self._parts])
+
+
+def _clean(y_values, shape) -> np.ndarray:
+    """Turn a lambdified result into a float array with NaN for undefined points."""
+    y_values = np.asarray(y_values)
+    if y_values.dtype == object:
+        # Symbolic leftovers (zoo, nan, ...) come back as object arrays
+        y_values = np.array([_to_float(v) for v in y_values.flat]).reshape(y_values.shape)
+    if np.iscomplexobj(y_values):
+        y_values = np.where(y_values.imag == 0, y_values.real, np.nan)
+    # Constant expressions come back as a scalar
+    y_values = np.broadcast_to(y_values, shape).astype(float)
+    y_values[~np.isfinite(y_values)] = np.nan
+    return y_values
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
@@ -0,0 +1,504 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# "process" (default) uses every core, "thread" keeps the work in this process,
+# "inline" runs it directly on the event loop (handy for debugging)
+EXECUTOR_KINDS = ("process", "thread", "inline")
+
+# How often a busy worker is checked for deadline expiry or cancellation
+_POLL_INTERVAL = 0.05
+
+# A task cancelled while running may still finish within this many seconds of
+# starting; only then is its worker killed. Restarting a worker costs more than
+# letting a short calculation complete, and it loses the worker's caches.
+CANCEL_GRACE = 0.25
+
+# Calculations are routed by estimated cost (see cost.py) to the "fast" lane,
+# the executor's main pool, or the "slow" lane, a pool of its own
+LANES = ("fast", "slow")
+# Slow lane workers run at a lower CPU priority, so on a busy machine the
+# fast lane's calculations still get the cores first
+SLOW_NICENESS = 5
+
+
+# Workers are started from a clean process rather than forked from this one:
+# the API process runs an event loop and manager threads, and a fork copies
+# whatever locks they hold into the child. With forkserver, the executor's
+# `preload` modules are imported once in the server process the workers are
+# forked from; the warm-up initializer (see startup.py) does the rest.
+DEFAULT_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+# Per-process stats callbacks, e.g. the parse cache counters of each worker
+_stats_hooks = {}
+
+
+class ComputeUnavailable(RuntimeError):
+    """Raised when the worker pool died underneath a request."""
+
+
+class ComputeTimeout(TimeoutError):
+    """Raised when a calculation runs past its deadline and its worker was stopped."""
+
+    def __init__(self, seconds: float):
+        super().__init__(seconds)
+        self.seconds = seconds
+
+    def __str__(self):
+        return f"Calculation took longer than {self.seconds:g}s"
+
+
+def _init_worker(stats_hooks):
+    _stats_hooks.update(stats_hooks)
+
+
+def _resolve(hook):
+    """A stats hook given as "module:function" is imported on first use, so the
+    process registering it doesn't have to import that module itself."""
+    if isinstance(hook, str):
+        module_name, _, name = hook.partition(":")
+        hook = getattr(importlib.import_module(module_name), name)
+    return hook
+
+
+def _invoke(fn, args):
+    """Worker-side wrapper that ships this process's stats back with every result."""
+    try:
+        outcome = (True, _resolve(fn)(*args))
+    except Exception as e:
+        outcome = (False, e)
+    return outcome + (os.getpid(), {name: _resolve(hook)() for name, hook in _stats_hooks.items()})
+
+
+def _worker_main(conn, stats_hooks, initializers=(), niceness=0):
+    """Loop of a worker process: run the initializers and report ready with the
+    seconds they took (and the first error, if any), then receive (fn, args)
+    and send back the _invoke result."""
+    _init_worker(stats_hooks)
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+    started = time.perf_counter()
+    error = None
+    for initializer in initializers:
+        try:
+            initializer()
+        except Exception as e:
+            # A failed warm-up only costs speed; the worker can still calculate
+            error = error or f"{type(e).__name__}: {e}"
+    conn.send((time.perf_counter() - started, error))
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        result = _invoke(*task)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # The result itself could not be pickled
+            conn.send((False, RuntimeError(f"Could not return result: {e}"), os.getpid(), {}))
+
+
+class TaskFuture(Future):
+    """Future whose cancel() also stops a calculation that is already running."""
+
+    def __init__(self):
+        super().__init__()
+        self.stop_requested = False
+
+    def cancel(self):
+        if super().cancel():
+            return True
+        if not self.done():
+            self.stop_requested = True
+        return False
+
+
+class _Task:
+    def __init__(self, fn, args, timeout):
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.future = TaskFuture()
+
+
+class _Worker:
+    def __init__(self, context, stats_hooks, initializers, niceness=0):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, stats_hooks, initializers, niceness), daemon=True)
+        try:
+            self.process.start()
+        except BaseException:
+            self.conn.close()
+            raise
+        finally:
+            child_conn.close()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class WorkerPool:
+    """Process pool that can stop individual calculations.
+
+    Each worker process is driven by its own manager thread. When a task runs
+    past its deadline, or is cancelled while running (after CANCEL_GRACE), the
+    manager kills that worker process and starts a fresh one in its place;
+    other workers and their tasks are unaffected.
+
+    Workers run the initializers before taking tasks. Normally a worker is
+    started when its manager gets a task; with `prestart` every manager starts
+    one straight away, and replaces a killed worker immediately rather than
+    on the next task, so workers are warm before they are needed.
+
+    A positive `niceness` lowers the CPU priority of the worker processes.
+    With the forkserver start method, `preload` names modules the fork
+    server imports before starting any worker, so workers share them
+    copy-on-write instead of importing them each.
+    """
+
+    def __init__(self, max_workers: int, stats_hooks: dict = None, start_method: str = None,
+                 initializers: list = None, prestart: bool = False, niceness: int = 0, name: str = "compute",
+                 preload: list = None):
+        self.max_workers = max_workers
+        self.busy = 0
+        self.timeouts = 0
+        self.recycled = 0
+        self.workers_started = 0
+        self.last_warmup_seconds = None
+        self.initializer_error = None
+        self._stats_hooks = dict(stats_hooks or {})
+        self._initializers = list(initializers or [])
+        self.prestart = prestart
+        self.niceness = niceness
+        self._context = multiprocessing.get_context(start_method or DEFAULT_START_METHOD)
+        if preload and self._context.get_start_method() == "forkserver":
+            # Only takes effect if the fork server isn't running yet
+            self._context.set_forkserver_preload(preload)
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._worker_ready = threading.Condition(self._lock)
+        self._threads = [threading.Thread(target=self._manage, name=f"{name}-worker-{i}", daemon=True)
+                         for i in range(max_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, fn, args=(), timeout: float = None) -> TaskFuture:
+        task = _Task(fn, args, timeout)
+        self._queue.put(task)
+        return task.future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Wait until every manager has started a worker that finished its initializers."""
+        with self._worker_ready:
+            return self._worker_ready.wait_for(lambda: self.workers_started >= self.max_workers, timeout)
+
+    def _start_worker(self):
+        """A new worker once it has run the initializers, or None if it couldn't be started
+        (e.g. the process limit was hit) or died doing so."""
+        try:
+            worker = _Worker(self._context, self._stats_hooks, self._initializers, self.niceness)
+        except Exception:
+            return None
+        try:
+            seconds, error = worker.conn.recv()
+        except Exception:
+            worker.kill()
+            return None
+        with self._worker_ready:
+            self.workers_started += 1
+            self.last_warmup_seconds = seconds
+            self.initializer_error = error or self.initializer_error
+            self._worker_ready.notify_all()
+        return worker
+
+    def _manage(self):
+        worker = self._start_worker() if self.prestart else None
+        while True:
+            task = self._queue.get()
+            if task is None:
+                break
+            if task.deadline is not None and time.monotonic() >= task.deadline:
+                # Waited in the queue for the whole budget
+                if task.future.set_running_or_notify_cancel():
+                    self._count_timeout()
+                    task.future.set_exception(ComputeTimeout(task.timeout))
+                continue
+            if not task.future.set_running_or_notify_cancel():
+                continue
+
+            if worker is None:
+                worker = self._start_worker()
+                if worker is None:
+                    task.future.set_exception(ComputeUnavailable("Worker process failed to start, please retry"))
+                    continue
+            with self._lock:
+                self.busy += 1
+            try:
+                worker = self._run(worker, task)
+            except Exception as e:
+                # Never let the manager thread die with the task unresolved
+                self._recycle(worker)
+                worker = None
+                if not task.future.done():
+                    task.future.set_exception(ComputeUnavailable(f"Worker process failed: {e}"))
+            finally:
+                with self._lock:
+                    self.busy -= 1
+            if worker is None and self.prestart:
+                worker = self._start_worker()
+
+        if worker is not None:
+            worker.stop()
+
+    def _run(self, worker, task):
+        """Run one task on `worker`, returning the worker to use for the next task."""
+        try:
+            worker.conn.send((task.fn, task.args))
+        except Exception as e:
+            task.future.set_exception(e)
+            if not worker.process.is_alive():
+                worker.kill()
+                return None
+            return worker
+
+        started = time.monotonic()
+        while not worker.conn.poll(_POLL_INTERVAL):
+            if task.future.stop_requested and time.monotonic() - started >= CANCEL_GRACE:
+                self._recycle(worker)
+                task.future.set_exception(asyncio.CancelledError())
+                return None
+            if task.deadline is not None and time.monotonic() >= task.deadline:
+                self._recycle(worker)
+                self._count_timeout()
+                task.future.set_exception(ComputeTimeout(task.timeout))
+                return None
+            if not worker.process.is_alive():
+                break
+
+        try:
+            result = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.kill()
+            task.future.set_exception(ComputeUnavailable("Worker process crashed, please retry"))
+            return None
+        except Exception as e:
+            # The result arrived but could not be unpickled, e.g. an exception
+            # whose args don't fit its __init__; start over with a fresh worker
+            self._recycle(worker)
+            task.future.set_exception(ComputeUnavailable(f"Could not read the worker's result: {e}"))
+            return None
+        task.future.set_result(result)
+        return worker
+
+    def _recycle(self, worker):
+        worker.kill()
+        with self._lock:
+            self.recycled += 1
+
+    def _count_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+
+
+class ComputeExecutor:
+    """Runs CPU-bound calculations off the asyncio event loop.
+
+    The underlying pool is created on first use so importing the app stays
+    cheap. With the process pool, a calculation that outlives its deadline is
+    stopped by killing its worker; thread and inline execution can only stop
+    waiting for it.
+
+    With `slow_workers`, process calculations run in the "slow" lane get a
+    separate pool of that many workers, so they can't hold up the main pool's
+    "fast" calculations. Otherwise both lanes share the main pool.
+    """
+
+    def __init__(self, kind: str = "process", max_workers: int = None, start_method: str = None,
+                 slow_workers: int = 0):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind '{kind}', expected one of {EXECUTOR_KINDS}")
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.slow_workers = slow_workers if kind == "process" else 0
+        self.start_method = start_method
+        self.in_flight = 0
+        self.completed = 0
+        self.timeouts = 0
+        self._worker_stats = {}
+        self._stats_mergers = {}
+        # Functions each worker process runs before its first task, e.g. a warm-up
+        self.initializers = []
+        # Start (and initialize) every worker as soon as the pool is created
+        self.prestart = False
+        # Modules the fork server imports once for all workers (forkserver start method only)
+        self.preload = []
+        self._pool = None
+        self._slow_pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self, lane: str = "fast"):
+        with self._lock:
+            if lane == "slow" and self.slow_workers:
+                if self._slow_pool is None:
+                    self._slow_pool = WorkerPool(self.slow_workers, _stats_hooks, self.start_method,
+                                                 self.initializers, self.prestart, SLOW_NICENESS, name="slow",
+                                                 preload=self.preload)
+                return self._slow_pool
+            if self._pool is None:
+                if self.kind == "process":
+                    self._pool = WorkerPool(self.max_workers, _stats_hooks, self.start_method,
+                                            self.initializers, self.prestart, preload=self.preload)
+                else:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def start(self, timeout: float = None) -> bool:
+        """Create the pools now and, with `prestart`, wait until every worker process is initialized.
+
+        Blocks, so call it off the event loop. Returns False if the workers
+        weren't ready within `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        ready = True
+        for lane in LANES:
+            pool = self._get_pool(lane)
+            if isinstance(pool, WorkerPool) and pool.prestart:
+                remaining = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+                ready = pool.wait_ready(remaining) and ready
+        return ready
+
+    def add_stats_hook(self, name: str, hook, merge=None):
+        """Register a module-level function whose result is collected from every worker.
+
+        `hook` may also be a "module:function" string, imported where it runs.
+        Without `merge` the latest result per worker is kept for worker_stats().
+        With it, every result is passed to merge() as it arrives instead, for
+        hooks that hand over what happened since the previous task.
+        """
+        _stats_hooks[name] = hook
+        if merge is not None:
+            self._stats_mergers[name] = merge
+
+    def worker_stats(self, name: str) -> list:
+        """Latest snapshot of a stats hook from each worker process seen so far."""
+        return [snapshots[name] for snapshots in self._worker_stats.values() if name in snapshots]
+
+    async def run(self, fn, *args, timeout: float = None, lane: str = "fast"):
+        """Run fn(*args) on the lane's pool and wait for its result without blocking the loop.
+
+        `fn` may also be a "module:function" string, imported where it runs,
+        so this process needn't load the modules its calculations use.
+        Raises ComputeTimeout if it doesn't finish within `timeout` seconds.
+        """
+        self.in_flight += 1
+        try:
+            if self.kind == "inline":
+                ok, result, pid, snapshots = _invoke(fn, args)
+            elif self.kind == "thread":
+                loop = asyncio.get_running_loop()
+                try:
+                    ok, result, pid, snapshots = await asyncio.wait_for(
+                        loop.run_in_executor(self._get_pool(), _invoke, fn, args), timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    raise ComputeTimeout(timeout)
+            else:
+                ok, result, pid, snapshots = await asyncio.wrap_future(
+                    self._get_pool(lane).submit(fn, args, timeout))
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+        for name, merge in self._stats_mergers.items():
+            if name in snapshots:
+                merge(snapshots.pop(name))
+        self._worker_stats[pid] = snapshots
+        if not ok:
+            raise result
+        return result
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                if self.kind == "process":
+                    self._pool.shutdown()
+                else:
+                    self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+            if self._slow_pool is not None:
+                self._slow_pool.shutdown()
+                self._slow_pool = None
+            self._worker_stats.clear()
+
+    def stats(self) -> dict:
+        stats = {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "started": self._pool is not None,
+            "in_flight": self.in_flight,
+            # Anything beyond the worker count is waiting in the pool's queue
+            "queue_depth": max(0, self.in_flight - self.max_workers) if self.kind != "inline" else 0,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+        }
+        if isinstance(self._pool, WorkerPool):
+            stats.update(
+                queue_depth=self._pool.queue_depth(),
+                busy_workers=self._pool.busy,
+                timeouts=self._pool.timeouts,
+                recycled_workers=self._pool.recycled,
+                workers_started=self._pool.workers_started,
+                last_warmup_seconds=self._pool.last_warmup_seconds,
+                initializer_error=self._pool.initializer_error,
+            )
+        if self._slow_pool is not None:
+            stats["timeouts"] += self._slow_pool.timeouts
+            stats["slow_lane"] = {
+                "max_workers": self.slow_workers,
+                "queue_depth": self._slow_pool.queue_depth(),
+                "busy_workers": self._slow_pool.busy,
+                "timeouts": self._slow_pool.timeouts,
+                "recycled_workers": self._slow_pool.recycled,
+                "workers_started": self._slow_pool.workers_started,
+            }
+        return stats
+
+
+compute_executor = ComputeExecutor(
+    kind=os.environ.get("AREA_EXECUTOR", "process"),
+    max_workers=int(os.environ.get("AREA_WORKERS", "0")) or None,
+    start_method=os.environ.get("AREA_START_METHOD") or None,
+    slow_workers=int(os.environ.get("AREA_SLOW_WORKERS", "1")),
+)
@@ -0,0 +1,202 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+from sympy import Symbol, diff, latex, srepr
+from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application, convert_xor
+
+from evaluator import CompiledExpression, JointExpression
+from expression_parser import Unsupported, check_limits, parse_tree, to_sympy
+from metrics import timed
+from symbolic_store import MISSING, symbolic_store
+
+x = Symbol('x')
+
+# Use transformations that support implicit multiplication (e.g., "2x", "sin x") and convert ^ to **
+TRANSFORMATIONS = standard_transformations + (convert_xor, implicit_multiplication_application,)
+# Part of the cache key, so entries parsed under a different grammar never collide
+PARSER_CONFIG = ",".join(t.__name__ for t in TRANSFORMATIONS)
+# Function strings remembered per cached expression; several spellings can
+# share one entry
+ALIASES_PER_ENTRY = 4
+
+
+def parse(function_string: str):
+    """SymPy expression for a function string.
+
+    The fast parser handles the common grammar; parse_expr() gets anything
+    else, and reports invalid input. Returns (expression, whether the fast
+    parser handled it).
+    """
+    check_limits(function_string)
+    try:
+        tree = parse_tree(function_string)
+    except Unsupported:
+        return parse_expr(function_string, transformations=TRANSFORMATIONS), False
+    return to_sympy(tree), True
+
+
+def canonical_key(expr) -> str:
+    """Structural hash of a parsed expression.
+
+    SymPy already orders the arguments of sums and products, so "2x", "2*x",
+    "2 x" and "x*2" parse to the same tree and the same srepr(). The hash of
+    that serialization is short enough to key caches and report in responses,
+    and unlike hash(expr) it is stable across processes.
+    """
+    return hashlib.blake2b(srepr(expr).encode(), digest_size=10).hexdigest()
+
+
+class ParsedExpression:
+    """A parsed function string together with the artifacts derived from it.
+
+    The LaTeX string and compiled evaluator are built on first use and then
+    kept for as long as the entry stays in the cache. Other modules keep
+    their own per-expression results (antiderivative, ...) in `derived`.
+    Entries are shared by every spelling with the same `canonical_key`;
+    `function_string` is the first one seen.
+    """
+
+    def __init__(self, function_string: str, expr):
+        self.function_string = function_string
+        self.expr = expr
+        self.canonical_key = canonical_key(expr)
+        self.symbol = x
+        self.derived = {}
+
+    @cached_property
+    def latex(self) -> str:
+        # Generate LaTeX string without dollar signs for KaTeX display mode
+        with timed("latex"):
+            latex_expr = latex(self.expr)
+        if latex_expr.startswith('$') and latex_expr.endswith('$'):
+            latex_expr = latex_expr[1:-1]
+        return latex_expr
+
+    @cached_property
+    def compiled(self) -> CompiledExpression:
+        return CompiledExpression(self.expr, self.symbol)
+
+    def derivative(self, order: int):
+        """The `order`-th derivative (0 is the expression itself).
+
+        Each derivative is differentiated from the previous one once and kept,
+        here and in the on-disk symbolic store; callers run this under the
+        "diff" stage deadline.
+        """
+        derivatives = self.derived.setdefault("derivatives", [self.expr])
+        while len(derivatives) <= order:
+            n = len(derivatives)
+            derivative = symbolic_store.get("derivative", (self.canonical_key, n))
+            if derivative is MISSING:
+                derivative = diff(derivatives[-1], self.symbol)
+                symbolic_store.put("derivative", (self.canonical_key, n), derivative)
+            derivatives.append(derivative)
+        return derivatives[order]
+
+    def compiled_derivative(self, order: int) -> CompiledExpression:
+        """Scalar/vectorized evaluator of one derivative, for root finding."""
+        if order == 0:
+            return self.compiled
+        compiled = self.derived.setdefault("compiled_derivatives", {})
+        if order not in compiled:
+            compiled[order] = CompiledExpression(self.derivative(order), self.symbol)
+        return compiled[order]
+
+    def joint(self, order: int) -> JointExpression:
+        """One evaluator returning f, f', ... up to the `order`-th derivative as rows."""
+        joint = self.derived.setdefault("joint", {})
+        if order not in joint:
+            joint[order] = JointExpression([self.derivative(n) for n in range(order + 1)], self.symbol)
+        return joint[order]
+
+
+class ExpressionCache:
+    """Bounded LRU cache of ParsedExpression entries keyed by canonical expression.
+
+    Lookups go through a second, bounded map from (function string, parser
+    config) to canonical key, so a repeated string isn't parsed again and a
+    new spelling of a cached expression reuses its compiled artifacts.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.canonical_hits = 0  # misses on the string that found the expression cached anyway
+        self.fallback_parses = 0  # strings the fast parser left to parse_expr()
+        self._entries = OrderedDict()
+        self._aliases = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, function_string: str) -> ParsedExpression:
+        alias = (function_string, PARSER_CONFIG)
+        with self._lock:
+            entry = self._entries.get(self._aliases.get(alias))
+            if entry is not None:
+                self._aliases.move_to_end(alias)
+                self._entries.move_to_end(entry.canonical_key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Parse outside the lock; failures raise and are not cached
+        expr, fast = parse(function_string)
+        entry = ParsedExpression(function_string, expr)
+        key = entry.canonical_key
+
+        with self._lock:
+            self.fallback_parses += not fast
+            self._aliases[alias] = key
+            self._aliases.move_to_end(alias)
+            while len(self._aliases) > self.maxsize * ALIASES_PER_ENTRY:
+                self._aliases.popitem(last=False)
+            if key in self._entries:
+                self.canonical_hits += 1
+                entry = self._entries[key]
+            else:
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+            self.hits = 0
+            self.misses = 0
+            self.canonical_hits = 0
+            self.fallback_parses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "aliases": len(self._aliases),
+                "hits": self.hits,
+                "misses": self.misses,
+                "canonical_hits": self.canonical_hits,
+                "fallback_parses": self.fallback_parses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                # Share of lookups answered by an already parsed expression
+                "dedup_ratio": (self.hits + self.canonical_hits) / lookups if lookups else 0.0,
+            }
+
+
+expression_cache = ExpressionCache(maxsize=int(os.environ.get("AREA_EXPRESSION_CACHE_SIZE", "512")))
+
+
+def cache_stats() -> dict:
+    return expression_cache.stats()
+
+
+def parse_function(function_string: str) -> ParsedExpression:
+    """Parse a user-supplied function string, reusing earlier parses of the same input."""
+    return expression_cache.get(function_string)
+
@@ -0,0 +1,329 @@
+"""Fast parser for the function strings the endpoints accept.
+
+parse_expr() with implicit multiplication tokenizes the input with Python's
+tokenizer, rewrites the token stream in several passes and eval()s the
+result, which makes it one of the slowest stages for short inputs. This
+module parses the common grammar directly with a small precedence-climbing
+parser and builds the SymPy expression with the same operators, in the same
+order, as that eval() would, so both produce identical trees:
+
+- numbers (2, 2.5, .5, 1e-3), x and other single-letter symbols, and the
+  constants pi, E, I and oo;
+- + - * / and ^ or **, with Python's precedence (-x^2 is -(x^2));
+- implicit multiplication by juxtaposition: 2x, 2 x, x sin(x), (x+1)(x-1);
+- function calls, with parentheses or without: sin(x), log(x, 2), sin x,
+  sin 2x (which is sin(2x)), sin^2 x and sin^2(x) (both sin(x)^2).
+
+Anything else raises Unsupported, and the caller falls back to parse_expr(),
+which also produces its usual error messages for invalid input. Length and
+nesting are limited for both paths (check_limits), and integer powers whose
+result would have more than MAX_DIGITS digits are refused before SymPy tries
+to compute them.
+"""
+import builtins
+import math
+import re
+
+import sympy
+
+# Longest function string accepted, in characters
+MAX_LENGTH = 1000
+# Deepest nesting of parentheses, signs, powers and function calls
+MAX_DEPTH = 100
+# Largest exact power, in decimal digits, that a function string may spell out
+MAX_DIGITS = 10000
+
+# What parse_expr() resolves names against
+_NAMESPACE = {}
+exec("from sympy import *", _NAMESPACE)
+
+FUNCTIONS = {name: _NAMESPACE[name] for name in (
+    "sin", "cos", "tan", "cot", "sec", "csc", "asin", "acos", "atan", "acot", "asec", "acsc",
+    "sinh", "cosh", "tanh", "coth", "sech", "csch", "asinh", "acosh", "atanh", "acoth",
+    "exp", "log", "ln", "sqrt", "cbrt", "root", "Abs", "sign", "floor", "ceiling", "erf", "gamma")}
+FUNCTIONS["abs"] = builtins.abs
+CONSTANTS = {name: _NAMESPACE[name] for name in ("pi", "E", "I", "oo")}
+# Single letters parse_expr() turns into symbols (E, I, N, O, Q, S are SymPy names)
+SYMBOLS = {letter for letter in "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ" if letter not in _NAMESPACE}
+
+_TOKENS = re.compile(r"""
+    (?P<space>[ ]+)
+  | (?P<number>(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<op>\*\*|[-+*/^(),])
+""", re.VERBOSE)
+# Tokens after which parse_expr() multiplies by juxtaposition
+_OPERAND_START = ("number", "name", "(")
+
+
+class Unsupported(Exception):
+    """The input is outside this parser's grammar (or invalid); parse_expr() decides what it means."""
+
+
+def check_limits(function_string: str):
+    """Raise ValueError for input too long or too deeply parenthesized to parse safely."""
+    if len(function_string) > MAX_LENGTH:
+        raise ValueError(f"Function is too long (at most {MAX_LENGTH} characters)")
+    depth = 0
+    for char in function_string:
+        if char in "([{":
+            depth += 1
+            if depth > MAX_DEPTH:
+                raise ValueError(f"Function is nested too deeply (at most {MAX_DEPTH} levels)")
+        elif char in ")]}":
+            depth -= 1
+
+
+def tokenize(function_string: str) -> list:
+    """(kind, text) pairs, kind being "number", "name" or the operator itself."""
+    tokens = []
+    position = 0
+    while position < len(function_string):
+        match = _TOKENS.match(function_string, position)
+        if match is None:
+            raise Unsupported(f"Unexpected character {function_string[position]!r}")
+        position = match.end()
+        kind, text = match.lastgroup, match.group()
+        if kind == "space":
+            continue
+        if kind == "number":
+            following = function_string[position:position + 1]
+            # Imaginary (2j), hex/octal/binary (0x1f) or invalid (007) literals
+            if following in ("j", "J") or (text == "0" and following in ("x", "X", "o", "O", "b", "B")):
+                raise Unsupported(f"Unsupported number {text + following!r}")
+            if len(text) > 1 and text[0] == "0" and text.isdigit():
+                raise Unsupported(f"Unsupported number {text!r}")
+        tokens.append((text, text) if kind == "op" else (kind, text))
+    return tokens
+
+
+class _Parser:
+    """Precedence climbing over the tokens, building a tree of tuples:
+    ("number", text), ("symbol", name), ("constant", name),
+    ("call", name, args), ("neg" | "pos", operand) and
+    ("add" | "sub" | "mul" | "div" | "pow", left, right)."""
+
+    def __init__(self, tokens: list):
+        self.tokens = tokens
+        self.position = 0
+        self.depth = 0
+        self.in_function_power = False
+
+    def peek(self, offset: int = 0) -> str:
+        index = self.position + offset
+        return self.tokens[index][0] if index < len(self.tokens) else None
+
+    def take(self) -> tuple:
+        if self.position >= len(self.tokens):
+            raise Unsupported("Unexpected end of input")
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def expect(self, kind: str):
+        if self.take()[0] != kind:
+            raise Unsupported(f"Expected {kind!r}")
+
+    def nest(self):
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise ValueError(f"Function is nested too deeply (at most {MAX_DEPTH} levels)")
+
+    def parse(self) -> tuple:
+        tree = self.sum()
+        if self.position != len(self.tokens):
+            raise Unsupported(f"Unexpected {self.tokens[self.position][1]!r}")
+        return tree
+
+    def sum(self) -> tuple:
+        left = self.term()
+        while self.peek() in ("+", "-"):
+            op = "add" if self.take()[0] == "+" else "sub"
+            left = (op, left, self.term())
+        return left
+
+    def term(self) -> tuple:
+        left = self.unary()
+        while True:
+            kind = self.peek()
+            if kind in ("*", "/"):
+                self.take()
+                left = ("mul" if kind == "*" else "div", left, self.unary())
+            elif kind in _OPERAND_START:
+                # Implicit multiplication binds like an explicit *
+                left = ("mul", left, self.power())
+            else:
+                return left
+
+    def unary(self) -> tuple:
+        if self.peek() in ("+", "-"):
+            op = "pos" if self.take()[0] == "+" else "neg"
+            self.nest()
+            operand = self.unary()
+            self.depth -= 1
+            return (op, operand)
+        return self.power()
+
+    def power(self) -> tuple:
+        base = self.primary()
+        if self.peek() in ("^", "**"):
+            self.take()
+            self.nest()
+            # Right associative, and the exponent may carry a sign: x^-2
+            exponent = self.unary()
+            self.depth -= 1
+            return ("pow", base, exponent)
+        return base
+
+    def primary(self) -> tuple:
+        kind, text = self.take()
+        if kind == "number":
+            return ("number", text)
+        if kind == "(":
+            self.nest()
+            inner = self.sum()
+            self.expect(")")
+            self.depth -= 1
+            return inner
+        if kind != "name":
+            raise Unsupported(f"Unexpected {text!r}")
+        if text in CONSTANTS:
+            return ("constant", text)
+        if text in SYMBOLS:
+            return ("symbol", text)
+        if text not in FUNCTIONS:
+            raise Unsupported(f"Unknown name {text!r}")
+        return self.function(text)
+
+    def function(self, name: str) -> tuple:
+        following = self.peek()
+        if following == "(":
+            return self.call(name)
+        if following in ("^", "**"):
+            # sin^2(x) and sin^2 x are sin(x)^2. parse_expr() moves the
+            # exponent behind the argument, which goes wrong when the
+            # argument holds another such power or a power follows
+            self.take()
+            kind, exponent = self.take()
+            if kind != "number" or not exponent.isdigit() or self.in_function_power:
+                raise Unsupported("Unsupported function power")
+            self.in_function_power = True
+            if self.peek() == "(":
+                applied = self.call(name)
+            else:
+                applied = ("call", name, (self.simple_operand(),))
+                if self.peek() == "*" or self.peek() in _OPERAND_START:
+                    raise Unsupported("Unsupported function power argument")
+            self.in_function_power = False
+            if self.peek() in ("^", "**"):
+                raise Unsupported("Unsupported power of a function power")
+            return ("pow", applied, ("number", exponent))
+        if following in ("number", "name"):
+            applied = ("call", name, (self.implicit_argument(),))
+            if self.peek() == "(":
+                raise Unsupported("Unsupported parenthesis after a function argument without parentheses")
+            return applied
+        raise Unsupported(f"Function {name!r} without an argument")
+
+    def call(self, name: str) -> tuple:
+        self.expect("(")
+        self.nest()
+        args = [self.sum()]
+        while self.peek() == ",":
+            self.take()
+            args.append(self.sum())
+        self.expect(")")
+        self.depth -= 1
+        return ("call", name, tuple(args))
+
+    def implicit_argument(self) -> tuple:
+        """Argument of a function applied without parentheses.
+
+        parse_expr() closes the parenthesis it inserts at the first token
+        other than a multiplication or a power, so "sin x^2*3 + 1" is
+        sin(x^2*3) + 1. Only simple operands are taken in between.
+        """
+        argument = self.implicit_power()
+        while self.peek() == "*" or self.peek() in ("number", "name"):
+            if self.peek() == "*":
+                self.take()
+            argument = ("mul", argument, self.implicit_power())
+        return argument
+
+    def implicit_power(self) -> tuple:
+        operands = [self.simple_operand()]
+        while self.peek() in ("^", "**"):
+            if operands[-1][0] == "constant":
+                # parse_expr() misplaces its closing parenthesis after pi^2 here
+                raise Unsupported("Unsupported power of a constant in a function argument without parentheses")
+            self.take()
+            # Each exponent sits a level deeper, as in power()
+            self.nest()
+            operands.append(self.simple_operand())
+        self.depth -= len(operands) - 1
+        power = operands.pop()
+        while operands:
+            power = ("pow", operands.pop(), power)
+        return power
+
+    def simple_operand(self) -> tuple:
+        kind, text = self.take()
+        if kind == "number":
+            return ("number", text)
+        if kind == "name" and text in CONSTANTS:
+            return ("constant", text)
+        if kind == "name" and text in SYMBOLS:
+            return ("symbol", text)
+        if kind == "name" and text in FUNCTIONS and self.peek() == "(":
+            return self.call(text)
+        raise Unsupported(f"Unsupported {text!r} in a function argument without parentheses")
+
+
+def parse_tree(function_string: str) -> tuple:
+    """The tuple tree of a function string; raises Unsupported outside the grammar."""
+    tokens = tokenize(function_string)
+    if not tokens:
+        raise Unsupported("Empty input")
+    return _Parser(tokens).parse()
+
+
+def _number(text: str):
+    # As parse_expr's auto_number: Float from the literal's text, else Integer
+    if "." in text or "e" in text or "E" in text:
+        return sympy.Float(text)
+    return sympy.Integer(text)
+
+
+def _power(base, exponent):
+    if isinstance(base, sympy.Rational) and isinstance(exponent, sympy.Integer) and abs(exponent) > 1:
+        magnitude = max(abs(base.p), abs(base.q))
+        if magnitude > 1 and int(abs(exponent)) * math.log10(magnitude) > MAX_DIGITS:
+            raise ValueError(f"Number too large: a power in the function has more than {MAX_DIGITS} digits")
+    return base ** exponent
+
+
+_BINARY = {
+    "add": lambda left, right: left + right,
+    "sub": lambda left, right: left - right,
+    "mul": lambda left, right: left * right,
+    "div": lambda left, right: left / right,
+    "pow": _power,
+}
+
+
+def to_sympy(tree: tuple):
+    """Evaluate a tuple tree with SymPy, the way parse_expr() evaluates its rewritten source."""
+    kind = tree[0]
+    if kind == "number":
+        return _number(tree[1])
+    if kind == "symbol":
+        return sympy.Symbol(tree[1])
+    if kind == "constant":
+        return CONSTANTS[tree[1]]
+    if kind == "call":
+        return FUNCTIONS[tree[1]](*[to_sympy(arg) for arg in tree[2]])
+    if kind == "neg":
+        return -to_sympy(tree[1])
+    if kind == "pos":
+        return +to_sympy(tree[1])
+    return _BINARY[kind](to_sympy(tree[1]), to_sympy(tree[2]))
@@ -0,0 +1,253 @@
+import math
+import threading
+import warnings
+
+import numpy as np
+from scipy import integrate
+from sympy import Integral
+from sympy import integrate as symbolic_integrate
+
+from deadlines import StageTimeout, deadlines_enforced, stage_deadline
+from evaluator import CompiledExpression, Overflow
+from metrics import record
+from symbolic_store import MISSING, symbolic_store
+
+# How far F(x[i+1]) - F(x[i]) may stray from the trapezoid estimate, as a
+# fraction of the total absolute area, before F is considered discontinuous
+ANTIDERIVATIVE_TOLERANCE = 1e-2
+
+# The cumulative table uses grid cells of width 2**k with about this many
+# cells across the requested interval
+CELLS_PER_INTERVAL = 64
+MAX_TABLE_CELLS = 1 << 16
+MAX_TABLES_PER_EXPRESSION = 4
+# Cells whose Gauss-Kronrod error estimate is above this are redone with quad
+CELL_TOLERANCE = 1e-11
+
+# 15-point Kronrod rule on [-1, 1] and its embedded 7-point Gauss rule (QUADPACK qk15)
+_KRONROD_NODES = np.array([0.991455371120812639206854697526329, 0.949107912342758524526189684047851,
+                           0.864864423359769072789712788640926, 0.741531185599394439863864773280788,
+                           0.586087235467691130294144845693013, 0.405845151377397166906606412076961,
+                           0.207784955007898467600689403773245, 0.0])
+_KRONROD_WEIGHTS = np.array([0.022935322010529224963732008058970, 0.063092092629978553290700663189204,
+                             0.104790010322250183839876322541518, 0.140653259715525918745189590510238,
+                             0.169004726639267902826583426598550, 0.190350578064785409913256402421014,
+                             0.204432940075298892414161999234649, 0.209482141084727828012999174891714])
+_GAUSS_WEIGHTS = np.array([0.129484966168869693270611432679082, 0.279705391489276667901467771423780,
+                           0.381830050505118944950369775488975, 0.417959183673469387755102040816327])
+# Mirror to all 15 nodes: -x_0 .. -x_6, 0, x_6 .. x_0
+_NODES = np.concatenate((-_KRONROD_NODES[:-1], [0.0], _KRONROD_NODES[-2::-1]))
+_K_WEIGHTS = np.concatenate((_KRONROD_WEIGHTS[:-1], [_KRONROD_WEIGHTS[-1]], _KRONROD_WEIGHTS[-2::-1]))
+_GAUSS_INDEX = np.array([1, 3, 5, 7, 9, 11, 13])
+_G_WEIGHTS = np.concatenate((_GAUSS_WEIGHTS[:-1], [_GAUSS_WEIGHTS[-1]], _GAUSS_WEIGHTS[-2::-1]))
+
+
+def _quad(fn, a: float, b: float):
+    """integrate.quad(fn, a, b) as (area, error), counting its evaluations for /metrics."""
+    result = integrate.quad(fn, a, b, full_output=1)
+    record("evaluations", ("quad",), result[2]["neval"])
+    if len(result) > 3:
+        # full_output returns the warning quad would otherwise have issued
+        warnings.warn(result[3], integrate.IntegrationWarning, stacklevel=2)
+    return result[0], result[1]
+
+
+def antiderivative(parsed, search: bool = True):
+    """Compiled closed-form antiderivative of the expression, or None.
+
+    None means SymPy found no closed form within the stage deadline. Either
+    way the answer is cached on the expression and in the on-disk symbolic
+    store, so no worker spends the deadline on it again. Without `search`,
+    or without an enforceable deadline (thread or inline executors, where
+    integrate() could run unbounded), SymPy isn't tried and only a stored
+    result is used.
+    """
+    if "antiderivative" not in parsed.derived:
+        result = symbolic_store.get("antiderivative", (parsed.canonical_key,))
+        if result is MISSING:
+            if not search or not deadlines_enforced():
+                return None
+            try:
+                with stage_deadline("antiderivative"):
+                    result = symbolic_integrate(parsed.expr, parsed.symbol)
+                if result.has(Integral):
+                    # SymPy gave up and returned the integral unevaluated
+                    result = None
+                symbolic_store.put("antiderivative", (parsed.canonical_key,), result)
+            except StageTimeout as e:
+                if e.stage != "antiderivative":
+                    # The enclosing calculation's deadline, not ours
+                    raise
+                # Stored like any other miss: quadrature answers in well under the deadline
+                result = None
+                symbolic_store.put("antiderivative", (parsed.canonical_key,), None)
+            except Exception:
+                result = None
+                symbolic_store.put("antiderivative", (parsed.canonical_key,), None)
+        parsed.derived["antiderivative"] = CompiledExpression(result, parsed.symbol) if result is not None else None
+    return parsed.derived["antiderivative"]
+
+
+def _antiderivative_area(F, x_values, y_values):
+    """F(b) - F(a) if F is usable across the sampled interval, otherwise None.
+
+    F is only trusted when the integrand is defined at every sample (no poles
+    or gaps) and F itself is finite there and rises in step with the
+    trapezoid rule between samples, which catches branch-cut jumps in F.
+    """
+    if len(x_values) < 2 or np.isnan(y_values).any():
+        return None
+    F_values = F.evaluate(x_values)
+    if not np.isfinite(F_values).all():
+        return None
+
+    steps = np.diff(x_values) * (y_values[:-1] + y_values[1:]) / 2
+    scale = np.abs(steps).sum() + 1e-12
+    if np.abs(np.diff(F_values) - steps).max() > ANTIDERIVATIVE_TOLERANCE * scale:
+        return None
+    return F_values[-1] - F_values[0]
+
+
+class CumulativeIntegral:
+    """Running integral of one expression on a fixed grid of cells of width `step`.
+
+    `values[j]` is the integral from the first grid node to node j, like a
+    prefix sum. The integral over [a, b] is then a difference of two table
+    entries plus two short edge pieces. The table only grows: a request
+    reaching past either end integrates just the missing cells. This is
+    what makes dragging the bounds of one function cheap.
+    """
+
+    def __init__(self, compiled, step: float):
+        self.compiled = compiled
+        self.step = step
+        self.first_node = None
+        self.values = np.zeros(1)
+        self.errors = np.zeros(1)
+        self.cells_computed = 0
+        self._lock = threading.Lock()
+
+    def _integrate_cells(self, first_node: int, count: int):
+        """Integral and error estimate of `count` cells starting at grid node `first_node`."""
+        half = self.step / 2
+        middles = (first_node + np.arange(count) + 0.5) * self.step
+        y_values = self.compiled.evaluate((middles[:, None] + half * _NODES).ravel()).reshape(count, len(_NODES))
+        kronrod = half * (y_values @ _K_WEIGHTS)
+        gauss = half * (y_values[:, _GAUSS_INDEX] @ _G_WEIGHTS)
+        errors = np.abs(kronrod - gauss)
+
+        # Cells that aren't smooth enough for one fixed rule get adaptive quadrature
+        rough = ~(errors <= np.maximum(CELL_TOLERANCE, 1e-12 * np.abs(kronrod)))
+        for i in np.nonzero(rough)[0]:
+            left = (first_node + i) * self.step
+            kronrod[i], errors[i] = _quad(self.compiled, left, left + self.step)
+        self.cells_computed += count
+        record("evaluations", ("cumulative",), y_values.size)
+        return kronrod, errors
+
+    def _cover(self, low_node: int, high_node: int):
+        """Extend the table so it spans grid nodes low_node..high_node."""
+        if self.first_node is None:
+            cells, errors = self._integrate_cells(low_node, high_node - low_node)
+            self.first_node = low_node
+            self.values = np.concatenate(([0.0], np.cumsum(cells)))
+            self.errors = np.concatenate(([0.0], np.cumsum(errors)))
+            return
+
+        if low_node < self.first_node:
+            cells, errors = self._integrate_cells(low_node, self.first_node - low_node)
+            # New prefix sums for the added cells, then the old table shifted by their total
+            self.values = np.concatenate(([0.0], np.cumsum(cells)[:-1], self.values + cells.sum()))
+            self.errors = np.concatenate(([0.0], np.cumsum(errors)[:-1], self.errors + errors.sum()))
+            self.first_node = low_node
+
+        last_node = self.first_node + len(self.values) - 1
+        if high_node > last_node:
+            cells, errors = self._integrate_cells(last_node, high_node - last_node)
+            self.values = np.concatenate((self.values, self.values[-1] + np.cumsum(cells)))
+            self.errors = np.concatenate((self.errors, self.errors[-1] + np.cumsum(errors)))
+
+    def integral(self, start_x: float, end_x: float):
+        """Integral over [start_x, end_x] as (area, error estimate), or None if the table would get too big."""
+        if start_x > end_x:
+            result = self.integral(end_x, start_x)
+            return None if result is None else (-result[0], result[1])
+
+        low_node = math.ceil(start_x / self.step)
+        high_node = math.floor(end_x / self.step)
+        if low_node >= high_node:
+            # Less than one whole cell: nothing to look up
+            return _quad(self.compiled, start_x, end_x)
+
+        with self._lock:
+            if self.first_node is not None:
+                last_node = self.first_node + len(self.values) - 1
+                if high_node < self.first_node or low_node > last_node:
+                    # Disjoint from the table: start over rather than integrate
+                    # the unknown stretch in between, which may not be defined
+                    self.first_node = None
+            if self.first_node is not None:
+                span = max(high_node, last_node) - min(low_node, self.first_node)
+            else:
+                span = high_node - low_node
+            if span > MAX_TABLE_CELLS:
+                return None
+            self._cover(low_node, high_node)
+            i, j = low_node - self.first_node, high_node - self.first_node
+            area = self.values[j] - self.values[i]
+            error = self.errors[j] - self.errors[i]
+
+        left, left_error = _quad(self.compiled, start_x, low_node * self.step)
+        right, right_error = _quad(self.compiled, high_node * self.step, end_x)
+        return area + left + right, error + left_error + right_error
+
+
+def cumulative_integral(parsed, start_x: float, end_x: float) -> CumulativeIntegral:
+    """The cached cumulative table of an expression at the grid size suited to this interval."""
+    width = abs(end_x - start_x)
+    exponent = math.floor(math.log2(width / CELLS_PER_INTERVAL)) if width > 0 else 0
+    tables = parsed.derived.setdefault("cumulative_integrals", {})
+    if exponent not in tables:
+        if len(tables) >= MAX_TABLES_PER_EXPRESSION:
+            tables.pop(next(iter(tables)))
+        tables[exponent] = CumulativeIntegral(parsed.compiled, 2.0 ** exponent)
+    return tables[exponent]
+
+
+def definite_integral(parsed, start_x: float, end_x: float, x_values, y_values):
+    """Integrate the expression over [start_x, end_x].
+
+    `x_values`/`y_values` are the plot samples of the integrand over the same
+    interval, used to check that the closed form is safe to use. Returns
+    (area, error estimate, method) where method is "symbolic" when the area
+    came from F(b) - F(a), "cumulative" when it came from the expression's
+    cumulative integral table and "quadrature" for a plain integrate.quad.
+
+    The first time an expression is integrated it is answered numerically
+    unless its antiderivative is already stored: integrate() can spend its
+    whole deadline finding nothing, and most as-you-type expressions are
+    never asked for again. The closed form is looked for once the
+    expression repeats.
+    """
+    repeated = parsed.derived.get("integrated", False)
+    parsed.derived["integrated"] = True
+    F = antiderivative(parsed, search=repeated)
+    if F is not None:
+        area = _antiderivative_area(F, x_values, y_values)
+        if area is not None:
+            return float(area), 0.0, "symbolic"
+
+    with stage_deadline("quad"):
+        # Poles and gaps are left to quad over the whole interval, as before
+        if not np.isnan(y_values).any():
+            result = cumulative_integral(parsed, start_x, end_x).integral(start_x, end_x)
+            # A table summed past the float range holds inf or NaN; let quad have a go
+            if result is not None and math.isfinite(result[0]) and math.isfinite(result[1]):
+                return float(result[0]), float(result[1]), "cumulative"
+        try:
+            area, error = _quad(parsed.compiled, start_x, end_x)
+        except Overflow:
+            area = math.inf
+    if not math.isfinite(area):
+        raise ValueError("Area is too large to represent over this interval")
+    return area, error, "quadrature"
@@ -0,0 +1,115 @@
+import math
+from fractions import Fraction
+
+import numpy as np
+from sympy import E, Float, Rational, S, latex, pi
+
+# f is sampled at a ± h for h = first, first/2, ... from each of these first
+# steps, and each sequence is extrapolated to h = 0. Halving steps alone let
+# f oscillating in 1/(x - a), like sin(pi/x), hit the same value every time;
+# the irrational second start keeps both sequences from doing so at once
+FIRST_STEPS = (1 / 16, 1 / (16 * math.sqrt(2)))
+STEPS = 10
+# Extrapolation is trusted when successive estimates agree to this (relative)
+CONVERGENCE = 1e-9
+# How close the two sides, or a side and f(a), must be to count as equal
+AGREEMENT = 1e-7
+# Extrapolated results this close (relatively) to a fraction with a small
+# denominator (times pi or e) are reported as that exact value
+MAX_DENOMINATOR = 1000
+SNAP_TOLERANCE = 1e-9
+
+
+def _extrapolate(values: np.ndarray):
+    """Richardson extrapolation of f(a ± h) to h = 0 for h halving at each step.
+
+    Returns (estimate, error estimate), taking the diagonal entry whose
+    change from the previous one is smallest, or None if any sample is
+    undefined.
+    """
+    if np.isnan(values).any():
+        return None
+    table = [values[0]]
+    best = None
+    for i in range(1, len(values)):
+        row = [values[i]]
+        for j in range(1, i + 1):
+            row.append(row[j - 1] + (row[j - 1] - table[j - 1]) / (2 ** j - 1))
+        error = abs(row[i] - table[i - 1])
+        if best is None or error < best[1]:
+            best = (row[i], error)
+        table = row
+    return best
+
+
+def _converged(side) -> bool:
+    return side is not None and side[1] <= CONVERGENCE * max(1.0, abs(side[0]))
+
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= AGREEMENT * max(1.0, abs(a), abs(b))
+
+
+def _side(compiled, approach_value: float, sign: int):
+    """Extrapolated limit of f(a + sign * h) as h -> 0, or None unless every
+    step sequence converges, and all to the same value."""
+    estimates = [_extrapolate(compiled.evaluate(approach_value + sign * first * 2.0 ** -np.arange(STEPS)))
+                 for first in FIRST_STEPS]
+    if not all(_converged(estimate) for estimate in estimates):
+        return None
+    if not all(_close(estimate[0], estimates[0][0]) for estimate in estimates):
+        return None
+    return estimates[0]
+
+
+def numeric_limit(compiled, approach_value: float, direction: str = None):
+    """Cheap limit of f at `approach_value` as (value, tier), or None if inconclusive.
+
+    Tier "substitution": f is defined at the point and f(a ± h) tends to
+    f(a) from the requested side(s), so the limit is just f(a). Tier
+    "numeric": f(a ± h) converges from each requested side, and for a
+    two-sided limit both sides agree. Infinite and oscillating limits
+    don't converge here, or not on both step sequences, and are left to SymPy.
+    """
+    if not compiled.is_numeric:
+        return None
+    signs = {"+": [1], "-": [-1]}.get(direction, [1, -1])
+    sides = [_side(compiled, approach_value, sign) for sign in signs]
+    if any(side is None for side in sides):
+        return None
+
+    try:
+        center = compiled(approach_value)
+    except ValueError:
+        center = None
+    if center is not None and all(_close(side[0], center) for side in sides):
+        return center, "substitution"
+    if len(sides) == 2 and not _close(sides[0][0], sides[1][0]):
+        # The one-sided limits differ
+        return None
+    return sum(side[0] for side in sides) / len(sides), "numeric"
+
+
+def decimal(value: float):
+    """(value, LaTeX) for a limit taken as is: integers without a decimal point."""
+    if value.is_integer() and abs(value) < 1e15:
+        return value, latex(S(int(value)))
+    return value, latex(Float(value, 15))
+
+
+def snap(value: float):
+    """(value, LaTeX) for a numeric limit, written as a fraction (or a fraction
+    of pi or e) when it is within SNAP_TOLERANCE of one, relative to the value.
+
+    Only extrapolated limits are snapped: they carry an error, but one
+    relative to their size, so a tiny value is never taken for 0.
+    """
+    if value == 0:
+        return 0.0, "0"
+    for constant in (S.One, pi, E):
+        scaled = value / float(constant)
+        fraction = Fraction(scaled).limit_denominator(MAX_DENOMINATOR)
+        if fraction != 0 and abs(fraction - scaled) <= SNAP_TOLERANCE * abs(scaled):
+            exact = Rational(fraction.numerator, fraction.denominator) * constant
+            return float(exact), latex(exact)
+    return decimal(value)
@@ -1,13 +1,57 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from sympy import Symbol, latex, diff, solve, limit, oo
-from sympy.parsing.sympy_parser import parse_expr, standard_transformations, implicit_multiplication_application, convert_xor
-from scipy import integrate
-import numpy as np
-from typing import Optional, List
+# Imported first so the startup timing covers every other import
+from startup import WARMUP_ENABLED, prepare, startup_state, warm_up
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
 
-app = FastAPI()
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response, WebSocket
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+
+from admission import admission_stats
+from batch import run_batch
+from cache_stats import combine_expression_stats, combine_store_stats
+from dispatch import cached_calculation, run_calculation
+from executor import compute_executor
+from metrics import MetricsMiddleware, drain, registry, timed
+from profiling import PROFILING_ENABLED, profile_store, summarize
+from response_cache import CachedResponse, response_cache
+from sessions import Session, session_stats
+from single_flight import single_flight
+from models import (IntegralRequest, IntegralResponse, DerivativeRequest, DerivativeResponse,
+                    CriticalPointsRequest, CriticalPointsResponse, LimitRequest, LimitResponse,
+                    BatchRequest, BatchResponse)
+
+# Collect parse cache counters from the workers, where the parsing actually happens.
+# Named rather than imported: expression_cache pulls in SymPy, which this
+# process only loads on first use (see startup.py)
+compute_executor.add_stats_hook("expression_cache", "expression_cache:cache_stats")
+compute_executor.add_stats_hook("symbolic_cache", "symbolic_store:store_stats")
+# Stage timings and evaluation counts recorded in the workers since their last task
+compute_executor.add_stats_hook("metrics", drain, merge=registry.absorb)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    warming = None
+    if WARMUP_ENABLED:
+        # Workers start together and warm up before their first task, forked
+        # from a fork server that has imported the calculation modules once
+        if warm_up not in compute_executor.initializers:
+            compute_executor.initializers.append(warm_up)
+        if "calculations" not in compute_executor.preload:
+            compute_executor.preload.append("calculations")
+        compute_executor.prestart = True
+        warming = asyncio.create_task(prepare(compute_executor))
+    else:
+        startup_state.mark_ready()
+    yield
+    if warming is not None:
+        warming.cancel()
+    compute_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -18,268 +62,173 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Lets the frontend read profiles of its own requests
+    expose_headers=["X-Profile"],
 )
-
-class IntegralRequest(BaseModel):
-    function_string: str
-    start_x: float
-    end_x: float
-
-class IntegralResponse(BaseModel):
-    latex_expression: str
-    area: float
-    function_points: list = []
-    error: Optional[str] = None
-
-class DerivativeRequest(BaseModel):
-    function_string: str
-    eval_point: Optional[float] = None
-    start_x: Optional[float] = None
-    end_x: Optional[float] = None
-
-class DerivativeResponse(BaseModel):
-    latex_expression: str
-    derivative_latex: str
-    derivative_value: Optional[float] = None
-    function_points: list = []
-    derivative_points: list = []
-    error: Optional[str] = None
-
-class CriticalPointsRequest(BaseModel):
-    function_string: str
-    start_x: float
-    end_x: float
-
-class CriticalPointsResponse(BaseModel):
-    latex_expression: str
-    critical_points: list = []
-    function_points: list = []
-    error: Optional[str] = None
-
-class LimitRequest(BaseModel):
-    function_string: str
-    approach_value: float
-    direction: Optional[str] = None  # '+', '-', or None for both sides
-
-class LimitResponse(BaseModel):
-    latex_expression: str
-    limit_value: Optional[float] = None
-    limit_latex: str
-    error: Optional[str] = None
+app.add_middleware(MetricsMiddleware, routes=app.routes)
+
+def _json_response(result) -> Response:
+    # Encode with pydantic's serializer directly; FastAPI would otherwise
+    # re-validate the model and convert it to plain dicts before encoding
+    with timed("serialization"):
+        content = result.model_dump_json()
+    return Response(content=content, media_type="application/json")
+
+def profile_requested(request: Request) -> bool:
+    """Whether the client asked for a profile with an X-Profile header or ?profile=1, and profiling is enabled."""
+    if not PROFILING_ENABLED:
+        return False
+    flag = request.headers.get("x-profile") or request.query_params.get("profile") or ""
+    return flag.lower() in ("1", "true", "yes")
+
+async def _profiled_response(endpoint: str, request) -> Response:
+    """Calculate afresh under the profiler, bypassing the response cache.
+
+    The full report is kept for GET /profiles/{id}; its summary and id are
+    sent in the X-Profile header.
+    """
+    result, report = await run_calculation(endpoint, request, profile=True)
+    started = time.perf_counter()
+    content = result.model_dump_json()
+    report["stages_ms"]["serialization"] = round((time.perf_counter() - started) * 1000, 3)
+    report["endpoint"] = endpoint
+    profile_id = profile_store.add(report)
+    return Response(content=content, media_type="application/json",
+                    headers={"X-Profile": summarize(profile_id, report)})
+
+async def _respond(endpoint: str, request, profile: bool, if_none_match: Optional[str] = None) -> Response:
+    if profile:
+        return await _profiled_response(endpoint, request)
+    return _cached_response(await cached_calculation(endpoint, request), if_none_match)
+
+def _cached_response(entry: CachedResponse, if_none_match: Optional[str] = None) -> Response:
+    headers = {"ETag": entry.etag}
+    if if_none_match is not None:
+        # GET variants may be stored by browsers and CDNs
+        headers["Cache-Control"] = f"public, max-age={int(response_cache.ttl)}"
+        if entry.matches(if_none_match):
+            return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
 
 @app.get("/test")
 async def test_endpoint():
     return {"message": "Backend is working!"}
 
+@app.get("/ready")
+async def ready_endpoint():
+    # For load balancers and autoscalers: 503 until warm-up has finished
+    return JSONResponse(startup_state.stats(), status_code=200 if startup_state.ready else 503)
+
+@app.get("/stats")
+async def stats_endpoint():
+    return {
+        "expression_cache": combine_expression_stats(compute_executor.worker_stats("expression_cache")),
+        "symbolic_cache": combine_store_stats(compute_executor.worker_stats("symbolic_cache")),
+        "response_cache": response_cache.stats(),
+        "executor": compute_executor.stats(),
+        "sessions": dict(session_stats),
+        "coalescing": single_flight.stats(),
+        "admission": admission_stats(),
+        "startup": startup_state.stats(),
+    }
+
+def _scraped_metrics() -> list:
+    """Values /metrics reads from the caches, executor and sessions when scraped."""
+    expressions = combine_expression_stats(compute_executor.worker_stats("expression_cache"))
+    symbolic = combine_store_stats(compute_executor.worker_stats("symbolic_cache"))
+    responses = response_cache.stats()
+    executor = compute_executor.stats()
+    admission = admission_stats()
+    caches = {"expression": expressions, "symbolic": symbolic, "response": responses}
+    return [
+        ("area_cache_hits_total", "counter", "Cache lookups answered from the cache", ("cache",),
+         {(name,): stats["hits"] for name, stats in caches.items()}),
+        ("area_cache_misses_total", "counter", "Cache lookups that missed", ("cache",),
+         {(name,): stats["misses"] for name, stats in caches.items()}),
+        ("area_cache_hit_ratio", "gauge", "Share of cache lookups answered from the cache", ("cache",),
+         {(name,): stats["hit_ratio"] for name, stats in caches.items()}),
+        ("area_executor_in_flight", "gauge", "Calculations running or queued", (), executor["in_flight"]),
+        ("area_executor_queue_depth", "gauge", "Calculations waiting for a worker", (), executor["queue_depth"]),
+        ("area_executor_timeouts_total", "counter", "Calculations stopped at their deadline", (),
+         executor["timeouts"]),
+        ("area_lane_active", "gauge", "Calculations running in each lane", ("lane",),
+         {(lane,): stats["active"] for lane, stats in admission.items()}),
+        ("area_lane_waiting", "gauge", "Calculations waiting for a slot in each lane", ("lane",),
+         {(lane,): stats["waiting"] for lane, stats in admission.items()}),
+        ("area_sessions_active", "gauge", "Open WebSocket sessions", (), session_stats["active"]),
+        ("area_calculations_in_flight", "gauge", "Distinct calculations being awaited by HTTP requests", (),
+         single_flight.stats()["in_flight"]),
+        ("area_ready", "gauge", "1 once startup warm-up has finished", (), int(startup_state.ready)),
+        ("area_startup_seconds", "gauge", "Duration of each startup phase", ("phase",),
+         {(phase,): seconds for phase, seconds in (("import", startup_state.import_seconds),
+                                                   ("workers", startup_state.workers_seconds),
+                                                   ("ready", startup_state.ready_seconds))
+          if seconds is not None}),
+    ]
+
+registry.add_collector(_scraped_metrics)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    # Prometheus text exposition format; everything is aggregated only now
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/profiles/{profile_id}")
+async def profile_endpoint(profile_id: str):
+    report = profile_store.get(profile_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired profile")
+    return report
+
 @app.post("/calculate-integral", response_model=IntegralResponse)
-async def calculate_integral(request: IntegralRequest):
-    try:        
-        # Parse the function string with enhanced transformations for implicit multiplication
-        x = Symbol('x')
-          # Use transformations that support implicit multiplication (e.g., "2x", "sin x") and convert ^ to **
-        transformations = standard_transformations + (convert_xor, implicit_multiplication_application,)
-        expr = parse_expr(request.function_string, transformations=transformations)
-        
-        # Convert to a callable function
-        f = lambda x_val: float(expr.subs(x, x_val))
-        
-        # Calculate the definite integral
-        area, error = integrate.quad(f, request.start_x, request.end_x)
-          # Generate function points for plotting
-        num_points = 200
-        x_values = np.linspace(request.start_x, request.end_x, num_points)
-        y_values = []
-        for x_val in x_values:
-            try:
-                y_values.append(float(expr.subs(x, x_val)))
-            except:
-                y_values.append(None)  # Handle undefined points
-          # Create list of [x, y] pairs
-        function_points = [{"x": float(x_val), "y": float(y_val) if y_val is not None else None} 
-                          for x_val, y_val in zip(x_values, y_values) if y_val is not None]        # Generate LaTeX string without dollar signs for KaTeX display mode
-        latex_expr = latex(expr)
-        # Remove dollar signs if present since KaTeX displayMode handles them
-        if latex_expr.startswith('$') and latex_expr.endswith('$'):
-            latex_expr = latex_expr[1:-1]
-        
-        return IntegralResponse(
-            latex_expression=latex_expr,
-            area=area,
-            function_points=function_points,
-            error=None if error < 1e-10 else f"Numerical error: {error}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=400,
-            detail=str(e)
-        )
+async def calculate_integral(request: IntegralRequest, profile: bool = Depends(profile_requested)):
+    return await _respond("integral", request, profile)
+
+@app.get("/calculate-integral", response_model=IntegralResponse)
+async def calculate_integral_get(request: IntegralRequest = Depends(), if_none_match: str = Header(""),
+                                 profile: bool = Depends(profile_requested)):
+    return await _respond("integral", request, profile, if_none_match)
 
 @app.post("/calculate-derivative", response_model=DerivativeResponse)
-async def calculate_derivative(request: DerivativeRequest):
-    try:
-        x = Symbol('x')
-        transformations = standard_transformations + (convert_xor, implicit_multiplication_application,)
-        expr = parse_expr(request.function_string, transformations=transformations)
-        
-        # Calculate the derivative
-        derivative_expr = diff(expr, x)
-        
-        # Generate LaTeX strings
-        latex_expr = latex(expr)
-        derivative_latex = latex(derivative_expr)
-        
-        # Calculate derivative value at evaluation point if provided
-        derivative_value = None
-        if request.eval_point is not None:
-            try:
-                derivative_value = float(derivative_expr.subs(x, request.eval_point))
-            except (TypeError, ValueError, AttributeError):
-                derivative_value = None
-        
-        # Generate function and derivative points for plotting
-        function_points = []
-        derivative_points = []
-        
-        if request.start_x is not None and request.end_x is not None:
-            num_points = 200
-            x_values = np.linspace(request.start_x, request.end_x, num_points)
-            
-            for x_val in x_values:
-                try:
-                    y_val = float(expr.subs(x, x_val))
-                    function_points.append({"x": float(x_val), "y": y_val})
-                except (TypeError, ValueError, AttributeError):
-                    pass
-                try:
-                    dy_val = float(derivative_expr.subs(x, x_val))
-                    derivative_points.append({"x": float(x_val), "y": dy_val})
-                except (TypeError, ValueError, AttributeError):
-                    pass
-        
-        return DerivativeResponse(
-            latex_expression=latex_expr,
-            derivative_latex=derivative_latex,
-            derivative_value=derivative_value,
-            function_points=function_points,
-            derivative_points=derivative_points,
-            error=None
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=400,
-            detail=str(e)
-        )
+async def calculate_derivative(request: DerivativeRequest, profile: bool = Depends(profile_requested)):
+    return await _respond("derivative", request, profile)
+
+@app.get("/calculate-derivative", response_model=DerivativeResponse)
+async def calculate_derivative_get(request: DerivativeRequest = Depends(), if_none_match: str = Header(""),
+                                   profile: bool = Depends(profile_requested)):
+    return await _respond("derivative", request, profile, if_none_match)
 
 @app.post("/find-critical-points", response_model=CriticalPointsResponse)
-async def find_critical_points(request: CriticalPointsRequest):
-    try:
-        x = Symbol('x')
-        transformations = standard_transformations + (convert_xor, implicit_multiplication_application,)
-        expr = parse_expr(request.function_string, transformations=transformations)
-        
-        # Calculate the first derivative
-        first_derivative = diff(expr, x)
-        
-        # Calculate the second derivative for classification
-        second_derivative = diff(first_derivative, x)
-        
-        # Solve for critical points where first derivative equals zero
-        critical_solutions = solve(first_derivative, x)
-        
-        # Filter and classify critical points within the given range
-        critical_points = []
-        for sol in critical_solutions:
-            try:
-                sol_float = float(sol)
-                if request.start_x <= sol_float <= request.end_x:
-                    # Classify the critical point using second derivative test
-                    second_deriv_val = float(second_derivative.subs(x, sol_float))
-                    func_val = float(expr.subs(x, sol_float))
-                    
-                    if second_deriv_val > 0:
-                        point_type = "minimum"
-                    elif second_deriv_val < 0:
-                        point_type = "maximum"
-                    else:
-                        point_type = "inflection"
-                    
-                    critical_points.append({
-                        "x": sol_float,
-                        "y": func_val,
-                        "type": point_type
-                    })
-            except (TypeError, ValueError):
-                # Skip complex or non-numeric solutions
-                pass
-        
-        # Generate function points for plotting
-        num_points = 200
-        x_values = np.linspace(request.start_x, request.end_x, num_points)
-        function_points = []
-        
-        for x_val in x_values:
-            try:
-                y_val = float(expr.subs(x, x_val))
-                function_points.append({"x": float(x_val), "y": y_val})
-            except (TypeError, ValueError, AttributeError):
-                pass
-        
-        latex_expr = latex(expr)
-        
-        return CriticalPointsResponse(
-            latex_expression=latex_expr,
-            critical_points=critical_points,
-            function_points=function_points,
-            error=None
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=400,
-            detail=str(e)
-        )
+async def find_critical_points(request: CriticalPointsRequest, profile: bool = Depends(profile_requested)):
+    return await _respond("critical_points", request, profile)
+
+@app.get("/find-critical-points", response_model=CriticalPointsResponse)
+async def find_critical_points_get(request: CriticalPointsRequest = Depends(), if_none_match: str = Header(""),
+                                   profile: bool = Depends(profile_requested)):
+    return await _respond("critical_points", request, profile, if_none_match)
 
 @app.post("/calculate-limit", response_model=LimitResponse)
-async def calculate_limit(request: LimitRequest):
-    try:
-        x = Symbol('x')
-        transformations = standard_transformations + (convert_xor, implicit_multiplication_application,)
-        expr = parse_expr(request.function_string, transformations=transformations)
-        
-        # Calculate limit based on direction
-        if request.direction == '+':
-            limit_result = limit(expr, x, request.approach_value, '+')
-        elif request.direction == '-':
-            limit_result = limit(expr, x, request.approach_value, '-')
-        else:
-            limit_result = limit(expr, x, request.approach_value)
-        
-        # Try to convert to float
-        limit_value = None
-        try:
-            if limit_result == oo:
-                limit_latex = r"\infty"
-            elif limit_result == -oo:
-                limit_latex = r"-\infty"
-            else:
-                limit_value = float(limit_result)
-                limit_latex = latex(limit_result)
-        except (TypeError, ValueError):
-            limit_latex = latex(limit_result)
-        
-        latex_expr = latex(expr)
-        
-        return LimitResponse(
-            latex_expression=latex_expr,
-            limit_value=limit_value,
-            limit_latex=limit_latex,
-            error=None
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=400,
-            detail=str(e)
-        )
+async def calculate_limit(request: LimitRequest, profile: bool = Depends(profile_requested)):
+    return await _respond("limit", request, profile)
+
+@app.get("/calculate-limit", response_model=LimitResponse)
+async def calculate_limit_get(request: LimitRequest = Depends(), if_none_match: str = Header(""),
+                              profile: bool = Depends(profile_requested)):
+    return await _respond("limit", request, profile, if_none_match)
+
+@app.post("/batch", response_model=BatchResponse)
+async def calculate_batch(request: BatchRequest):
+    # Failures are reported per job, so the batch as a whole always succeeds
+    return _json_response(await run_batch(request.jobs))
+
+@app.websocket("/ws/session")
+async def calculation_session(websocket: WebSocket):
+    # Long-lived alternative to the POST endpoints for as-you-type clients
+    await Session(websocket).run()
+
+startup_state.imported()
 
 if __name__ == "__main__":
+    # One process, for development; server.py runs several that share their caches
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
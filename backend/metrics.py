@@ -0,0 +1,239 @@
+"""Prometheus text-format metrics without a client library.
+
+Recording is a list append: stage timings, evaluation counts and errors are
+queued as small events wherever they happen, including worker processes.
+Workers ship their queue back with every task result (see the executor's
+stats hooks). The API process folds its queue into the counters and
+histograms at the end of every HTTP request, on every message of a
+WebSocket session, and when /metrics is scraped, so the queue never holds
+more than what one request recorded.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds; calculations range from sub-millisecond cache
+# hits to the 15s critical points deadline
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 15.0)
+
+_pending = []
+_pending_lock = threading.Lock()
+# Lists receiving a copy of every event while a profile is taken
+_captures = []
+
+
+def record(kind: str, labels: tuple, value: float = 1.0):
+    """Queue one event: kind names the metric, labels are its label values."""
+    with _pending_lock:
+        _pending.append((kind, labels, value))
+        for events in _captures:
+            events.append((kind, labels, value))
+
+
+def drain() -> list:
+    """Take every event queued in this process so far."""
+    global _pending
+    with _pending_lock:
+        events, _pending = _pending, []
+    return events
+
+
+def _forget_inherited():
+    # A forked process (compute worker, server process) starts with a copy of
+    # its parent's queue; those events are the parent's to report
+    global _pending, _pending_lock, _captures
+    _pending, _pending_lock, _captures = [], threading.Lock(), []
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_inherited)
+
+
+@contextmanager
+def captured():
+    """Yield a list that collects a copy of the events recorded in the enclosed block."""
+    events = []
+    with _pending_lock:
+        _captures.append(events)
+    try:
+        yield events
+    finally:
+        with _pending_lock:
+            _captures.remove(events)
+
+
+@contextmanager
+def timed(stage: str):
+    """Record how long the enclosed block took as a stage duration."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record("stage", (stage,), time.perf_counter() - started)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> [count per bucket (+Inf last), sum, count]
+
+    def observe(self, labels: tuple, value: float):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound if bound == "+Inf" else f"{bound:g}"}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total:.6g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """Counters and histograms fed by events, plus gauges read at scrape time."""
+
+    def __init__(self):
+        self.request_duration = Histogram(
+            "area_http_request_duration_seconds", "Time to answer an HTTP request", ("path", "method"))
+        self.requests = Counter(
+            "area_http_requests_total", "HTTP requests answered", ("path", "method", "status"))
+        self.stage_duration = Histogram(
+            "area_stage_duration_seconds", "Time spent in each stage of a calculation", ("stage",))
+        self.evaluations = Counter(
+            "area_integrand_evaluations_total", "Integrand evaluations by integration method", ("method",))
+        self.errors = Counter(
+            "area_calculation_errors_total", "Failed calculations by endpoint and error type", ("endpoint", "type"))
+        self.coalesced = Counter(
+            "area_requests_coalesced_total", "Requests that shared a calculation already running", ("endpoint",))
+        self.lanes = Counter(
+            "area_calculations_total", "Calculations by endpoint and the lane their estimated cost chose",
+            ("endpoint", "lane"))
+        self.rejected = Counter(
+            "area_admission_rejected_total", "Calculations turned away with 429 because their lane was full",
+            ("lane",))
+        self.in_flight = {}  # path -> requests being handled
+        self._collectors = []
+        self._handlers = {
+            "stage": lambda labels, value: self.stage_duration.observe(labels, value),
+            "evaluations": lambda labels, value: self.evaluations.inc(labels, value),
+            "error": lambda labels, value: self.errors.inc(labels, value),
+            "coalesced": lambda labels, value: self.coalesced.inc(labels, value),
+            "lane": lambda labels, value: self.lanes.inc(labels, value),
+            "rejected": lambda labels, value: self.rejected.inc(labels, value),
+        }
+
+    def absorb(self, events: list):
+        for kind, labels, value in events:
+            self._handlers[kind](labels, value)
+
+    def add_collector(self, collect):
+        """Register a function called at scrape time for values kept elsewhere.
+
+        It returns (name, type, help, label names, values) tuples, values
+        being a number or a dict from label values to numbers.
+        """
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        self.absorb(drain())
+        lines = []
+        for metric in (self.request_duration, self.requests, self.stage_duration, self.evaluations, self.errors,
+                       self.coalesced, self.lanes, self.rejected):
+            lines.extend(metric.render())
+
+        scraped = [("area_http_requests_in_flight", "gauge", "HTTP requests being handled", ("path",),
+                    {(path,): count for path, count in self.in_flight.items()})]
+        for collect in self._collectors:
+            scraped.extend(collect())
+        for name, metric_type, help, label_names, values in scraped:
+            lines.extend([f"# HELP {name} {help}", f"# TYPE {name} {metric_type}"])
+            if not isinstance(values, dict):
+                values = {(): values}
+            for labels, value in sorted(values.items()):
+                lines.append(f"{name}{_format_labels(label_names, labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route."""
+
+    def __init__(self, app, routes: list):
+        self.app = app
+        # The application's route list, read on the first request once every route exists
+        self.routes = routes
+        self.paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            async def receive_and_absorb():
+                # Sessions are long: fold in what earlier messages recorded
+                registry.absorb(drain())
+                return await receive()
+
+            try:
+                await self.app(scope, receive_and_absorb, send)
+            finally:
+                registry.absorb(drain())
+            return
+        if self.paths is None:
+            self.paths = {route.path for route in self.routes}
+        # Unknown paths (404 probes, ...) share one label so the series stay bounded
+        path = scope["path"] if scope["path"] in self.paths else "other"
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.in_flight[path] = registry.in_flight.get(path, 0) + 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            registry.in_flight[path] -= 1
+            registry.request_duration.observe((path, scope["method"]), time.perf_counter() - started)
+            registry.requests.inc((path, scope["method"], str(status)))
+            registry.absorb(drain())
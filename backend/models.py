@@ -0,0 +1,120 @@
+from pydantic import BaseModel, Field
+from typing import Any, Optional, List, Dict, Literal, Union
+from typing_extensions import Annotated
+
+# "points" is a list of {"x", "y"} objects per curve; "columnar" returns one
+# shared x array plus a y array per curve in `columns`, which is much smaller
+# and faster to encode for large plots
+PointFormat = Literal["points", "columnar"]
+
+class PlotColumns(BaseModel):
+    x: List[float]
+    series: Dict[str, List[Optional[float]]]  # y values per curve, null where undefined or at a gap
+
+class IntegralRequest(BaseModel):
+    function_string: str
+    start_x: float
+    end_x: float
+    pixel_width: Optional[int] = Field(None, ge=2, le=10000)  # plot width, caps sampled points
+    point_format: PointFormat = "points"
+
+class IntegralResponse(BaseModel):
+    latex_expression: str
+    area: float
+    method: Optional[str] = None  # "symbolic" (F(b) - F(a)), "cumulative" (cached integral table) or "quadrature"
+    function_points: list = []
+    columns: Optional[PlotColumns] = None
+    canonical_key: Optional[str] = None  # same for every spelling of the same expression
+    error: Optional[str] = None
+
+class DerivativeRequest(BaseModel):
+    function_string: str
+    eval_point: Optional[float] = None
+    start_x: Optional[float] = None
+    end_x: Optional[float] = None
+    pixel_width: Optional[int] = Field(None, ge=2, le=10000)  # plot width, caps sampled points
+    point_format: PointFormat = "points"
+
+class DerivativeResponse(BaseModel):
+    latex_expression: str
+    derivative_latex: str
+    derivative_value: Optional[float] = None
+    function_points: list = []
+    derivative_points: list = []
+    columns: Optional[PlotColumns] = None
+    canonical_key: Optional[str] = None
+    error: Optional[str] = None
+
+# "numeric" finds roots of the compiled derivative in the interval, "symbolic"
+# uses SymPy's solve() (exact, but can be slow), "hybrid" runs the numeric
+# search and then replaces its roots with exact ones if solve() finishes in time
+CriticalPointsMethod = Literal["numeric", "symbolic", "hybrid"]
+
+class CriticalPointsRequest(BaseModel):
+    function_string: str
+    start_x: float
+    end_x: float
+    pixel_width: Optional[int] = Field(None, ge=2, le=10000)  # plot width, caps sampled points
+    point_format: PointFormat = "points"
+    method: CriticalPointsMethod = "numeric"
+
+class CriticalPointsResponse(BaseModel):
+    latex_expression: str
+    method: Optional[CriticalPointsMethod] = None
+    critical_points: list = []
+    function_points: list = []
+    columns: Optional[PlotColumns] = None
+    canonical_key: Optional[str] = None
+    error: Optional[str] = None
+
+class LimitRequest(BaseModel):
+    function_string: str
+    approach_value: float
+    direction: Optional[str] = None  # '+', '-', or None for both sides
+
+class LimitResponse(BaseModel):
+    latex_expression: str
+    limit_value: Optional[float] = None
+    limit_latex: str
+    tier: Optional[str] = None  # "substitution", "numeric" or "symbolic": which step found the limit
+    canonical_key: Optional[str] = None
+    error: Optional[str] = None
+
+# Batch jobs are the single-endpoint requests tagged with which calculation to run
+class IntegralJob(IntegralRequest):
+    type: Literal["integral"]
+
+class DerivativeJob(DerivativeRequest):
+    type: Literal["derivative"]
+
+class CriticalPointsJob(CriticalPointsRequest):
+    type: Literal["critical_points"]
+
+class LimitJob(LimitRequest):
+    type: Literal["limit"]
+
+BatchJob = Annotated[Union[IntegralJob, DerivativeJob, CriticalPointsJob, LimitJob], Field(discriminator="type")]
+
+BATCH_MAX_JOBS = 1000
+
+class BatchRequest(BaseModel):
+    jobs: List[BatchJob] = Field(..., max_length=BATCH_MAX_JOBS)
+
+class BatchItemResult(BaseModel):
+    type: str
+    result: Optional[Union[IntegralResponse, DerivativeResponse, CriticalPointsResponse, LimitResponse]] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResult] = []  # same order as the request's jobs
+
+# Sent over /ws/session. "ok" carries the result, "error" the same status code
+# and detail the HTTP endpoint would have answered with, and "cancelled" means
+# a newer message on the same channel superseded this one
+class SessionReply(BaseModel):
+    id: Optional[Union[int, str]] = None  # echoed from the client's message
+    type: Optional[str] = None
+    status: Literal["ok", "error", "cancelled"]
+    result: Optional[Union[IntegralResponse, DerivativeResponse, CriticalPointsResponse, LimitResponse]] = None
+    status_code: Optional[int] = None
+    detail: Optional[Any] = None
@@ -0,0 +1,278 @@
+"""Evaluation plans: SymPy expressions compiled to a flat list of NumPy ufunc calls.
+
+lambdify() prints an expression to Python source and exec()s it, which
+costs milliseconds per expression and leaves an evaluator that allocates a
+fresh array for every intermediate result. A plan is built by walking the
+expression tree once: every distinct subexpression becomes one instruction
+(ufunc, output register, input registers or constants), constant
+subexpressions are folded to floats, and registers are reused as soon as
+their value is no longer needed. Evaluating then touches nothing but NumPy:
+one preallocated block of registers per call, each instruction writing
+into its register with out=.
+
+Out-of-domain inputs follow IEEE arithmetic, like the lambdified code did:
+log(-1), sqrt(-1) and asin(2) are NaN and propagate, and the final mask
+turns whatever is not finite (poles included) into NaN. Expressions with
+anything the plan has no ufunc for (complex constants, Piecewise,
+factorial, ...) raise Uncompilable and are left to lambdify().
+"""
+import math
+import operator
+from operator import itemgetter
+
+import numpy as np
+from scipy import special
+from sympy import Add, Mul, Pow, Symbol, sympify
+
+# Ufuncs of one argument, by SymPy function name
+UNARY = {
+    "sin": np.sin, "cos": np.cos, "tan": np.tan,
+    "asin": np.arcsin, "acos": np.arccos, "atan": np.arctan,
+    "sinh": np.sinh, "cosh": np.cosh, "tanh": np.tanh,
+    "asinh": np.arcsinh, "acosh": np.arccosh, "atanh": np.arctanh,
+    "exp": np.exp, "log": np.log, "Abs": np.abs, "sign": np.sign,
+    "floor": np.floor, "ceiling": np.ceil, "erf": special.erf, "erfc": special.erfc, "gamma": special.gamma,
+}
+# Functions defined as 1/f(a) or f(1/a), by SymPy function name
+RECIPROCAL_OF = {"cot": np.tan, "sec": np.cos, "csc": np.sin, "coth": np.tanh, "sech": np.cosh, "csch": np.sinh}
+OF_RECIPROCAL = {"acot": np.arctan, "asec": np.arccos, "acsc": np.arcsin,
+                 "acoth": np.arctanh, "asech": np.arccosh, "acsch": np.arcsinh}
+
+
+
+def _scalar_power(base: float, exponent: float) -> float:
+    result = base ** exponent
+    if isinstance(result, complex):
+        raise ValueError("Complex power")
+    return result
+
+
+# Python's float operations for each ufunc. They raise on a domain error or
+# overflow (math.log(-1), 1 / 0.0, math.exp(1000), ...) where the ufuncs
+# return NaN or inf
+SCALAR = {
+    np.add: operator.add, np.subtract: operator.sub, np.multiply: operator.mul, np.divide: operator.truediv,
+    np.power: _scalar_power, np.square: lambda a: a * a, np.sqrt: math.sqrt,
+    np.sin: math.sin, np.cos: math.cos, np.tan: math.tan,
+    np.arcsin: math.asin, np.arccos: math.acos, np.arctan: math.atan,
+    np.sinh: math.sinh, np.cosh: math.cosh, np.tanh: math.tanh,
+    np.arcsinh: math.asinh, np.arccosh: math.acosh, np.arctanh: math.atanh,
+    np.exp: math.exp, np.log: math.log, np.abs: abs, np.sign: lambda a: float((a > 0) - (a < 0)),
+    np.floor: math.floor, np.ceil: math.ceil, special.erf: math.erf, special.erfc: math.erfc,
+    special.gamma: math.gamma,
+}
+
+
+class Uncompilable(Exception):
+    """The expression has a part no ufunc computes; evaluate it some other way."""
+
+
+class NumericPlan:
+    """Several expressions in one symbol compiled into one plan, one output each.
+
+    Subexpressions the expressions share (f and its derivatives share most)
+    are computed once. `evaluate` returns one row per expression with NaN
+    where undefined.
+    """
+
+    def __init__(self, exprs, symbol: Symbol):
+        self.symbol = symbol
+        # (ufunc, output, inputs) on numbered values while compiling; an
+        # input is a value number or a float. Then (ufunc, output register,
+        # getter of the input registers) once registers are allocated
+        self.instructions = []
+        self.scratch_count = 0
+        # Expression rows evaluate() fills by copying: x, constants and repeats
+        self.copied_rows = []
+        self.constants = []
+        self._values = {}
+        values = [self._compile(sympify(expr)) for expr in exprs]
+        self._allocate(values)
+        del self._values
+
+    # Compilation to instructions on numbered values, one value per instruction
+
+    def _emit(self, ufunc, *inputs) -> int:
+        value = len(self.instructions) + 1  # value 0 is x
+        self.instructions.append((ufunc, value, inputs))
+        return value
+
+    def _compile(self, expr):
+        if expr in self._values:
+            return self._values[expr]
+        value = self._compile_new(expr)
+        self._values[expr] = value
+        return value
+
+    def _compile_new(self, expr):
+        if expr == self.symbol:
+            return 0
+        if not expr.free_symbols:
+            try:
+                return float(expr)
+            except (TypeError, ValueError, OverflowError):
+                raise Uncompilable(f"Not a real constant: {expr}")
+        if expr.free_symbols != {self.symbol}:
+            raise Uncompilable(f"Other symbols than {self.symbol}")
+
+        if isinstance(expr, Add):
+            return self._chain(np.add, [self._compile(arg) for arg in expr.args])
+        if isinstance(expr, Mul):
+            # x*y**-2 is x/y**2, as lambdify prints it
+            numerator, denominator = [], []
+            for arg in expr.args:
+                if isinstance(arg, Pow) and arg.exp.is_Number and arg.exp.is_negative:
+                    denominator.append(self._compile(Pow(arg.base, -arg.exp)))
+                else:
+                    numerator.append(self._compile(arg))
+            value = self._chain(np.multiply, numerator) if numerator else 1.0
+            if denominator:
+                value = self._emit(np.divide, value, self._chain(np.multiply, denominator))
+            return value
+        if isinstance(expr, Pow):
+            return self._power(expr)
+
+        name = type(expr).__name__
+        if len(expr.args) != 1:
+            raise Uncompilable(f"Unsupported function {name}")
+        argument = self._compile(expr.args[0])
+        if name in UNARY:
+            return self._emit(UNARY[name], argument)
+        if name in RECIPROCAL_OF:
+            return self._emit(np.divide, 1.0, self._emit(RECIPROCAL_OF[name], argument))
+        if name in OF_RECIPROCAL:
+            return self._emit(OF_RECIPROCAL[name], self._emit(np.divide, 1.0, argument))
+        raise Uncompilable(f"Unsupported function {name}")
+
+    def _power(self, expr):
+        base = self._compile(expr.base)
+        if not expr.exp.is_Number:
+            return self._emit(np.power, base, self._compile(expr.exp))
+        exponent = float(expr.exp)
+        if exponent == 0.5:
+            return self._emit(np.sqrt, base)
+        if exponent == 2:
+            return self._emit(np.square, base)
+        if exponent < 0:
+            return self._emit(np.divide, 1.0, self._compile(Pow(expr.base, -expr.exp)))
+        return self._emit(np.power, base, exponent)
+
+    def _chain(self, ufunc, values: list):
+        # Constants are folded into one, but kept in place when there are none to fold with
+        constants = [value for value in values if isinstance(value, float)]
+        result = values[0] if not constants else None
+        for value in values[1:] if result is not None else values:
+            if isinstance(value, float):
+                continue
+            result = value if result is None else self._emit(ufunc, result, value)
+        if constants:
+            folded = constants[0]
+            for constant in constants[1:]:
+                folded = float(ufunc(folded, constant))
+            result = folded if result is None else self._emit(ufunc, folded, result)
+        return result
+
+    # Register allocation. Registers are, in order: x, the output rows, the
+    # scratch rows and the constants. An expression's value is computed
+    # straight into its output row; a scratch row is reused once the last
+    # instruction reading its value has run
+
+    def _allocate(self, values: list):
+        last_use = {}
+        for position, (_, _, inputs) in enumerate(self.instructions):
+            for read in inputs:
+                if not isinstance(read, float):
+                    last_use[read] = position
+
+        registers = {0: 0}
+        for row, value in enumerate(values):
+            if isinstance(value, float) or value in registers:
+                self.copied_rows.append((row, value))
+            else:
+                registers[value] = 1 + row
+        self.output_count = len(values)
+
+        scratch = []  # scratch register of each value, by allocation order
+        free = []
+        instructions = []
+        for position, (ufunc, value, inputs) in enumerate(self.instructions):
+            mapped = []
+            for read in inputs:
+                if isinstance(read, float):
+                    self.constants.append(read)
+                    mapped.append(("constant", len(self.constants) - 1))
+                else:
+                    mapped.append(registers[read])
+            # Inputs read for the last time free their row, which the output
+            # may then take over: ufuncs work elementwise, in place
+            for read in set(inputs):
+                if not isinstance(read, float) and last_use[read] == position and registers[read] in scratch:
+                    free.append(registers[read])
+            if value not in registers:
+                if free:
+                    registers[value] = free.pop()
+                else:
+                    registers[value] = ("scratch", len(scratch))
+                    scratch.append(registers[value])
+            instructions.append((ufunc, registers[value], mapped))
+        self.scratch_count = len(scratch)
+
+        # Number the scratch rows and constants after the output rows
+        def number(register):
+            if isinstance(register, int):
+                return register
+            kind, index = register
+            offset = 1 + self.output_count + (self.scratch_count if kind == "constant" else 0)
+            return offset + index
+
+        self.instructions = [(ufunc, number(output), itemgetter(*[number(read) for read in mapped]), len(mapped))
+                             for ufunc, output, mapped in instructions]
+        self.copied_rows = [(row, value if isinstance(value, float) else number(registers[value]))
+                            for row, value in self.copied_rows]
+
+    def evaluate(self, x_values) -> np.ndarray:
+        """Every expression at `x_values`: one row each, NaN where undefined."""
+        x_values = np.asarray(x_values, dtype=float)
+        flat = x_values.ravel()
+        rows = np.empty((self.output_count, flat.size))
+        registers = [flat, *rows, *np.empty((self.scratch_count, flat.size)), *self.constants]
+        with np.errstate(all="ignore"):
+            for ufunc, output, inputs, arity in self.instructions:
+                if arity == 1:
+                    ufunc(inputs(registers), out=registers[output])
+                else:
+                    ufunc(*inputs(registers), out=registers[output])
+        for row, value in self.copied_rows:
+            rows[row] = value if isinstance(value, float) else registers[value]
+        rows[~np.isfinite(rows)] = np.nan
+        return rows.reshape((self.output_count,) + x_values.shape)
+
+    def value_at(self, x_val: float, overflow: float = math.nan) -> float:
+        """The first expression at a single point, NaN where undefined.
+
+        The scalar path used by integrate.quad: the same instructions with
+        Python's float operations, which are much cheaper than ufunc calls
+        on one number. Where one of them raises, the point is evaluated
+        again with the ufuncs, so an overflow carries on as inf (the
+        logistic 1/(1 + exp(-x)) is 0 far left) exactly as in evaluate().
+
+        A value that is out of float range rather than undefined (x^2 at
+        1e200, exp(x) at 1000) is returned as `overflow`.
+        """
+        registers = [float(x_val), *[None] * (self.output_count + self.scratch_count), *self.constants]
+        try:
+            for ufunc, output, inputs, arity in self.instructions:
+                function = SCALAR[ufunc]
+                registers[output] = function(inputs(registers)) if arity == 1 else function(*inputs(registers))
+        except OverflowError:
+            y_val = float(self.evaluate([x_val])[0, 0])
+            return y_val if math.isfinite(y_val) else overflow
+        except (ArithmeticError, ValueError):
+            return float(self.evaluate([x_val])[0, 0])
+        # The first row is register 1 unless it is copied from elsewhere
+        value = dict(self.copied_rows).get(0, 1)
+        y_val = float(value if isinstance(value, float) else registers[value])
+        if math.isinf(y_val):
+            # Float operations only reach inf by overflowing; poles raise
+            return overflow
+        return y_val if math.isfinite(y_val) else math.nan
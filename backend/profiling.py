@@ -0,0 +1,108 @@
+import cProfile
+import os
+import pstats
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import captured
+
+# Off by default: a profile slows its request down several times and shows
+# internals, so a deployment has to opt in before clients can ask for one
+PROFILING_ENABLED = os.environ.get("AREA_PROFILING", "").lower() in ("1", "true", "yes")
+# Functions listed in a report, by their own time
+TOP_FUNCTIONS = 15
+# Reports kept for GET /profiles/{id}
+MAX_PROFILES = 64
+
+
+def _sympy_cache_counters():
+    from sympy.core.cache import CACHE
+
+    hits = misses = 0
+    for cached in CACHE:
+        info = cached.cache_info()
+        hits += info.hits
+        misses += info.misses
+    return hits, misses
+
+
+def _top_functions(profiler: cProfile.Profile) -> list:
+    entries = sorted(pstats.Stats(profiler).stats.items(), key=lambda item: item[1][2], reverse=True)
+    return [{"function": f"{os.path.basename(filename)}:{line}({name})" if line else name,
+             "calls": calls,
+             "own_ms": round(own * 1000, 3),
+             "cumulative_ms": round(cumulative * 1000, 3)}
+            for (filename, line, name), (_, calls, own, cumulative, _) in entries[:TOP_FUNCTIONS]]
+
+
+def profile_call(fn, *args):
+    """Run fn(*args) under cProfile and return (result, report).
+
+    Runs where the calculation runs, i.e. in the worker process. The report
+    holds the wall time, the time per stage and integrand evaluations from
+    the metrics events recorded meanwhile, SymPy's cache hits and misses, and
+    the functions with the most own time.
+    """
+    hits, misses = _sympy_cache_counters()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    with captured() as events:
+        profiler.enable()
+        try:
+            result = fn(*args)
+        finally:
+            profiler.disable()
+    total = time.perf_counter() - started
+
+    stages, evaluations = {}, {}
+    for kind, labels, value in events:
+        if kind == "stage":
+            stages[labels[0]] = stages.get(labels[0], 0.0) + value * 1000
+        elif kind == "evaluations":
+            evaluations[labels[0]] = evaluations.get(labels[0], 0) + int(value)
+    hits_after, misses_after = _sympy_cache_counters()
+    report = {
+        "total_ms": round(total * 1000, 3),
+        "stages_ms": {stage: round(ms, 3) for stage, ms in stages.items()},
+        "evaluations": evaluations,
+        "sympy_cache": {"hits": hits_after - hits, "misses": misses_after - misses},
+        "top_functions": _top_functions(profiler),
+    }
+    return result, report
+
+
+def summarize(profile_id: str, report: dict) -> str:
+    """One-line form of a report for the X-Profile response header."""
+    parts = [f"id={profile_id}", f"total={report['total_ms']:.1f}ms"]
+    parts.extend(f"{stage}={ms:.1f}ms" for stage, ms in report["stages_ms"].items())
+    evaluations = sum(report["evaluations"].values())
+    if evaluations:
+        parts.append(f"evaluations={evaluations}")
+    parts.append(f"sympy_cache={report['sympy_cache']['hits']}/{report['sympy_cache']['misses']}")
+    return "; ".join(parts)
+
+
+class ProfileStore:
+    """The most recent reports by id, for clients that want more than the header."""
+
+    def __init__(self, maxsize: int = MAX_PROFILES):
+        self.maxsize = maxsize
+        self._reports = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, report: dict) -> str:
+        profile_id = secrets.token_hex(8)
+        with self._lock:
+            self._reports[profile_id] = report
+            while len(self._reports) > self.maxsize:
+                self._reports.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str):
+        with self._lock:
+            return self._reports.get(profile_id)
+
+
+profile_store = ProfileStore()
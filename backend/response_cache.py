@@ -0,0 +1,146 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from shared_cache import SQLiteCache
+
+# How long the shared cache waits for another process's write lock. It is
+# used on the event loop, where a busy cache had better miss than block
+SHARED_BUSY_TIMEOUT = 0.005
+
+
+class CachedResponse:
+    """An encoded JSON response body and its ETag."""
+
+    __slots__ = ("body", "etag", "expires")
+
+    def __init__(self, body: bytes, ttl: float):
+        self.body = body
+        # Strong validator: identical bodies always get the same tag
+        self.etag = '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        self.expires = time.monotonic() + ttl
+
+    def matches(self, if_none_match: str) -> bool:
+        """Whether an If-None-Match header value names this response."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+
+class ResponseCache:
+    """Bounded LRU cache of encoded endpoint responses that expire after `ttl` seconds.
+
+    The calculation endpoints are pure functions of their request model, so a
+    repeated request can be answered with the bytes encoded the first time.
+    Entries are dropped when they expire or fall off the end of the LRU.
+
+    With a `shared` SQLiteCache behind it, entries are also written there and
+    misses are looked up there, so processes serving the same app answer
+    each other's repeated requests.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, shared: SQLiteCache = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.shared = shared
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.expired = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedResponse:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires <= time.monotonic():
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        found = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if found is None:
+                self.misses += 1
+                return None
+            body, remaining = found
+            entry = CachedResponse(body, min(remaining, self.ttl))
+            self._entries[key] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            self.hits += 1
+            self.shared_hits += 1
+            return entry
+
+    def create(self, body: bytes) -> CachedResponse:
+        return CachedResponse(body, self.ttl)
+
+    def put(self, key: str, entry: CachedResponse):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        if self.shared is not None:
+            self.shared.put(key, entry.body, self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.shared_hits = 0
+            self.expired = 0
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_hits": self.shared_hits,
+                "expired": self.expired,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "shared": self.shared.stats() if self.shared is not None else None,
+            }
+
+
+def request_key(endpoint: str, request, expression_key: str = None) -> str:
+    """Cache key of a validated request: defaults filled in and numbers normalized,
+    so e.g. `"end_x": 1` and `"end_x": 1.0` share an entry. With the canonical
+    `expression_key` of its function string, equivalent spellings like "2x"
+    and "x*2" share one too. A batch or session job shares the entry of the
+    same request sent to its endpoint."""
+    if expression_key is not None:
+        request = request.model_copy(update={"function_string": "#" + expression_key})
+    return f"{endpoint}:{request.model_dump_json(exclude={'type'})}"
+
+
+def _shared_cache():
+    # Set by server.py for its worker processes, or by hand
+    path = os.environ.get("AREA_SHARED_CACHE")
+    if not path:
+        return None
+    return SQLiteCache(path, maxsize=int(os.environ.get("AREA_SHARED_CACHE_SIZE", "10000")),
+                       busy_timeout=SHARED_BUSY_TIMEOUT)
+
+
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get("AREA_RESPONSE_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("AREA_RESPONSE_CACHE_TTL", "3600")),
+    shared=_shared_cache(),
+)
@@ -0,0 +1,172 @@
+import numpy as np
+
+# Point budget when the client doesn't say how wide its plot is
+DEFAULT_MAX_POINTS = 400
+# Uniform grid the refinement starts from
+INITIAL_POINTS = 65
+MIN_POINTS = 9
+# Refine an interval while linear interpolation is off by more than this
+# fraction of the plotted y-range (about half a pixel on a typical chart)
+TOLERANCE = 1e-3
+MAX_ROUNDS = 16
+# Jumps larger than this fraction of the y-range are checked for a discontinuity
+JUMP_THRESHOLD = 0.2
+MAX_JUMP_CHECKS = 64
+BISECTION_STEPS = 24
+
+
+def sample_function(evaluators, start_x: float, end_x: float, max_points: int = DEFAULT_MAX_POINTS,
+                    pixel_width: int = None):
+    """Sample one or more functions over [start_x, end_x] on a shared adaptive grid.
+
+    `evaluators` are vectorized callables returning NaN where undefined, such
+    as CompiledExpression.evaluate, or a single callable returning one row
+    per function, like JointExpression.evaluate. Starting from a coarse uniform grid,
+    intervals where the curve bends away from a straight line are bisected
+    until it is drawn to within TOLERANCE or the point budget is spent. The
+    budget never exceeds `pixel_width`, since more points than pixels can't
+    be drawn.
+
+    Returns (x_values, y_values) where y_values has one row per function. A
+    NaN in a row marks a gap: the function is undefined there, or it jumps
+    (pole, step) between its neighbours and the plot shouldn't connect them.
+    """
+    budget = max_points if pixel_width is None else min(max_points, pixel_width)
+    budget = max(budget, MIN_POINTS)
+    low, high = sorted((start_x, end_x))
+
+    x_values = np.linspace(low, high, min(INITIAL_POINTS, budget))
+    y_values = _evaluate(evaluators, x_values)
+    if high > low:
+        x_values, y_values = _refine(evaluators, x_values, y_values, budget, (high - low) / (budget * 1024))
+        # Leave room to keep a marked gap's neighbours when trimming below
+        x_values, y_values = _mark_discontinuities(evaluators, x_values, y_values, (budget - 2) // 3)
+        if len(x_values) > budget:
+            # The gap markers came on top of a spent budget
+            x_values, y_values = _trim(x_values, y_values, len(x_values) - budget)
+
+    if start_x > end_x:
+        # Keep the original left-to-right order of the request, like linspace did
+        return x_values[::-1], y_values[:, ::-1]
+    return x_values, y_values
+
+
+def _evaluate(evaluators, x_values) -> np.ndarray:
+    if callable(evaluators):
+        return evaluators(x_values)
+    return np.vstack([evaluate(x_values) for evaluate in evaluators])
+
+
+def _scales(y_values) -> np.ndarray:
+    """Robust y-range of each row, ignoring the tails so poles don't flatten everything else."""
+    scales = np.ones(len(y_values))
+    for i, row in enumerate(y_values):
+        finite = row[np.isfinite(row)]
+        if len(finite):
+            low, high = np.percentile(finite, [5, 95])
+            scales[i] = high - low if high > low else max(abs(high), 1.0)
+    return scales
+
+
+def _deviation(x_values, y_values) -> np.ndarray:
+    """How far each sample is from the line through its neighbours, as a
+    fraction of the y-range; 0 for the end points and next to undefined samples."""
+    scales = _scales(y_values)[:, None]
+    left, right = x_values[:-2], x_values[2:]
+    weight = (x_values[1:-1] - left) / (right - left)
+    interpolated = y_values[:, :-2] + weight * (y_values[:, 2:] - y_values[:, :-2])
+    deviation = np.nan_to_num(np.abs(y_values[:, 1:-1] - interpolated) / scales, nan=0.0)
+    return np.pad(deviation, ((0, 0), (1, 1)))
+
+
+def _refinement_scores(x_values, y_values) -> np.ndarray:
+    """Error estimate for each interval between neighbouring samples."""
+    deviation = _deviation(x_values, y_values)
+    scores = np.maximum(deviation[:, :-1], deviation[:, 1:])
+
+    # Always narrow down where the function stops being defined
+    defined = np.isfinite(y_values)
+    scores[defined[:, :-1] != defined[:, 1:]] = np.inf
+    return scores.max(axis=0)
+
+
+def _refine(evaluators, x_values, y_values, budget, min_width):
+    for _ in range(MAX_ROUNDS):
+        room = budget - len(x_values)
+        if room <= 0:
+            break
+        scores = _refinement_scores(x_values, y_values)
+        candidates = np.nonzero((scores > TOLERANCE) & (np.diff(x_values) > min_width))[0]
+        if not len(candidates):
+            break
+        # Spend what's left of the budget on the worst intervals first
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")[:room]]
+        midpoints = (x_values[candidates] + x_values[candidates + 1]) / 2
+        x_values = np.insert(x_values, candidates + 1, midpoints)
+        y_values = np.insert(y_values, candidates + 1, _evaluate(evaluators, midpoints), axis=1)
+    return x_values, y_values
+
+
+def _mark_discontinuities(evaluators, x_values, y_values, max_markers: int = MAX_JUMP_CHECKS):
+    """Insert NaN gap markers inside intervals where a row jumps instead of rising steeply.
+
+    Suspicious intervals are bisected towards the jump. For a continuous
+    function the jump shrinks with the interval; for a pole or a step it
+    doesn't. At most `max_markers` of the largest jumps are checked.
+    """
+    jumps = np.abs(np.diff(y_values, axis=1)) / _scales(y_values)[:, None]
+    rows, intervals = np.nonzero(np.nan_to_num(jumps, nan=0.0) > JUMP_THRESHOLD)
+    if not len(rows):
+        return x_values, y_values
+    checks = min(MAX_JUMP_CHECKS, max_markers)
+    if len(rows) > checks:
+        largest = np.argsort(-jumps[rows, intervals])[:checks]
+        rows, intervals = rows[largest], intervals[largest]
+
+    columns = np.arange(len(rows))
+    low, high = x_values[intervals], x_values[intervals + 1]
+    y_low, y_high = y_values[rows, intervals], y_values[rows, intervals + 1]
+    initial_jump = np.abs(y_high - y_low)
+    undefined = np.zeros(len(rows), dtype=bool)
+    for _ in range(BISECTION_STEPS):
+        middle = (low + high) / 2
+        y_middle = _evaluate(evaluators, middle)[rows, columns]
+        undefined |= np.isnan(y_middle)
+        # Keep the half that holds most of the jump
+        go_left = np.abs(y_middle - y_low) >= np.abs(y_high - y_middle)
+        go_left |= np.isnan(y_middle)
+        high = np.where(go_left, middle, high)
+        y_high = np.where(go_left, y_middle, y_high)
+        low = np.where(go_left, low, middle)
+        y_low = np.where(go_left, y_low, y_middle)
+
+    final_jump = np.abs(y_high - y_low)
+    is_gap = undefined | ~(final_jump < 0.5 * initial_jump)
+    if not is_gap.any():
+        return x_values, y_values
+
+    gap_x = ((low + high) / 2)[is_gap]
+    gap_y = _evaluate(evaluators, gap_x)
+    gap_y[rows[is_gap], np.arange(len(gap_x))] = np.nan
+    order = np.argsort(gap_x)
+    positions = np.searchsorted(x_values, gap_x[order])
+    return np.insert(x_values, positions, gap_x[order]), np.insert(y_values, positions, gap_y[:, order], axis=1)
+
+
+def _trim(x_values, y_values, count: int):
+    """Drop the `count` samples that matter least to the drawing.
+
+    Samples inside a run of undefined ones go first, then the ones closest
+    to the line through their neighbours, and the neighbours of an undefined
+    sample last. The end points and isolated undefined samples (gap markers)
+    are never dropped.
+    """
+    scores = _deviation(x_values, y_values).max(axis=0)
+    undefined = np.isnan(y_values).any(axis=0)
+    left, right = np.pad(undefined[:-1], (1, 0)), np.pad(undefined[1:], (0, 1))
+    scores[left | right] = np.finfo(float).max
+    scores[undefined & left & right] = -1.0
+    scores[undefined & ~(left & right)] = np.inf
+    scores[[0, -1]] = np.inf
+    drop = np.argsort(scores, kind="stable")[:min(count, int(np.isfinite(scores).sum()))]
+    return np.delete(x_values, drop), np.delete(y_values, drop, axis=1)
@@ -0,0 +1,166 @@
+"""Production entry point: several uvicorn processes forked from one preloaded app.
+
+    python server.py [--workers N] [--host 0.0.0.0] [--port 8001]
+
+The app is imported once, then the listening socket is bound and the
+server processes are forked from that state, sharing the socket. The
+calculations run in each server process's own compute workers, started
+from a fork server that has imported SymPy and the calculation modules
+(see executor.py) and warmed up before the process reports ready; nothing
+calculated before the fork would reach them. What the server processes
+do share is on disk: their response caches use one SQLite file, so a
+result computed by one of them answers repeated requests in every other,
+and the symbolic store is shared as always. A server process that dies is
+replaced.
+
+`python main.py` still runs a single process without any of this, for
+development. Forking needs a POSIX system; elsewhere this falls back to
+one process.
+"""
+import argparse
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+# A server process that exits within this many seconds of starting is
+# restarted only after waiting as long
+RESTART_BACKOFF = 1.0
+
+
+def available_cores() -> int:
+    """Cores this process may run on, which can be fewer than the machine has (taskset, cgroups)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_workers(cores: int) -> int:
+    # Server processes mostly wait on their compute workers, so a few are
+    # enough to keep every core busy
+    return max(1, min(cores, 4))
+
+
+def compute_workers_per_server(cores: int, workers: int, slow_workers: int = None) -> tuple:
+    """(fast, slow) compute workers for each server process, so all of them together use every core once.
+
+    Without a set number of slow-lane workers, a server process gets one if
+    its share of the cores leaves room for it, otherwise both lanes share
+    its workers.
+    """
+    share = max(1, cores // workers)
+    if slow_workers is None:
+        slow_workers = min(1, share - 1)
+    return max(1, share - slow_workers), slow_workers
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _serve_forked(app, sock: socket.socket, log_level: str):
+    """Body of a forked server process; never returns."""
+    import uvicorn
+
+    # The parent's handlers forward signals; uvicorn installs its own
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    status = 0
+    try:
+        uvicorn.Server(uvicorn.Config(app, log_level=log_level)).run(sockets=[sock])
+    except BaseException:
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def _fork(app, sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        _serve_forked(app, sock, log_level)
+    return pid
+
+
+def serve(host: str = "0.0.0.0", port: int = 8001, workers: int = None, log_level: str = "info"):
+    cores = available_cores()
+    workers = workers or int(os.environ.get("AREA_SERVER_WORKERS", "0")) or default_workers(cores)
+    # Read when main is imported, so set before the import below
+    slow_workers = os.environ.get("AREA_SLOW_WORKERS")
+    fast, slow = compute_workers_per_server(cores, workers, int(slow_workers) if slow_workers else None)
+    os.environ.setdefault("AREA_WORKERS", str(fast))
+    os.environ.setdefault("AREA_SLOW_WORKERS", str(slow))
+    cache_dir = None
+    if workers > 1 and not os.environ.get("AREA_SHARED_CACHE"):
+        # Fresh for every launch: cached responses may not match a new release
+        cache_dir = tempfile.mkdtemp(prefix="area-py-")
+        os.environ["AREA_SHARED_CACHE"] = os.path.join(cache_dir, "responses.sqlite3")
+
+    from main import app
+
+    if workers == 1 or not hasattr(os, "fork"):
+        import uvicorn
+        uvicorn.run(app, host=host, port=port, log_level=log_level)
+        return
+
+    sock = _bind(host, port)
+    children = {_fork(app, sock, log_level): time.monotonic() for _ in range(workers)}
+    print(f"Serving on {host}:{port} with {workers} processes, "
+          f"{os.environ['AREA_WORKERS']} + {os.environ['AREA_SLOW_WORKERS']} slow-lane compute workers each",
+          file=sys.stderr)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while children:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started = children.pop(pid, None)
+            if started is not None and not stopping:
+                print(f"Server process {pid} exited, starting a new one", file=sys.stderr)
+                if time.monotonic() - started < RESTART_BACKOFF:
+                    # Failing right at startup; don't spin
+                    time.sleep(RESTART_BACKOFF)
+                children[_fork(app, sock, log_level)] = time.monotonic()
+    finally:
+        sock.close()
+        if cache_dir is not None:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--workers", type=int, help="server processes (default: AREA_SERVER_WORKERS, "
+                                                    "else up to 4 depending on the cores available)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
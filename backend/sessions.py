@@ -0,0 +1,103 @@
+import asyncio
+import json
+from typing import Optional, Union
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import TypeAdapter, ValidationError
+
+from dispatch import cached_calculation
+from models import BatchJob, SessionReply
+
+# Messages use the same shape as batch jobs, plus an optional "id" that is
+# echoed back and an optional "channel" (defaults to the job type)
+_job_adapter = TypeAdapter(BatchJob)
+_id_adapter = TypeAdapter(Optional[Union[int, str]])
+
+# Counters across all sessions, reported by /stats
+session_stats = {"active": 0, "messages": 0, "superseded": 0}
+
+
+class Session:
+    """One WebSocket connection from an as-you-type client.
+
+    Every message starts a calculation and its reply is pushed as soon as it
+    is done. Calculations go through the response cache and are coalesced
+    with identical ones in flight, as HTTP requests are. A session runs at
+    most one calculation per channel: a new message on a channel cancels
+    the one still in flight there, which frees its worker instead of
+    finishing a result nobody will look at.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.in_flight = {}  # channel -> (message id, asyncio.Task)
+        self._send_lock = asyncio.Lock()
+
+    async def run(self):
+        await self.websocket.accept()
+        session_stats["active"] += 1
+        try:
+            while True:
+                await self._receive(await self.websocket.receive_text())
+        except WebSocketDisconnect:
+            pass
+        finally:
+            session_stats["active"] -= 1
+            for _, task in self.in_flight.values():
+                task.cancel()
+
+    async def _send(self, reply: SessionReply, body: bytes = None):
+        """Send a reply, with `body` as its result: a response already encoded for the cache."""
+        text = reply.model_dump_json() if body is None else \
+            reply.model_dump_json(exclude={"result"})[:-1] + ',"result":' + body.decode() + "}"
+        # Replies come from several tasks; keep their frames from interleaving
+        async with self._send_lock:
+            await self.websocket.send_text(text)
+
+    async def _receive(self, text: str):
+        session_stats["messages"] += 1
+        try:
+            message = json.loads(text)
+        except ValueError as e:
+            await self._send(SessionReply(status="error", status_code=400, detail=f"Invalid JSON: {e}"))
+            return
+        try:
+            message_id = _id_adapter.validate_python(message.get("id") if isinstance(message, dict) else None)
+        except ValidationError as e:
+            # An id that couldn't be echoed back; the reply goes out without one
+            await self._send(SessionReply(status="error", status_code=422,
+                                          detail=json.loads(e.json(include_url=False))))
+            return
+        try:
+            job = _job_adapter.validate_python(message)
+        except ValidationError as e:
+            await self._send(SessionReply(id=message_id, status="error", status_code=422,
+                                          detail=json.loads(e.json(include_url=False))))
+            return
+
+        channel = str(message.get("channel") or job.type)
+        previous = self.in_flight.pop(channel, None)
+        if previous is not None:
+            previous_id, task = previous
+            task.cancel()
+            session_stats["superseded"] += 1
+            await self._send(SessionReply(id=previous_id, status="cancelled"))
+
+        task = asyncio.create_task(self._calculate(message_id, job, channel))
+        self.in_flight[channel] = (message_id, task)
+
+    async def _calculate(self, message_id, job, channel: str):
+        body = None
+        try:
+            body = (await cached_calculation(job.type, job)).body
+            reply = SessionReply(id=message_id, type=job.type, status="ok")
+        except HTTPException as e:
+            reply = SessionReply(id=message_id, type=job.type, status="error",
+                                 status_code=e.status_code, detail=e.detail)
+        except Exception as e:
+            # Still answer, so the client isn't left waiting for this id
+            reply = SessionReply(id=message_id, type=job.type, status="error", status_code=500,
+                                 detail=f"Internal error: {type(e).__name__}")
+        if self.in_flight.get(channel, (None, None))[1] is asyncio.current_task():
+            del self.in_flight[channel]
+        await self._send(reply, body)
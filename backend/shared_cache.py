@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Expired and surplus entries are pruned once every this many writes
+PRUNE_INTERVAL = 64
+
+
+class SQLiteCache:
+    """Bytes by string key in a local SQLite file, shared by every process that opens it.
+
+    The file is in WAL mode, so readers in other processes never wait for a
+    writer. Expiry times are wall-clock, as processes don't share a
+    monotonic clock. Beyond `maxsize` entries, the oldest are dropped.
+
+    The cache is an optimization and must never fail a request: any SQLite
+    error (locked, corrupt, disk full) counts as a miss and is tallied in
+    stats(). Connections are opened per process on first use, since one must
+    not be carried across a fork.
+
+    `busy_timeout` is how long a write waits for another process's write
+    lock. Callers on an event loop should keep it to milliseconds: a cache
+    that is busy then just misses instead of stalling the loop.
+    """
+
+    def __init__(self, path: str, maxsize: int = 10000, busy_timeout: float = 5.0):
+        self.path = path
+        self.maxsize = maxsize
+        self.busy_timeout = busy_timeout
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self._writes = 0
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durability of a cache isn't worth an fsync per write
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS entries "
+                               "(key TEXT PRIMARY KEY, value BLOB NOT NULL, stored REAL NOT NULL, expires REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS entries_stored ON entries (stored)")
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def get(self, key: str):
+        """(value, seconds left or None if it never expires) for a live entry, else None."""
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT value, expires FROM entries WHERE key = ? AND (expires IS NULL OR expires > ?)",
+                    (key, now)).fetchone()
+            except sqlite3.Error:
+                self.errors += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        value, expires = row
+        return value, None if expires is None else expires - now
+
+    def put(self, key: str, value: bytes, ttl: float = None):
+        now = time.time()
+        with self._lock:
+            try:
+                connection = self._connect()
+                connection.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                                   (key, value, now, None if ttl is None else now + ttl))
+                self._writes += 1
+                if self._writes % PRUNE_INTERVAL == 0:
+                    self._prune(connection, now)
+            except sqlite3.Error:
+                self.errors += 1
+
+    def _prune(self, connection: sqlite3.Connection, now: float):
+        connection.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        (size,) = connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if size > self.maxsize:
+            connection.execute("DELETE FROM entries WHERE key IN "
+                               "(SELECT key FROM entries ORDER BY stored LIMIT ?)", (size - self.maxsize,))
+
+    def clear(self):
+        with self._lock:
+            try:
+                self._connect().execute("DELETE FROM entries")
+            except sqlite3.Error:
+                self.errors += 1
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            try:
+                (size,) = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()
+            except sqlite3.Error:
+                size = None
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "size": size,
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
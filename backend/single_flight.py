@@ -0,0 +1,61 @@
+import asyncio
+
+from metrics import record
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one computation.
+
+    The first caller for a key starts the computation as a task of its own;
+    callers arriving while it runs wait for the same task and get its result
+    or its exception. Waiting is shielded, so a caller that goes away doesn't
+    cancel the computation for the others; once every caller has gone away
+    it is cancelled, which frees its worker (e.g. a WebSocket session
+    superseding its own request). The key is forgotten as soon as the
+    computation finishes; results are kept by the caches, not here.
+
+    Only for use from the event loop's thread.
+    """
+
+    def __init__(self):
+        self.started = 0
+        self.coalesced = 0
+        self._flights = {}
+        self._waiting = {}  # task -> callers awaiting it
+
+    async def run(self, key, compute, group: str = ""):
+        """Await compute() once for all concurrent callers with `key`.
+
+        `group` labels the coalesced calls for /metrics (the endpoint).
+        """
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._land(key, done))
+            self.started += 1
+        else:
+            self.coalesced += 1
+            record("coalesced", (group,))
+        self._waiting[task] = self._waiting.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiting[task] -= 1
+            if not self._waiting[task]:
+                del self._waiting[task]
+                # Nobody is left to take the result
+                task.cancel()
+
+    def _land(self, key, task: asyncio.Future):
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Retrieved here in case every caller has gone away
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
+
+
+single_flight = SingleFlight()
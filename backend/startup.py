@@ -0,0 +1,119 @@
+"""Startup timing, warm-up and readiness.
+
+The API process imports only what it needs to accept connections; SymPy,
+SciPy, NumPy and the calculation modules are imported on first use.
+warm_up() imports them and runs one canned request per endpoint, so the
+first real request doesn't pay for module imports, SymPy's caches, parser
+setup or compiling evaluators. It runs where the calculations do: every
+worker process runs it before reporting ready, and the API process only
+with the thread or inline executor. /ready answers 503 until it is done.
+"""
+import asyncio
+import os
+import time
+
+# Set when main starts importing this module, i.e. before FastAPI and the rest
+IMPORT_STARTED = time.perf_counter()
+
+WARMUP_ENABLED = os.environ.get("AREA_WARMUP", "1").lower() not in ("0", "false", "no")
+# Longest the startup waits for the workers' warm-up before reporting ready anyway
+WARMUP_TIMEOUT = 60.0
+
+# One request per endpoint, together touching parsing, diff, solve, limit,
+# numeric evaluation, quad and the LaTeX printer
+WARMUP_REQUESTS = [
+    ("integral", {"function_string": "x*sin(x) + exp(-x^2)", "start_x": 0, "end_x": 2}),
+    ("derivative", {"function_string": "x^3*cos(x)", "eval_point": 1, "start_x": -2, "end_x": 2}),
+    ("critical_points", {"function_string": "x^3 - 3x", "start_x": -3, "end_x": 3, "method": "hybrid"}),
+    ("limit", {"function_string": "sin(x)/x", "approach_value": 0}),
+]
+
+
+def warm_up() -> dict:
+    """Import the calculation modules and run WARMUP_REQUESTS in this process.
+
+    Returns the seconds each phase took: "import", then one per endpoint,
+    also kept as this process's startup_state.warmup_seconds. Module level
+    so worker processes can run it as their initializer.
+    """
+    timings = {}
+    started = time.perf_counter()
+    from calculations import COMPUTATIONS
+    from models import CriticalPointsRequest, DerivativeRequest, IntegralRequest, LimitRequest
+    request_models = {"integral": IntegralRequest, "derivative": DerivativeRequest,
+                      "critical_points": CriticalPointsRequest, "limit": LimitRequest}
+    timings["import"] = time.perf_counter() - started
+
+    for endpoint, body in WARMUP_REQUESTS:
+        started = time.perf_counter()
+        COMPUTATIONS[endpoint](request_models[endpoint](**body))
+        timings[endpoint] = time.perf_counter() - started
+    startup_state.warmup_seconds = timings
+    return timings
+
+
+def warmup_timings() -> dict:
+    """This process's warm-up timings; asked of a worker by name."""
+    return startup_state.warmup_seconds
+
+
+class StartupState:
+    """How long this process took to import, warm up and become ready."""
+
+    def __init__(self):
+        self.import_seconds = None
+        self.warmup_seconds = {}
+        self.workers_seconds = None
+        self.ready_seconds = None
+        self.error = None
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_seconds is not None
+
+    def imported(self):
+        self.import_seconds = time.perf_counter() - IMPORT_STARTED
+
+    def mark_ready(self):
+        self.ready_seconds = time.perf_counter() - IMPORT_STARTED
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "warmup_enabled": WARMUP_ENABLED,
+            "import_seconds": self.import_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            # Time from creating the worker pool until every worker had warmed up
+            "workers_seconds": self.workers_seconds,
+            # From the start of the app's import until ready
+            "ready_seconds": self.ready_seconds,
+            "error": self.error,
+        }
+
+
+startup_state = StartupState()
+
+
+async def prepare(executor):
+    """Start the executor's workers and wait for their warm-up.
+
+    The API process only warms up itself when the executor runs the
+    calculations in it (thread or inline); with worker processes it never
+    parses or calculates, and a warm-up would only cost it memory and GIL
+    time. Runs as a background task of the app's lifespan; requests are
+    served meanwhile, just more slowly.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        if executor.kind != "process":
+            await loop.run_in_executor(None, warm_up)
+        started = time.perf_counter()
+        if not await loop.run_in_executor(None, executor.start, WARMUP_TIMEOUT):
+            startup_state.error = f"Workers did not warm up within {WARMUP_TIMEOUT:g}s"
+        startup_state.workers_seconds = time.perf_counter() - started
+        if executor.kind == "process":
+            # Phases of a worker's warm-up, for /ready and /stats
+            startup_state.warmup_seconds = await executor.run("startup:warmup_timings", timeout=WARMUP_TIMEOUT)
+    except Exception as e:
+        startup_state.error = f"{type(e).__name__}: {e}"
+    startup_state.mark_ready()
@@ -0,0 +1,92 @@
+"""On-disk cache of symbolic results that survives restarts and deploys.
+
+Derivatives, solve() solutions, limit() results and antiderivatives depend
+only on the expression (and the limit's point and side), so they are kept
+by canonical expression key in a SQLite file. Every worker process opens
+it on first use, and reads come straight from disk per key. Keys carry a
+fingerprint of the SymPy and Python versions, so an upgrade starts afresh
+instead of unpickling objects from another version. Entries under an old
+fingerprint are never read again and age out under the size cap.
+"""
+import hashlib
+import os
+import pickle
+import sys
+
+import sympy
+
+from shared_cache import SQLiteCache
+
+# Bump when what is stored under a kind changes meaning or format
+SCHEMA_VERSION = 1
+FINGERPRINT = hashlib.blake2b(
+    f"{SCHEMA_VERSION}|sympy {sympy.__version__}|python {sys.version_info[0]}.{sys.version_info[1]}".encode(),
+    digest_size=6,
+).hexdigest()
+
+# Returned by get() when nothing is stored; None is a valid stored result
+MISSING = object()
+
+
+def _default_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "area-py", "symbolic.sqlite3")
+
+
+class SymbolicStore:
+    """Pickled SymPy results by (kind, canonical key, parameters), or a no-op without a path."""
+
+    def __init__(self, path: str = None, maxsize: int = 100000):
+        self.path = path
+        self.maxsize = maxsize
+        self._cache = None
+
+    def _open(self):
+        if self._cache is None and self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._cache = SQLiteCache(self.path, self.maxsize)
+        return self._cache
+
+    @staticmethod
+    def _key(kind: str, key: tuple) -> str:
+        return ":".join([FINGERPRINT, kind] + [str(part) for part in key])
+
+    def get(self, kind: str, key: tuple):
+        """The stored result, or MISSING."""
+        try:
+            cache = self._open()
+        except OSError:
+            return MISSING
+        found = cache.get(self._key(kind, key)) if cache is not None else None
+        if found is None:
+            return MISSING
+        try:
+            return pickle.loads(found[0])
+        except Exception:
+            # Written by something else, or truncated; recompute
+            return MISSING
+
+    def put(self, kind: str, key: tuple, value):
+        try:
+            cache = self._open()
+            if cache is not None:
+                cache.put(self._key(kind, key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except (OSError, pickle.PicklingError, TypeError, RecursionError):
+            pass
+
+    def stats(self) -> dict:
+        stats = self._cache.stats() if self._cache is not None else {"hits": 0, "misses": 0, "errors": 0,
+                                                                     "hit_ratio": 0.0}
+        return {"path": self.path or None, **{name: stats[name] for name in ("hits", "misses", "errors", "hit_ratio")}}
+
+
+# AREA_SYMBOLIC_CACHE="" turns the store off
+symbolic_store = SymbolicStore(
+    os.environ.get("AREA_SYMBOLIC_CACHE", _default_path()),
+    maxsize=int(os.environ.get("AREA_SYMBOLIC_CACHE_SIZE", "100000")),
+)
+
+
+def store_stats() -> dict:
+    return symbolic_store.stats()
+
@@ -292,7 +292,9 @@ export class IntegralCalculatorComponent implements OnInit, AfterViewInit {  @Vi
     const request: IntegralRequest = {
       function_string: functionExpression,
       start_x: startX,
-      end_x: endX
+      end_x: endX,
+      // No point sampling more than the chart can draw
+      pixel_width: this.chartCanvas?.nativeElement.clientWidth > 1 ? this.chartCanvas.nativeElement.clientWidth : undefined
     };    this.integralService.calculateIntegral(request).subscribe({
       next: (response) => {
         this.result = response;
@@ -1,25 +1,38 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Observable } from 'rxjs';
+import { filter, take } from 'rxjs/operators';
+import { webSocket, WebSocketSubject } from 'rxjs/webSocket';
 
 export interface IntegralRequest {
   function_string: string;
   start_x: number;
   end_x: number;
+  pixel_width?: number;
 }
 
 export interface IntegralResponse {
   latex_expression: string;
   area: number;
-  function_points: {x: number, y: number}[];
+  function_points: {x: number, y: number | null}[];  // y is null at gaps (poles, jumps)
   error?: string;
 }
 
+interface SessionReply {
+  id: number;
+  status: 'ok' | 'error' | 'cancelled';
+  result?: IntegralResponse;
+  status_code?: number;
+  detail?: any;
+}
+
 @Injectable({
   providedIn: 'root'
 })
 export class IntegralService {
   private apiUrl = 'https://area-py-backend.onrender.com';
+  private session?: WebSocketSubject<any>;
+  private nextId = 0;
 
   constructor(private http: HttpClient) { }
 
@@ -27,7 +40,40 @@ export class IntegralService {
     return this.http.get(`${this.apiUrl}/test`);
   }
 
+  // Sent over one long-lived WebSocket; each request cancels the previous one
+  // on the server, and a superseded request completes without a value
   calculateIntegral(request: IntegralRequest): Observable<IntegralResponse> {
-    return this.http.post<IntegralResponse>(`${this.apiUrl}/calculate-integral`, request);
+    const id = ++this.nextId;
+    const session = this.getSession();
+    return new Observable<IntegralResponse>(subscriber => {
+      const subscription = session.pipe(filter((reply: SessionReply) => reply.id === id), take(1)).subscribe({
+        next: (reply: SessionReply) => {
+          if (reply.status === 'ok') {
+            subscriber.next(reply.result);
+            subscriber.complete();
+          } else if (reply.status === 'error') {
+            subscriber.error({ status: reply.status_code, error: { detail: reply.detail } });
+          } else {
+            subscriber.complete();
+          }
+        },
+        // No WebSocket (proxy, dropped connection): fall back to a plain POST
+        error: () => this.http.post<IntegralResponse>(`${this.apiUrl}/calculate-integral`, request).subscribe(subscriber)
+      });
+      session.next({ id, type: 'integral', ...request });
+      return () => subscription.unsubscribe();
+    });
+  }
+
+  private getSession(): WebSocketSubject<any> {
+    if (!this.session) {
+      this.session = webSocket(`${this.apiUrl.replace(/^http/, 'ws')}/ws/session`);
+      // Keep the socket open between requests; reconnect on next use once it drops
+      this.session.subscribe({
+        error: () => this.session = undefined,
+        complete: () => this.session = undefined
+      });
+    }
+    return this.session;
   }
 } 
@@ -0,0 +1,220 @@
+"""Latency, throughput and memory benchmark of the calculation endpoints.
+
+Drives the FastAPI app in-process over httpx's ASGI transport with a corpus
+of representative expressions, then compares the results with a stored
+baseline. Run from tests/backend:
+
+    python benchmark.py                     # report, and fail on regressions
+    python benchmark.py --update-baseline   # record this machine's numbers
+
+Calculations run inline on the main thread, so stage deadlines apply just as
+they do in a worker process and tracemalloc sees every allocation. Baselines
+are machine specific: record one on the machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+os.environ.setdefault("AREA_EXECUTOR", "inline")
+# Without the on-disk symbolic store, so cold timings don't depend on earlier
+# runs and the benchmark leaves nothing behind in ~/.cache
+os.environ.setdefault("AREA_SYMBOLIC_CACHE", "")
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import httpx
+from sympy.core.cache import clear_cache
+
+from expression_cache import expression_cache
+from main import app
+from response_cache import response_cache
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baseline.json")
+
+ENDPOINT_PATHS = {
+    "integral": "/calculate-integral",
+    "derivative": "/calculate-derivative",
+    "critical_points": "/find-critical-points",
+    "limit": "/calculate-limit",
+}
+
+# (name, request body) per endpoint: everyday inputs plus the poles, deep
+# nesting and solve()/limit() cases that used to be slow
+CORPUS = {
+    "integral": [
+        ("polynomial", {"function_string": "3x^4 - 2x^2 + x - 5", "start_x": -2, "end_x": 3}),
+        ("trig", {"function_string": "sin(x)*cos(2x)", "start_x": 0, "end_x": 6.283}),
+        ("exponential", {"function_string": "x*exp(-x^2)", "start_x": -3, "end_x": 3}),
+        ("rational_pole", {"function_string": "1/(x-1)", "start_x": 0, "end_x": 2}),
+        ("tan_poles", {"function_string": "tan(x)", "start_x": -3, "end_x": 3}),
+        ("nested", {"function_string": "sin(exp(cos(x)))", "start_x": 0, "end_x": 4}),
+        ("no_closed_form", {"function_string": "sqrt(1+x^3)", "start_x": 0, "end_x": 2}),
+        ("oscillating", {"function_string": "sin(50x)/x", "start_x": 0.1, "end_x": 10}),
+    ],
+    "derivative": [
+        ("polynomial", {"function_string": "x^5 - 3x^3 + x", "eval_point": 1, "start_x": -2, "end_x": 2}),
+        ("trig", {"function_string": "sin(x)^2*cos(x)", "eval_point": 0.5, "start_x": -3, "end_x": 3}),
+        ("rational_pole", {"function_string": "(x^2+1)/(x^2-1)", "eval_point": 0, "start_x": -3, "end_x": 3}),
+        ("nested", {"function_string": "exp(sin(x^2))*log(1+x^2)", "eval_point": 1, "start_x": -2, "end_x": 2}),
+        ("shared_terms", {"function_string": "sin(x)*cos(x) + exp(x/5)", "eval_point": 2, "start_x": 0, "end_x": 10}),
+    ],
+    "critical_points": [
+        ("polynomial", {"function_string": "x^3 - 3x", "start_x": -3, "end_x": 3}),
+        ("trig", {"function_string": "sin(x) + cos(2x)", "start_x": -6, "end_x": 6}),
+        ("rational_pole", {"function_string": "x/(x^2-1)", "start_x": -3, "end_x": 3}),
+        ("many_roots", {"function_string": "sin(20x)*exp(-x/4)", "start_x": 0, "end_x": 10}),
+        ("pathological_solve", {"function_string": "sin(x)*exp(x)+x^7", "start_x": -2, "end_x": 2}),
+        ("transcendental", {"function_string": "cos(x) - x^2/10", "start_x": -6, "end_x": 6}),
+    ],
+    "limit": [
+        ("continuous", {"function_string": "x^2 + 1", "approach_value": 3}),
+        ("removable", {"function_string": "sin(x)/x", "approach_value": 0}),
+        ("removable_rational", {"function_string": "(x^2-1)/(x-1)", "approach_value": 1}),
+        ("one_sided_pole", {"function_string": "1/x", "approach_value": 0, "direction": "+"}),
+        ("exponential", {"function_string": "(1+x)^(1/x)", "approach_value": 0}),
+        ("oscillating", {"function_string": "x*sin(1/x)", "approach_value": 0}),
+        ("pathological_limit", {"function_string": "sin(1/x)", "approach_value": 0}),
+    ],
+}
+
+
+def _summarize(latencies: list) -> dict:
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "mean_ms": float(latencies_ms.mean()),
+        # Sequential requests per second on one core
+        "throughput_rps": float(len(latencies) / sum(latencies)),
+    }
+
+
+async def _post(client, endpoint: str, body: dict):
+    # Measure the calculation, not the response cache
+    response_cache.clear()
+    response = await client.post(ENDPOINT_PATHS[endpoint], json=body)
+    if response.status_code >= 500:
+        raise RuntimeError(f"{endpoint} {body} failed with {response.status_code}: {response.text}")
+
+
+async def run_benchmark(repeat: int = 20, endpoints=None) -> dict:
+    """Per-endpoint latency percentiles, throughput and tracemalloc peak (KiB).
+
+    Timed passes run with warm caches, as in a busy server. The cold pass
+    clears the parse cache and SymPy's own cache before every request, which
+    is what a new expression costs.
+    """
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for endpoint in endpoints or CORPUS:
+            corpus = CORPUS[endpoint]
+            cold = []
+            for _, body in corpus:
+                expression_cache.clear()
+                clear_cache()
+                started = time.perf_counter()
+                await _post(client, endpoint, body)
+                cold.append(time.perf_counter() - started)
+            # Warm every expression again before the timed passes, twice: a
+            # closed-form antiderivative is only looked for once an expression
+            # repeats, and that search is the cold cost of the second request
+            for _ in range(2):
+                for _, body in corpus:
+                    await _post(client, endpoint, body)
+
+            latencies = []
+            for _ in range(repeat):
+                for _, body in corpus:
+                    started = time.perf_counter()
+                    await _post(client, endpoint, body)
+                    latencies.append(time.perf_counter() - started)
+            results[endpoint] = _summarize(latencies)
+            results[endpoint]["cold_mean_ms"] = float(np.mean(cold) * 1000)
+
+            # Memory is measured separately; tracemalloc slows everything down
+            tracemalloc.start()
+            for _, body in corpus:
+                await _post(client, endpoint, body)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[endpoint]["peak_memory_kib"] = peak / 1024
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float, slack_ms: float = 2.0) -> list:
+    """Messages for every metric that got worse than the baseline allows.
+
+    Latency p50/p95 and the cold mean may grow by `tolerance` (0.5 = 50%)
+    plus `slack_ms` for timer noise on very fast endpoints; peak memory by
+    `tolerance` plus 256 KiB.
+    """
+    regressions = []
+    for endpoint, stats in results.items():
+        reference = baseline.get(endpoint)
+        if reference is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "cold_mean_ms"):
+            limit = reference[metric] * (1 + tolerance) + slack_ms
+            if stats[metric] > limit:
+                regressions.append(f"{endpoint} {metric}: {stats[metric]:.2f} > {limit:.2f} "
+                                   f"(baseline {reference[metric]:.2f})")
+        limit = reference["peak_memory_kib"] * (1 + tolerance) + 256
+        if stats["peak_memory_kib"] > limit:
+            regressions.append(f"{endpoint} peak_memory_kib: {stats['peak_memory_kib']:.0f} > {limit:.0f} "
+                               f"(baseline {reference['peak_memory_kib']:.0f})")
+    return regressions
+
+
+def _print_table(results: dict):
+    print(f"{'endpoint':<16}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'cold ms':>9}{'peak KiB':>10}")
+    for endpoint, stats in results.items():
+        print(f"{endpoint:<16}{stats['p50_ms']:>9.2f}{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}"
+              f"{stats['throughput_rps']:>9.1f}{stats['cold_mean_ms']:>9.1f}{stats['peak_memory_kib']:>10.0f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20, help="timed passes over the corpus per endpoint")
+    parser.add_argument("--endpoint", action="append", choices=list(CORPUS), help="only benchmark these")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown, 0.5 = 50%%")
+    parser.add_argument("--update-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(run_benchmark(args.repeat, args.endpoint))
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update_baseline:
+        rounded = {endpoint: {name: round(value, 3) for name, value in stats.items()}
+                   for endpoint, stats in results.items()}
+        with open(args.baseline, "w") as f:
+            json.dump(rounded, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with; run with --update-baseline first")
+        return 0
+    with open(args.baseline) as f:
+        regressions = find_regressions(results, json.load(f), args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,9 @@
 # Backend Test Configuration
 import os
 
+# Keep test runs from reading or writing the on-disk symbolic cache
+os.environ.setdefault("AREA_SYMBOLIC_CACHE", "")
+
 # Test configuration for pytest
 pytest_plugins = []
 
@@ -0,0 +1,175 @@
+import pytest
+import sys
+import os
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+from sympy import Symbol, sympify
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import admission
+import dispatch
+from admission import SLOW_COST, Lane, Overloaded, lane_for
+from cost import estimate, polynomial_degree
+from models import CriticalPointsRequest, DerivativeRequest, IntegralRequest
+from main import app, response_cache
+
+client = TestClient(app)
+
+
+def critical_points(function_string, method="hybrid", start_x=-3, end_x=3):
+    return estimate("critical_points", CriticalPointsRequest(function_string=function_string, start_x=start_x,
+                                                             end_x=end_x, method=method))
+
+
+class TestCostEstimate:
+    """Test the up-front cost model used to pick a lane"""
+
+    def test_cheap_requests_take_the_fast_lane(self):
+        """Test that polynomials and plain derivatives are estimated cheap"""
+        assert lane_for(critical_points("x^3 - 3x")) == "fast"
+        assert lane_for(estimate("derivative", DerivativeRequest(function_string="tan(sin(exp(x)))"))) == "fast"
+        assert lane_for(estimate("integral", IntegralRequest(function_string="x^2", start_x=0, end_x=1))) == "fast"
+
+    def test_nested_transcendental_solve_takes_the_slow_lane(self):
+        """Test that solving a derivative of nested transcendental functions is estimated expensive"""
+        assert critical_points("sin(exp(cos(x)))") >= SLOW_COST
+        assert lane_for(critical_points("tan(sin(exp(x)))*log(x+5)")) == "slow"
+
+    def test_nesting_costs_more_than_the_same_functions_side_by_side(self):
+        """Test that nesting transcendental functions compounds the estimate"""
+        assert critical_points("sin(exp(cos(x)))") > critical_points("sin(x) + exp(x) + cos(x)")
+
+    def test_polynomial_degree_raises_cost(self):
+        """Test that polynomials beyond the quartic formula cost more"""
+        assert critical_points("x^9 + x") > critical_points("x^3 + x")
+
+    def test_large_polynomial_powers_are_not_expanded(self):
+        """Test that the degree of a huge polynomial power is read off the tree in no time"""
+        started = time.perf_counter()
+        cost = critical_points("(x^2+x+1)^2000")
+        assert time.perf_counter() - started < 1.0
+        assert lane_for(cost) == "slow"
+
+    def test_polynomial_degree(self):
+        """Test the structural degree of polynomials and non-polynomials"""
+        x = Symbol("x")
+        assert polynomial_degree(sympify("3*x**2*(x + 1)**3 + 5"), x) == 5
+        assert polynomial_degree(sympify("(x**2 + x + 1)**2000"), x) == 4000
+        assert polynomial_degree(sympify("7"), x) == 0
+        assert polynomial_degree(sympify("x**2 + sin(x)"), x) is None
+        assert polynomial_degree(sympify("1/x"), x) is None
+
+    def test_numeric_search_is_cheaper(self):
+        """Test that a numeric critical point search, which skips solve(), is estimated cheaper"""
+        assert critical_points("sin(exp(cos(x)))", method="numeric") < critical_points("sin(exp(cos(x)))")
+        assert lane_for(critical_points("sin(exp(cos(x)))", method="numeric")) == "fast"
+
+    def test_interval_width_raises_cost(self):
+        """Test that a wider interval of an oscillating function costs more"""
+        assert critical_points("sin(x)", end_x=1000) > critical_points("sin(x)", end_x=1)
+        assert critical_points("x^2", end_x=1000) == critical_points("x^2", end_x=1)
+
+    def test_unparsable_input_is_free(self):
+        """Test that a string that doesn't parse goes to the fast lane to fail quickly"""
+        assert critical_points("sin(") == 0.0
+
+
+class TestLane:
+    """Test a lane's bounded concurrency and queue"""
+
+    def test_waiters_get_slots_in_order(self):
+        """Test that requests beyond the limit wait and are admitted first come first served"""
+        lane = Lane("test", limit=1, queue_limit=2)
+        order = []
+
+        async def request(name):
+            async with lane.slot():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def scenario():
+            await asyncio.gather(request("a"), request("b"), request("c"))
+
+        asyncio.run(scenario())
+        assert order == ["a", "b", "c"]
+        assert lane.stats() == {"limit": 1, "queue_limit": 2, "active": 0, "waiting": 0,
+                                "admitted": 3, "rejected": 0}
+
+    def test_full_queue_rejects(self):
+        """Test that a request beyond the limit and the queue is rejected right away"""
+        lane = Lane("test", limit=1, queue_limit=1, retry_after=3.0)
+
+        async def request():
+            async with lane.slot():
+                await asyncio.sleep(0.05)
+
+        async def scenario():
+            return await asyncio.gather(request(), request(), request(), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        assert results[:2] == [None, None]
+        assert isinstance(results[2], Overloaded)
+        assert results[2].retry_after == 3.0
+        assert lane.rejected == 1
+
+    def test_wait_is_bounded(self):
+        """Test that a request waiting longer than max_wait is rejected and leaves the queue"""
+        lane = Lane("test", limit=1, queue_limit=5)
+
+        async def hold():
+            async with lane.slot():
+                await asyncio.sleep(0.2)
+
+        async def scenario():
+            holder = asyncio.ensure_future(hold())
+            await asyncio.sleep(0.01)
+            with pytest.raises(Overloaded):
+                async with lane.slot(max_wait=0.05):
+                    pass
+            assert lane.waiting == 0
+            await holder
+
+        asyncio.run(scenario())
+        assert lane.active == 0
+
+
+class TestEndpointAdmission:
+    """Test that a saturated slow lane answers 429 without affecting cheap requests"""
+
+    def test_saturated_slow_lane_rejects_expensive_requests(self, monkeypatch):
+        """Test that an expensive request gets 429 with Retry-After while a cheap one succeeds"""
+        monkeypatch.setitem(admission.lanes, "slow", Lane("slow", limit=0, queue_limit=0, retry_after=5.0))
+        response_cache.clear()
+
+        response = client.post("/find-critical-points", json={
+            "function_string": "tan(sin(exp(x)))*log(x+5)", "start_x": 0, "end_x": 3, "method": "symbolic"})
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "5"
+        assert response.json()["detail"]["lane"] == "slow"
+
+        response = client.post("/find-critical-points", json={
+            "function_string": "x^3 - 3x", "start_x": -3, "end_x": 3, "method": "symbolic"})
+        assert response.status_code == 200
+
+    def test_assessment_holds_a_fast_lane_slot(self, monkeypatch):
+        """Test that working out a new request's key and cost is bounded by the fast lane too"""
+        fast = Lane("fast", limit=0, queue_limit=0)
+        monkeypatch.setitem(admission.lanes, "fast", fast)
+        response_cache.clear()
+
+        response = client.post("/calculate-derivative", json={"function_string": "x^5 + 11x", "eval_point": 1})
+        assert response.status_code == 429
+        assert response.json()["detail"]["lane"] == "fast"
+        assert fast.rejected == 1
+        # Turned away before a worker was asked
+        assert dispatch.expression_keys.get("x^5 + 11x") is None
+
+    def test_stats_report_lanes(self):
+        """Test that /stats reports each lane's slots"""
+        stats = client.get("/stats").json()["admission"]
+        assert set(stats) == {"fast", "slow"}
+        assert stats["slow"]["limit"] >= 1
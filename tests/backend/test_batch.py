@@ -0,0 +1,107 @@
+import pytest
+import sys
+import os
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import admission
+from admission import Lane
+from batch import plan_chunks, plan_lanes
+from cost import estimate
+from models import CriticalPointsJob, DerivativeJob, IntegralJob
+from main import app
+
+client = TestClient(app)
+
+
+class TestBatchPlanning:
+    """Test how batch jobs are grouped into executor tasks"""
+
+    def test_same_expression_stays_together(self):
+        """Test that jobs for one function string end up in the same chunk"""
+        jobs = [IntegralJob(type="integral", function_string=f, start_x=0, end_x=1)
+                for f in ["x", "x^2", "x", "x^2", "x"]]
+        chunks = plan_chunks(jobs, workers=2)
+        assert sorted(index for chunk in chunks for index in chunk) == list(range(5))
+        assert [0, 2, 4] in chunks
+
+    def test_large_group_is_split_across_workers(self):
+        """Test that many jobs on one expression still use every worker"""
+        jobs = [IntegralJob(type="integral", function_string="x", start_x=0, end_x=i) for i in range(8)]
+        chunks = plan_chunks(jobs, workers=4)
+        assert len(chunks) == 4
+        assert all(len(chunk) == 2 for chunk in chunks)
+
+
+class TestBatchEndpoint:
+    """Test the /batch endpoint"""
+
+    def test_mixed_jobs_in_order(self):
+        """Test that every job type runs and results come back in request order"""
+        request_data = {"jobs": [
+            {"type": "integral", "function_string": "x^2", "start_x": 0, "end_x": 1},
+            {"type": "limit", "function_string": "sin(x)/x", "approach_value": 0},
+            {"type": "derivative", "function_string": "x^2", "eval_point": 2},
+            {"type": "critical_points", "function_string": "x^2 - 4x + 3", "start_x": -1, "end_x": 5},
+            {"type": "integral", "function_string": "x^2", "start_x": 0, "end_x": 3},
+        ]}
+        response = client.post("/batch", json=request_data)
+        assert response.status_code == 200
+
+        results = response.json()["results"]
+        assert [item["type"] for item in results] == ["integral", "limit", "derivative", "critical_points", "integral"]
+        assert all(item["error"] is None for item in results)
+        assert abs(results[0]["result"]["area"] - 1/3) < 0.001
+        assert abs(results[1]["result"]["limit_value"] - 1) < 0.001
+        assert abs(results[2]["result"]["derivative_value"] - 4) < 0.001
+        assert abs(results[3]["result"]["critical_points"][0]["x"] - 2) < 0.001
+        assert abs(results[4]["result"]["area"] - 9) < 0.001
+
+    def test_error_per_item(self):
+        """Test that a failing job doesn't affect the others"""
+        request_data = {"jobs": [
+            {"type": "integral", "function_string": "", "start_x": 0, "end_x": 1},
+            {"type": "integral", "function_string": "2x+1", "start_x": 0, "end_x": 2},
+        ]}
+        response = client.post("/batch", json=request_data)
+        assert response.status_code == 200
+
+        results = response.json()["results"]
+        assert results[0]["result"] is None
+        assert results[0]["error"]
+        assert abs(results[1]["result"]["area"] - 6) < 0.001
+
+    def test_unknown_job_type(self):
+        """Test that an unknown job type is a validation error"""
+        request_data = {"jobs": [{"type": "series", "function_string": "x"}]}
+        response = client.post("/batch", json=request_data)
+        assert response.status_code == 422
+
+
+class TestBatchLanes:
+    """Test that batch jobs are routed by estimated cost like single requests"""
+
+    def test_expensive_jobs_take_the_slow_lane(self):
+        """Test that expensive and cheap jobs of one batch are chunked into their own lanes"""
+        jobs = [CriticalPointsJob(type="critical_points", function_string="tan(sin(exp(x)))*log(x+5)",
+                                  start_x=0, end_x=3, method="symbolic"),
+                DerivativeJob(type="derivative", function_string="x^2"),
+                CriticalPointsJob(type="critical_points", function_string="x^3 - 3x", start_x=-3, end_x=3)]
+        planned = dict(plan_lanes(jobs, [estimate(job.type, job) for job in jobs]))
+        assert planned["slow"] == [0]
+        assert sorted(planned["fast"]) == [1, 2]
+
+    def test_full_slow_lane_fails_only_its_jobs(self, monkeypatch):
+        """Test that jobs for a saturated slow lane get an overload error while cheap ones succeed"""
+        monkeypatch.setitem(admission.lanes, "slow", Lane("slow", limit=0, queue_limit=0, retry_after=5.0))
+        response = client.post("/batch", json={"jobs": [
+            {"type": "critical_points", "function_string": "tan(sin(exp(x)))*log(x+5)", "start_x": 0, "end_x": 3,
+             "method": "symbolic"},
+            {"type": "derivative", "function_string": "x^2"},
+        ]})
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert "retry" in results[0]["error"]
+        assert results[1]["error"] is None
@@ -0,0 +1,19 @@
+import pytest
+import sys
+import os
+import subprocess
+
+BENCHMARK = os.path.join(os.path.dirname(__file__), 'benchmark.py')
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(os.environ.get("AREA_BENCHMARK") != "1", reason="set AREA_BENCHMARK=1 to run the benchmark")
+class TestBenchmark:
+    """Run the endpoint benchmark against the stored baseline"""
+
+    def test_no_performance_regressions(self):
+        """Test that no endpoint got slower or hungrier than the baseline allows"""
+        # In a separate process, so the calculations run inline on its main thread
+        result = subprocess.run([sys.executable, BENCHMARK, "--repeat", "10"],
+                                capture_output=True, text=True, timeout=600)
+        assert result.returncode == 0, result.stdout + result.stderr
@@ -0,0 +1,85 @@
+import pytest
+import sys
+import os
+import math
+import time
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from calculations import compute_critical_points
+from models import CriticalPointsRequest
+from main import app
+
+client = TestClient(app)
+
+
+def find(function_string, start_x, end_x, method="numeric"):
+    request = CriticalPointsRequest(function_string=function_string, start_x=start_x, end_x=end_x, method=method)
+    return [(point["x"], point["type"]) for point in compute_critical_points(request).critical_points]
+
+
+class TestNumericCriticalPoints:
+    """Test the numeric critical point search"""
+
+    def test_sign_changes_are_refined(self):
+        """Test that roots of f' are found to full precision and classified"""
+        points = find("x*exp(-x^2)", -3, 3)
+        assert [kind for _, kind in points] == ["minimum", "maximum"]
+        assert abs(points[0][0] + math.sqrt(0.5)) < 1e-12
+        assert abs(points[1][0] - math.sqrt(0.5)) < 1e-12
+
+    def test_touching_root(self):
+        """Test that a root where f' only touches zero is found"""
+        assert find("x^3", -2, 2) == [(pytest.approx(0, abs=1e-9), "inflection")]
+
+    def test_flat_second_derivative(self):
+        """Test that f'' = 0 falls back to the sign of f' on either side"""
+        assert find("x^4", -1, 1) == [(pytest.approx(0, abs=1e-9), "minimum")]
+
+    def test_poles_are_not_critical_points(self):
+        """Test that a sign change of f' across a pole is rejected"""
+        assert find("1/x + x", 0.5, 2) == [(pytest.approx(1), "minimum")]
+        assert find("tan(x)", -3, 3) == []
+
+    def test_only_searches_interval(self):
+        """Test that roots outside the interval never appear"""
+        points = find("sin(x)", 0, 10)
+        assert [round(x / (math.pi / 2)) for x, _ in points] == [1, 3, 5]
+
+    def test_many_roots(self):
+        """Test that closely spaced roots are all found"""
+        assert len(find("sin(100x)", 0, 1)) == 32
+
+    def test_constant_function(self):
+        """Test that a flat function has no critical points"""
+        assert find("5", 0, 1) == []
+
+    def test_transcendental_is_fast(self):
+        """Test that an equation solve() can't handle is answered quickly"""
+        started = time.perf_counter()
+        points = find("cos(x) - x^2/10", -6, 6)
+        assert time.perf_counter() - started < 1
+        assert len(points) == 5
+
+
+class TestCriticalPointMethods:
+    """Test the symbolic and hybrid critical point modes"""
+
+    def test_hybrid_adds_missing_roots(self):
+        """Test that hybrid keeps numeric roots that solve() doesn't list"""
+        assert len(find("sin(100x)", 0, 1, "symbolic")) < len(find("sin(100x)", 0, 1, "hybrid")) == 32
+
+    def test_hybrid_survives_unsolvable(self):
+        """Test that hybrid falls back to the numeric roots when solve() fails"""
+        assert len(find("cos(x) - x^2/10", -6, 6, "hybrid")) == 5
+
+    def test_endpoint_reports_method(self):
+        """Test that the endpoint takes and reports the method"""
+        response = client.post("/find-critical-points", json={
+            "function_string": "x^3 - 3x", "start_x": -3, "end_x": 3, "method": "hybrid"
+        })
+        data = response.json()
+        assert data["method"] == "hybrid"
+        assert [point["type"] for point in data["critical_points"]] == ["maximum", "minimum"]
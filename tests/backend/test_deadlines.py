@@ -0,0 +1,146 @@
+import pytest
+import sys
+import os
+import asyncio
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import deadlines
+from deadlines import StageTimeout, stage_deadline
+from executor import ComputeExecutor, ComputeTimeout
+from calculations import compute_critical_points
+from models import CriticalPointsRequest
+
+
+def spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return os.getpid()
+
+
+class TestStageDeadline:
+    """Test per-stage deadlines inside a calculation"""
+
+    def test_stage_times_out(self):
+        """Test that a stage running past its deadline is interrupted"""
+        started = time.perf_counter()
+        with pytest.raises(StageTimeout) as excinfo:
+            with stage_deadline("solve", 0.1):
+                spin(5)
+        assert time.perf_counter() - started < 1
+        assert excinfo.value.stage == "solve"
+
+    def test_fast_stage_unaffected(self):
+        """Test that a stage finishing in time returns normally and clears the alarm"""
+        with stage_deadline("diff", 0.5):
+            value = 1 + 1
+        spin(0.6)
+        assert value == 2
+
+    def test_nested_outer_deadline_wins(self):
+        """Test that an inner stage can't extend an enclosing stage's deadline"""
+        started = time.perf_counter()
+        with pytest.raises(StageTimeout) as excinfo:
+            with stage_deadline("limit", 0.1):
+                with stage_deadline("parse", 5):
+                    spin(5)
+        assert time.perf_counter() - started < 1
+        assert excinfo.value.stage == "limit"
+
+    def test_slow_solve_returns_partial_result(self, monkeypatch):
+        """Test that a runaway solve() still returns the plot with a timeout error"""
+        monkeypatch.setitem(deadlines.STAGE_DEADLINES, "solve", 0.2)
+        request = CriticalPointsRequest(function_string="sin(x)*exp(x)+x^7", start_x=-2, end_x=2,
+                                        method="symbolic")
+        started = time.perf_counter()
+        response = compute_critical_points(request)
+        assert time.perf_counter() - started < 3
+        assert response.critical_points == []
+        assert len(response.function_points) > 0
+        assert "timed out" in response.error
+
+
+class TestExecutorDeadline:
+    """Test request deadlines enforced by the worker pool"""
+
+    def test_runaway_worker_is_killed(self):
+        """Test that a task past its deadline is stopped and its worker replaced"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+
+        async def scenario():
+            first_pid = await executor.run(spin, 0, timeout=5)
+            started = time.perf_counter()
+            with pytest.raises(ComputeTimeout):
+                await executor.run(spin, 30, timeout=0.3)
+            elapsed = time.perf_counter() - started
+            second_pid = await executor.run(spin, 0, timeout=5)
+            return first_pid, second_pid, elapsed
+
+        try:
+            first_pid, second_pid, elapsed = asyncio.run(scenario())
+            assert elapsed < 2
+            assert first_pid != second_pid
+            stats = executor.stats()
+            assert stats["timeouts"] == 1
+            assert stats["recycled_workers"] == 1
+        finally:
+            executor.shutdown()
+
+    def test_cancelled_task_stops_worker(self):
+        """Test that cancelling a running task recycles its worker"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+
+        async def scenario():
+            await executor.run(spin, 0)
+            task = asyncio.create_task(executor.run(spin, 30))
+            await asyncio.sleep(0.3)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            # The single worker is free again right away
+            return await executor.run(spin, 0, timeout=2)
+
+        try:
+            asyncio.run(scenario())
+            assert executor.stats()["recycled_workers"] == 1
+        finally:
+            executor.shutdown()
+
+    def test_short_cancelled_task_keeps_worker(self):
+        """Test that a task finishing within the cancel grace period doesn't recycle its worker"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+
+        async def scenario():
+            first_pid = await executor.run(spin, 0)
+            task = asyncio.create_task(executor.run(spin, 0.1))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return first_pid, await executor.run(spin, 0, timeout=2)
+
+        try:
+            first_pid, second_pid = asyncio.run(scenario())
+            assert first_pid == second_pid
+            assert executor.stats()["recycled_workers"] == 0
+        finally:
+            executor.shutdown()
+
+    def test_endpoint_returns_structured_timeout(self, monkeypatch):
+        """Test that an endpoint past its deadline answers 504 with details"""
+        from fastapi.testclient import TestClient
+        from main import app
+
+        monkeypatch.setitem(deadlines.ENDPOINT_DEADLINES, "critical_points", 0.3)
+        client = TestClient(app)
+        response = client.post("/find-critical-points", json={
+            "function_string": "sin(x)*exp(x)+x^7", "start_x": -2, "end_x": 2, "method": "symbolic"
+        })
+        assert response.status_code == 504
+        detail = response.json()["detail"]
+        assert detail["error"] == "timeout"
+        assert detail["endpoint"] == "critical_points"
+        assert detail["deadline_seconds"] == 0.3
@@ -0,0 +1,109 @@
+import pytest
+import sys
+import os
+import numpy as np
+from sympy import Symbol, sympify, sin, exp, diff
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from evaluator import CompiledExpression, JointExpression
+from expression_cache import ExpressionCache
+
+
+class TestCompiledExpression:
+    """Test the NumPy-compiled expression evaluator"""
+
+    def test_vectorized_matches_subs(self):
+        """Test that vectorized evaluation agrees with SymPy substitution"""
+        x = Symbol('x')
+        expr = sin(x) * exp(x / 5) + x**2
+        compiled = CompiledExpression(expr, x)
+
+        x_values = np.linspace(-3, 3, 25)
+        y_values = compiled.evaluate(x_values)
+        expected = [float(expr.subs(x, x_val)) for x_val in x_values]
+        assert np.allclose(y_values, expected)
+
+    def test_scalar_call(self):
+        """Test the scalar path used by integrate.quad"""
+        x = Symbol('x')
+        compiled = CompiledExpression(sympify("x**3 - 2*x"), x)
+        assert isinstance(compiled(2.0), float)
+        assert abs(compiled(2.0) - 4) < 1e-12
+
+    def test_undefined_points_are_nan(self):
+        """Test that poles and complex values are marked as missing"""
+        x = Symbol('x')
+        y_values = CompiledExpression(sympify("1/x"), x).evaluate([-1.0, 0.0, 1.0])
+        assert np.isnan(y_values[1])
+        assert y_values[0] == -1 and y_values[2] == 1
+
+        y_values = CompiledExpression(sympify("sqrt(x)"), x).evaluate([-4.0, 4.0])
+        assert np.isnan(y_values[0])
+        assert y_values[1] == 2
+
+    def test_scalar_undefined_raises(self):
+        """Test that the scalar path raises at undefined points"""
+        x = Symbol('x')
+        compiled = CompiledExpression(sympify("log(x)"), x)
+        with pytest.raises(ValueError):
+            compiled(-1.0)
+
+    def test_constant_expression(self):
+        """Test that constant expressions broadcast over the input"""
+        x = Symbol('x')
+        y_values = CompiledExpression(sympify("5"), x).evaluate(np.linspace(0, 1, 4))
+        assert y_values.shape == (4,)
+        assert np.all(y_values == 5)
+
+    def test_unknown_symbols_are_not_numeric(self):
+        """Test that expressions with other symbols evaluate to missing points"""
+        x = Symbol('x')
+        compiled = CompiledExpression(sympify("x*y"), x)
+        assert not compiled.is_numeric
+        assert np.all(np.isnan(compiled.evaluate([0.0, 1.0])))
+        with pytest.raises(ValueError):
+            compiled(1.0)
+
+    def test_scalar_only_functions_fall_back(self):
+        """Test functions that NumPy can't vectorize still evaluate point by point"""
+        x = Symbol('x')
+        y_values = CompiledExpression(sympify("factorial(x)"), x).evaluate([3.0, 4.0])
+        assert np.allclose(y_values, [6, 24])
+
+
+class TestJointExpression:
+    """Test evaluating f and its derivatives together"""
+
+    def test_rows_match_separate_evaluation(self):
+        """Test that each row equals evaluating that expression on its own"""
+        x = Symbol('x')
+        f = sin(x) * exp(x / 5)
+        exprs = [f, diff(f, x), diff(f, x, 2)]
+        x_values = np.linspace(-3, 3, 50)
+        rows = JointExpression(exprs, x).evaluate(x_values)
+        assert rows.shape == (3, 50)
+        for row, expr in zip(rows, exprs):
+            assert np.allclose(row, CompiledExpression(expr, x).evaluate(x_values))
+
+    def test_constant_rows_broadcast(self):
+        """Test that constant derivatives come back as full rows"""
+        x = Symbol('x')
+        rows = JointExpression([x**2, 2*x, sympify(2)], x).evaluate([0.0, 1.0, 2.0])
+        assert np.array_equal(rows[2], [2, 2, 2])
+
+    def test_undefined_and_fallback(self):
+        """Test NaN for undefined points and point-by-point fallback"""
+        x = Symbol('x')
+        rows = JointExpression([1 / x, sympify("factorial(x)")], x).evaluate([0.0, 3.0])
+        assert np.isnan(rows[0, 0])
+        assert np.allclose(rows[:, 1], [1 / 3, 6])
+
+    def test_derivatives_are_cached(self):
+        """Test that derivatives and the joint evaluator are built once per expression"""
+        parsed = ExpressionCache().get("x^3")
+        joint = parsed.joint(2)
+        assert parsed.joint(2) is joint
+        assert parsed.derivative(2) == 6 * parsed.symbol
+        assert parsed.compiled_derivative(1)(2.0) == 12
@@ -0,0 +1,259 @@
+import pytest
+import sys
+import os
+import asyncio
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from executor import SLOW_NICENESS, ComputeExecutor, ComputeUnavailable
+
+
+def square(value):
+    return value * value
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return os.getpid()
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+class PickyError(Exception):
+    """Pickles fine but can't be rebuilt from its args."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code}: {message}")
+
+
+def fail_picky():
+    raise PickyError(42, "nope")
+
+
+initialized = False
+
+
+def initialize():
+    global initialized
+    initialized = True
+
+
+def is_initialized():
+    return initialized
+
+
+def fail_to_initialize():
+    raise RuntimeError("no warm-up today")
+
+
+def pid_and_niceness():
+    return os.getpid(), os.nice(0)
+
+
+class TestComputeExecutor:
+    """Test the executor layer that keeps heavy math off the event loop"""
+
+    @pytest.mark.parametrize("kind", ["process", "thread", "inline"])
+    def test_runs_function(self, kind):
+        """Test that every executor kind returns the function result"""
+        executor = ComputeExecutor(kind=kind, max_workers=2)
+        try:
+            assert asyncio.run(executor.run(square, 7)) == 49
+            assert executor.stats()["completed"] == 1
+        finally:
+            executor.shutdown()
+
+    def test_exceptions_propagate(self):
+        """Test that errors raised in a worker reach the caller unchanged"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+        try:
+            with pytest.raises(ValueError, match="bad input"):
+                asyncio.run(executor.run(fail, "bad input"))
+        finally:
+            executor.shutdown()
+
+    def test_unreadable_result_fails_the_request(self):
+        """Test that a result that can't be unpickled fails the request and the pool recovers"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+        try:
+            with pytest.raises(ComputeUnavailable):
+                asyncio.run(asyncio.wait_for(executor.run(fail_picky), 10))
+            assert asyncio.run(asyncio.wait_for(executor.run(square, 5), 10)) == 25
+        finally:
+            executor.shutdown()
+
+    def test_worker_that_cannot_start_fails_the_request(self, monkeypatch):
+        """Test that a failing Process.start fails the request instead of hanging it"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+        pool = executor._get_pool()
+
+        class FailingProcess(pool._context.Process):
+            def start(self):
+                raise OSError(24, "Too many open files")
+
+        try:
+            monkeypatch.setattr(pool._context, "Process", FailingProcess)
+            with pytest.raises(ComputeUnavailable):
+                asyncio.run(asyncio.wait_for(executor.run(square, 3), 10))
+            # The manager thread survived and starts a worker once it can
+            monkeypatch.undo()
+            assert asyncio.run(asyncio.wait_for(executor.run(square, 3), 10)) == 9
+        finally:
+            executor.shutdown()
+
+    def test_unknown_kind(self):
+        """Test that an unknown executor kind is rejected"""
+        with pytest.raises(ValueError):
+            ComputeExecutor(kind="gpu")
+
+    def test_loop_stays_responsive(self):
+        """Test that the event loop keeps running while workers are busy"""
+        executor = ComputeExecutor(kind="process", max_workers=2)
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+
+            ticker_task = asyncio.create_task(ticker())
+            pids = await asyncio.gather(executor.run(busy, 0.3), executor.run(busy, 0.3))
+            ticker_task.cancel()
+            return ticks, pids
+
+        try:
+            ticks, pids = asyncio.run(scenario())
+            # The loop kept ticking while both calculations were running
+            assert ticks > 5
+            assert os.getpid() not in pids
+        finally:
+            executor.shutdown()
+
+    def test_queue_depth_reported(self):
+        """Test that work beyond the worker count shows up as queued"""
+        executor = ComputeExecutor(kind="thread", max_workers=1)
+
+        async def scenario():
+            tasks = [asyncio.create_task(executor.run(busy, 0.1)) for _ in range(3)]
+            await asyncio.sleep(0.02)
+            stats = executor.stats()
+            await asyncio.gather(*tasks)
+            return stats
+
+        try:
+            stats = asyncio.run(scenario())
+            assert stats["in_flight"] == 3
+            assert stats["queue_depth"] == 2
+        finally:
+            executor.shutdown()
+
+
+class TestWorkerInitialization:
+    """Test worker initializers and prestarted pools"""
+
+    def test_initializers_run_before_tasks(self):
+        """Test that a worker runs the initializers before its first task"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+        executor.initializers.append(initialize)
+        try:
+            assert asyncio.run(executor.run(is_initialized)) is True
+            assert executor.stats()["workers_started"] == 1
+        finally:
+            executor.shutdown()
+
+    def test_prestart_waits_for_every_worker(self):
+        """Test that start() returns once every prestarted worker is initialized"""
+        executor = ComputeExecutor(kind="process", max_workers=2)
+        executor.initializers.append(initialize)
+        executor.prestart = True
+        try:
+            assert executor.start(timeout=30)
+            stats = executor.stats()
+            assert stats["workers_started"] == 2
+            assert stats["last_warmup_seconds"] >= 0
+            assert stats["busy_workers"] == 0
+        finally:
+            executor.shutdown()
+
+    def test_start_without_prestart_returns_immediately(self):
+        """Test that start() only creates the pool when workers start on demand"""
+        executor = ComputeExecutor(kind="process", max_workers=2)
+        try:
+            assert executor.start(timeout=0.1)
+            assert executor.stats()["workers_started"] == 0
+        finally:
+            executor.shutdown()
+
+    def test_workers_do_not_inherit_this_process(self, monkeypatch):
+        """Test that workers start from a clean process rather than a fork of this one"""
+        monkeypatch.setattr(sys.modules[__name__], "initialized", True)
+        executor = ComputeExecutor(kind="process", max_workers=1)
+        try:
+            assert asyncio.run(executor.run(is_initialized)) is False
+        finally:
+            executor.shutdown()
+
+    def test_failed_initializer_is_reported(self):
+        """Test that a failing initializer is reported but the worker still calculates"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+        executor.initializers.append(fail_to_initialize)
+        try:
+            assert asyncio.run(executor.run(square, 3)) == 9
+            assert "no warm-up today" in executor.stats()["initializer_error"]
+        finally:
+            executor.shutdown()
+
+
+class TestLanes:
+    """Test the separate pool of the slow lane"""
+
+    def test_slow_lane_has_its_own_lower_priority_workers(self):
+        """Test that slow lane calculations run in other, niced worker processes"""
+        executor = ComputeExecutor(kind="process", max_workers=1, slow_workers=1)
+        try:
+            fast_pid, fast_niceness = asyncio.run(executor.run(pid_and_niceness))
+            slow_pid, slow_niceness = asyncio.run(executor.run(pid_and_niceness, lane="slow"))
+            assert fast_pid != slow_pid
+            assert slow_niceness == min(19, fast_niceness + SLOW_NICENESS)
+            assert executor.stats()["slow_lane"]["max_workers"] == 1
+        finally:
+            executor.shutdown()
+
+    def test_busy_slow_lane_does_not_delay_fast_lane(self):
+        """Test that fast calculations finish while the slow lane is occupied"""
+        executor = ComputeExecutor(kind="process", max_workers=1, slow_workers=1)
+
+        async def scenario():
+            slow = asyncio.ensure_future(executor.run(busy, 1.0, lane="slow"))
+            await asyncio.sleep(0.2)
+            started = time.perf_counter()
+            assert await executor.run(square, 4) == 16
+            fast_seconds = time.perf_counter() - started
+            await slow
+            return fast_seconds
+
+        try:
+            asyncio.run(executor.run(square, 1))  # start the fast lane's worker
+            assert asyncio.run(scenario()) < 0.5
+        finally:
+            executor.shutdown()
+
+    def test_without_slow_workers_lanes_share_the_pool(self):
+        """Test that the slow lane falls back to the main pool when it has no workers"""
+        executor = ComputeExecutor(kind="process", max_workers=1)
+        try:
+            fast_pid, _ = asyncio.run(executor.run(pid_and_niceness))
+            slow_pid, _ = asyncio.run(executor.run(pid_and_niceness, lane="slow"))
+            assert fast_pid == slow_pid
+            assert "slow_lane" not in executor.stats()
+        finally:
+            executor.shutdown()
@@ -0,0 +1,92 @@
+import pytest
+import sys
+import os
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from expression_cache import ExpressionCache, parse_function
+from main import app
+
+client = TestClient(app)
+
+
+class TestExpressionCache:
+    """Test the shared parse/compile cache"""
+
+    def test_repeated_lookup_hits(self):
+        """Test that the same function string is parsed only once"""
+        cache = ExpressionCache(maxsize=4)
+        first = cache.get("x^2 + 2x")
+        second = cache.get("x^2 + 2x")
+        assert first is second
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ExpressionCache(maxsize=2)
+        cache.get("x")
+        cache.get("x^2")
+        cache.get("x")      # x is now most recently used
+        cache.get("x^3")    # evicts x^2
+        assert cache.stats()["size"] == 2
+
+        cache.get("x")
+        assert cache.hits == 2
+        cache.get("x^2")
+        assert cache.misses == 4
+
+    def test_parse_errors_are_not_cached(self):
+        """Test that invalid input raises every time and is never stored"""
+        cache = ExpressionCache(maxsize=4)
+        for _ in range(2):
+            with pytest.raises(Exception):
+                cache.get("")
+        assert cache.stats()["size"] == 0
+
+    def test_entry_artifacts(self):
+        """Test that the entry carries LaTeX and a compiled evaluator"""
+        parsed = parse_function("3x^2")
+        assert parsed.latex == "3 x^{2}"
+        assert parsed.compiled(2.0) == 12
+        assert parsed.compiled is parsed.compiled
+
+    def test_stats_endpoint(self):
+        """Test that cache counters are exposed over HTTP"""
+        client.post("/calculate-derivative", json={"function_string": "x^5", "eval_point": 1})
+        client.post("/calculate-derivative", json={"function_string": "x^5", "eval_point": 2})
+        response = client.get("/stats")
+        assert response.status_code == 200
+        stats = response.json()["expression_cache"]
+        assert stats["hits"] >= 1
+        assert {"size", "maxsize", "misses", "hit_ratio"} <= stats.keys()
+
+
+class TestCanonicalKeys:
+    """Test that equivalent spellings of an expression share cache entries"""
+
+    def test_equivalent_spellings_share_entry(self):
+        """Test that "2x", "2*x", "2 x" and "x*2" resolve to one parsed expression"""
+        cache = ExpressionCache(maxsize=4)
+        entries = [cache.get(s) for s in ["2x", "2*x", "2 x", "x*2"]]
+        assert all(entry is entries[0] for entry in entries)
+        stats = cache.stats()
+        assert stats["size"] == 1
+        assert stats["aliases"] == 4
+        assert stats["canonical_hits"] == 3
+        assert stats["dedup_ratio"] == 0.75
+
+    def test_different_expressions_differ(self):
+        """Test that structurally different expressions get different keys"""
+        cache = ExpressionCache(maxsize=4)
+        assert cache.get("x^2").canonical_key != cache.get("2x").canonical_key
+        assert cache.get("x+1").canonical_key != cache.get("x-1").canonical_key
+
+    def test_response_reports_key(self):
+        """Test that responses carry the canonical key and equivalent requests share the cached response"""
+        first = client.post("/calculate-integral", json={"function_string": "3x^2", "start_x": 0, "end_x": 7})
+        second = client.post("/calculate-integral", json={"function_string": "x^2 * 3", "start_x": 0, "end_x": 7})
+        assert first.json()["canonical_key"] == second.json()["canonical_key"]
+        assert first.headers["etag"] == second.headers["etag"]
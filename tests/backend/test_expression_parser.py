@@ -0,0 +1,89 @@
+import pytest
+import sys
+import os
+
+from sympy import srepr
+from sympy.parsing.sympy_parser import parse_expr
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from expression_cache import TRANSFORMATIONS, ExpressionCache, parse
+from expression_parser import MAX_DEPTH, MAX_LENGTH, Unsupported, parse_tree, to_sympy
+
+FUNCTION_STRINGS = [
+    "x^2", "2x", "2 x", "3x^2 + 2x", "-3x + x^3", "x**2 * sin(x) + cos(x)", "-x^2", "x^-2", "2^3^2",
+    "sin(2x)", "2sin(x)", "(x^2 - 1)/(x - 1)", "abs(x)/x", "Abs(sin(x))", "tan(sin(exp(x)))*log(x+5)",
+    "sqrt(1+x^3)", "floor(x)", "1/(2+cos(x))", "x*exp(-x^2)", "log(x, 2)", "(x+1)(x-1)", "x sin(x)",
+    "sin x", "sin 2x", "sin x^2 + 1", "sin x*3 + 1", "sin^2 x", "sin^2(x)", "cos^2(x) + sin^2(x)",
+    "2.5x", ".5x", "1e-3x", "pi x", "E^x", "e^x", "oo", "1/x", "a*x + b",
+]
+
+
+class TestFastParser:
+    """Test that the fast parser builds the same expressions as parse_expr()"""
+
+    @pytest.mark.parametrize("function_string", FUNCTION_STRINGS)
+    def test_matches_parse_expr(self, function_string):
+        """Test that the fast parser's expression is structurally identical to parse_expr()'s"""
+        expected = parse_expr(function_string, transformations=TRANSFORMATIONS)
+        assert srepr(to_sympy(parse_tree(function_string))) == srepr(expected)
+
+    @pytest.mark.parametrize("function_string", ["", "sin(", "x+", "invalid_function(x)", "2j", "x[0]",
+                                                 "sin^2 cos^2 x", "Piecewise((x, x > 0), (0, True))"])
+    def test_rejects_what_it_does_not_handle(self, function_string):
+        """Test that input outside the grammar raises Unsupported"""
+        with pytest.raises(Unsupported):
+            parse_tree(function_string)
+
+    def test_falls_back_to_parse_expr(self):
+        """Test that parse() hands unsupported input to parse_expr() and reports it"""
+        expr, fast = parse("Max(x, 1)")
+        assert not fast
+        assert srepr(expr) == srepr(parse_expr("Max(x, 1)", transformations=TRANSFORMATIONS))
+        assert parse("x^2")[1]
+
+    def test_invalid_input_still_fails(self):
+        """Test that invalid input raises parse_expr()'s error"""
+        with pytest.raises(Exception):
+            parse("sin(")
+        with pytest.raises(SyntaxError):
+            parse("x+")
+
+
+class TestParseLimits:
+    """Test the limits that protect the parser from hostile input"""
+
+    def test_too_long(self):
+        """Test that an overly long function string is refused"""
+        with pytest.raises(ValueError, match="too long"):
+            parse("x+" * MAX_LENGTH + "x")
+
+    def test_too_deep(self):
+        """Test that deep nesting is refused on both paths"""
+        with pytest.raises(ValueError, match="nested too deeply"):
+            parse("(" * (MAX_DEPTH + 1) + "x" + ")" * (MAX_DEPTH + 1))
+        with pytest.raises(ValueError, match="nested too deeply"):
+            parse("-" * (MAX_DEPTH + 1) + "x")
+
+    def test_too_deep_power_in_implicit_argument(self):
+        """Test that a power chain in an argument without parentheses counts towards the depth"""
+        with pytest.raises(ValueError, match="nested too deeply"):
+            parse("sin x" + "^x" * (MAX_DEPTH + 1))
+
+    def test_huge_power(self):
+        """Test that an exact power with too many digits is refused before it is computed"""
+        with pytest.raises(ValueError, match="too large"):
+            parse("9^9^9")
+        assert parse("2^100")[0] == 2 ** 100
+
+
+class TestCacheCounts:
+    """Test the parse cache's count of fallback parses"""
+
+    def test_fallbacks_are_counted(self):
+        """Test that the cache counts the strings parse_expr() had to parse"""
+        cache = ExpressionCache()
+        cache.get("x^2 + 1")
+        cache.get("Max(x, 1)")
+        assert cache.stats()["fallback_parses"] == 1
@@ -0,0 +1,152 @@
+import pytest
+import sys
+import os
+import math
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from expression_cache import ExpressionCache
+from integration import antiderivative, definite_integral
+from sampling import sample_function
+from main import app
+
+client = TestClient(app)
+
+
+def integrate_string(function_string, start_x, end_x, repeats=2):
+    """Integrate a fresh parse `repeats` times; the closed form is only looked for on a repeat."""
+    parsed = ExpressionCache().get(function_string)
+    x_values, (y_values,) = sample_function([parsed.compiled.evaluate], start_x, end_x)
+    for _ in range(repeats):
+        result = definite_integral(parsed, start_x, end_x, x_values, y_values)
+    return parsed, result
+
+
+class TestIntegrationStrategy:
+    """Test the symbolic antiderivative fast path and its quadrature fallback"""
+
+    def test_polynomial_uses_antiderivative(self):
+        """Test that a polynomial is integrated in closed form"""
+        _, (area, error, method) = integrate_string("3x^2 + 2x", 0, 2)
+        assert method == "symbolic"
+        assert abs(area - 12) < 1e-12
+        assert error == 0
+
+    def test_first_request_is_numeric(self, monkeypatch):
+        """Test that a new integrand is answered numerically without waiting for SymPy"""
+        import integration
+
+        def fail(*args):
+            raise AssertionError("integrate() called on a first request")
+
+        monkeypatch.setattr(integration, "symbolic_integrate", fail)
+        _, (area, _, method) = integrate_string("3x^2 + 2x", 0, 2, repeats=1)
+        assert method == "cumulative"
+        assert abs(area - 12) < 1e-9
+
+    def test_antiderivative_is_cached(self):
+        """Test that the antiderivative is computed once per expression"""
+        parsed, _ = integrate_string("x*exp(x)", 0, 1)
+        F = antiderivative(parsed)
+        assert F is not None
+        assert antiderivative(parsed) is F
+
+    def test_pole_in_interval_falls_back(self):
+        """Test that an antiderivative is not used across a pole"""
+        _, (_, _, method) = integrate_string("tan(x)", 0, 3)
+        assert method == "quadrature"
+
+    def test_branch_corrected_antiderivative(self):
+        """Test that a closed form with periodic branch corrections gives the right area"""
+        _, (area, _, _) = integrate_string("1/(2+cos(x))", 0, 10)
+        from scipy import integrate
+        expected, _ = integrate.quad(lambda t: 1 / (2 + math.cos(t)), 0, 10, limit=200)
+        assert abs(area - expected) < 1e-8
+
+    def test_no_closed_form_integrates_numerically(self):
+        """Test that functions SymPy can't integrate fall back to numerical integration"""
+        _, (area, _, method) = integrate_string("Abs(x)", -1, 1)
+        assert method in ("cumulative", "quadrature")
+        assert abs(area - 1) < 1e-9
+
+    def test_reversed_limits(self):
+        """Test that F(b) - F(a) keeps the sign for reversed limits"""
+        _, (area, _, method) = integrate_string("x", 2, 0)
+        assert method == "symbolic"
+        assert abs(area + 2) < 1e-12
+
+    def test_response_reports_method(self):
+        """Test that the endpoint says which method was used"""
+        response = client.post("/calculate-integral", json={"function_string": "x^2", "start_x": 0, "end_x": 1})
+        data = response.json()
+        assert data["method"] in ("symbolic", "cumulative", "quadrature")
+        assert abs(data["area"] - 1/3) < 1e-9
+
+
+class TestOverflowingIntegrands:
+    """Test integrands whose terms overflow in part of the interval"""
+
+    @pytest.mark.parametrize("function_string, start_x, end_x, expected", [
+        ("1/(1+exp(-x))", -1000, 1000, 1000.0),
+        ("sech(100x)", -10, 10, math.pi / 100),
+    ])
+    def test_overflow_is_integrated(self, function_string, start_x, end_x, expected):
+        """Test that an overflow inside the integrand doesn't make the integral fail"""
+        response = client.post("/calculate-integral", json={
+            "function_string": function_string, "start_x": start_x, "end_x": end_x})
+        assert response.status_code == 200
+        assert response.json()["area"] == pytest.approx(expected, rel=1e-6)
+
+    @pytest.mark.parametrize("function_string", ["x", "x^2"])
+    def test_area_past_float_range_is_rejected(self, function_string):
+        """Test that an area too large for a float is a 400 rather than a null area or "undefined" """
+        response = client.post("/calculate-integral", json={
+            "function_string": function_string, "start_x": 0, "end_x": 1e300})
+        assert response.status_code == 400
+        assert "too large" in response.json()["detail"]
+
+    def test_wide_interval_within_float_range(self):
+        """Test that a wide interval whose area still fits a float is answered"""
+        response = client.post("/calculate-integral", json={"function_string": "1", "start_x": 0, "end_x": 1e300})
+        assert response.status_code == 200
+        assert response.json()["area"] == pytest.approx(1e300)
+
+
+class TestCumulativeIntegral:
+    """Test the per-expression cumulative integral table used while dragging bounds"""
+
+    def test_matches_quad(self):
+        """Test that table lookups agree with direct quadrature"""
+        from scipy import integrate
+        from integration import CumulativeIntegral
+        parsed = ExpressionCache().get("sqrt(1+x^3)")
+        table = CumulativeIntegral(parsed.compiled, 2.0 ** -5)
+        for start_x, end_x in [(0, 2), (0.13, 1.91), (2, 0), (0.5, 0.51)]:
+            area, _ = table.integral(start_x, end_x)
+            expected, _ = integrate.quad(parsed.compiled, start_x, end_x)
+            assert abs(area - expected) < 1e-10
+
+    def test_dragging_extends_table(self):
+        """Test that overlapping intervals only integrate the new cells"""
+        from integration import CumulativeIntegral
+        parsed = ExpressionCache().get("sqrt(1+x^3)")
+        table = CumulativeIntegral(parsed.compiled, 0.25)
+        table.integral(0, 2)
+        assert table.cells_computed == 8
+        # Moving the bounds inside the table costs no new cells
+        table.integral(0.3, 1.6)
+        assert table.cells_computed == 8
+        # Dragging past either end only adds what's missing
+        table.integral(-0.5, 2.5)
+        assert table.cells_computed == 12
+
+    def test_endpoint_uses_cumulative_table(self):
+        """Test that functions without a closed form integrate via the table"""
+        response = client.post("/calculate-integral", json={
+            "function_string": "Abs(sin(x))", "start_x": 0, "end_x": 4
+        })
+        data = response.json()
+        assert data["method"] == "cumulative"
+        assert abs(data["area"] - (2 + 1 - math.cos(4 - math.pi))) < 1e-8
@@ -0,0 +1,111 @@
+import pytest
+import sys
+import os
+import math
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from calculations import compute_limit
+from limits import decimal, snap
+from models import LimitRequest
+from main import app
+
+client = TestClient(app)
+
+
+def limit_of(function_string, approach_value, direction=None):
+    return compute_limit(LimitRequest(function_string=function_string, approach_value=approach_value,
+                                      direction=direction))
+
+
+class TestLimitTiers:
+    """Test which tier of the limit engine answers"""
+
+    def test_continuous_function_substitutes(self):
+        """Test that a continuous function is evaluated at the point"""
+        response = limit_of("x^2 + 1", 3)
+        assert response.tier == "substitution"
+        assert response.limit_value == 10
+        assert response.limit_latex == "10"
+
+    def test_removable_singularity_is_numeric(self):
+        """Test that a removable singularity is extrapolated from both sides"""
+        response = limit_of("(1-cos(x))/x^2", 0)
+        assert response.tier == "numeric"
+        assert response.limit_value == 0.5
+        assert response.limit_latex == r"\frac{1}{2}"
+
+    def test_one_sided_jump(self):
+        """Test that a one-sided limit at a jump uses only that side"""
+        response = limit_of("floor(x)", 1, "-")
+        assert response.tier == "numeric"
+        assert response.limit_value == 0
+
+    def test_infinite_limit_is_symbolic(self):
+        """Test that divergent limits are left to SymPy"""
+        response = limit_of("1/x", 0, "+")
+        assert response.tier == "symbolic"
+        assert response.limit_latex == r"\infty"
+
+    def test_oscillation_is_symbolic(self):
+        """Test that a limit that doesn't settle numerically is left to SymPy"""
+        assert limit_of("x*sin(1/x)", 0).tier == "symbolic"
+
+    @pytest.mark.parametrize("function_string, approach_value, direction", [
+        ("sin(pi/x)", 0, None),
+        ("cos(pi/x)", 0, None),
+        ("cos(2*pi/x)", 0, "+"),
+        ("cos(pi/(x-1))", 1, None),
+        ("sin(pi/x)", 0, "+"),
+        ("cos(pi*sqrt(2)/x)", 0, "+"),
+    ])
+    def test_oscillation_in_step_size_is_symbolic(self, function_string, approach_value, direction):
+        """Test that oscillation which halving steps would sample at one value isn't taken for a limit"""
+        response = limit_of(function_string, approach_value, direction)
+        assert response.tier == "symbolic"
+        assert response.limit_value is None
+        assert response.limit_latex == r"\left\langle -1, 1\right\rangle"
+
+    def test_mismatched_sides_are_symbolic(self):
+        """Test that a two-sided limit with different one-sided values isn't guessed"""
+        assert limit_of("abs(x)/x", 0).tier == "symbolic"
+
+    def test_endpoint_reports_tier(self):
+        """Test that the endpoint says which tier answered"""
+        response = client.post("/calculate-limit", json={"function_string": "sin(x)/x", "approach_value": 0})
+        data = response.json()
+        assert data["tier"] == "numeric"
+        assert data["limit_latex"] == "1"
+
+
+class TestSnapping:
+    """Test how numeric limits are written"""
+
+    def test_fractions_and_constants(self):
+        """Test that near-exact values are shown as fractions, or fractions of pi or e"""
+        assert snap(0.5000000000004) == (0.5, r"\frac{1}{2}")
+        assert snap(math.e) == (math.e, "e")
+        assert snap(2 * math.pi / 3)[1] == r"\frac{2 \pi}{3}"
+        assert snap(0)[1] == "0"
+
+    def test_other_values_stay_decimal(self):
+        """Test that values without a simple exact form are left as decimals"""
+        assert snap(math.sin(1)) == (math.sin(1), "0.841470984807897")
+
+    def test_small_values_are_not_zero(self):
+        """Test that the tolerance is relative, so small values aren't snapped to 0"""
+        for value in (1e-10, -3e-12, 4e-10):
+            snapped, snapped_latex = snap(value)
+            assert snapped == value
+            assert snapped_latex != "0"
+
+    def test_substitution_is_not_snapped(self):
+        """Test that f(a) is reported as computed, not as a nearby fraction"""
+        assert limit_of("x", 1e-10).limit_value == 1e-10
+        assert limit_of("x^2", 2e-5).limit_value == pytest.approx(4e-10, rel=1e-12)
+        response = limit_of("x", 0.3333333333)
+        assert response.limit_value == 0.3333333333
+        assert response.limit_latex == "0.3333333333"
+        assert decimal(10.0) == (10.0, "10")
@@ -422,6 +422,21 @@ class TestDerivativeCalculatorAPI:
         }
         response = client.post("/calculate-derivative", json=request_data)
         assert response.status_code == 400
+    
+    def test_calculate_derivative_unprintable_derivatives(self):
+        """Test that derivatives NumPy can't evaluate (of abs and Heaviside) still get a response"""
+        for function_string in ("abs(x)", "x*abs(x)", "Heaviside(x)"):
+            request_data = {
+                "function_string": function_string,
+                "eval_point": 1,
+                "start_x": -2,
+                "end_x": 2
+            }
+            response = client.post("/calculate-derivative", json=request_data)
+            assert response.status_code == 200, function_string
+            data = response.json()
+            assert len(data["function_points"]) > 0
+            assert len(data["derivative_points"]) > 0
 
 
 class TestCriticalPointsAPI:
@@ -483,6 +498,18 @@ class TestCriticalPointsAPI:
         }
         response = client.post("/find-critical-points", json=request_data)
         assert response.status_code == 400
+    
+    def test_find_critical_points_unprintable_derivatives(self):
+        """Test that functions with derivatives NumPy can't evaluate (abs, Heaviside) still get a response"""
+        for function_string in ("abs(x)", "Heaviside(x)"):
+            request_data = {
+                "function_string": function_string,
+                "start_x": -2,
+                "end_x": 2
+            }
+            response = client.post("/find-critical-points", json=request_data)
+            assert response.status_code == 200, function_string
+            assert len(response.json()["function_points"]) > 0
 
 
 class TestLimitCalculatorAPI:
@@ -565,5 +592,61 @@ class TestLimitCalculatorAPI:
         assert response.status_code == 400
 
 
+class TestColumnarPointFormat:
+    """Test the opt-in columnar plot format"""
+    
+    def test_default_format_unchanged(self):
+        """Test that responses use point lists unless columnar is requested"""
+        response = client.post("/calculate-integral", json={"function_string": "x^2", "start_x": 0, "end_x": 1})
+        data = response.json()
+        assert data["columns"] is None
+        assert len(data["function_points"]) > 0
+    
+    def test_columnar_integral(self):
+        """Test that the columnar format returns matching x and y arrays"""
+        request_data = {
+            "function_string": "x^2",
+            "start_x": 0,
+            "end_x": 2,
+            "point_format": "columnar"
+        }
+        response = client.post("/calculate-integral", json=request_data)
+        assert response.status_code == 200
+        
+        data = response.json()
+        assert data["function_points"] == []
+        columns = data["columns"]
+        assert len(columns["x"]) == len(columns["series"]["function"])
+        for x_val, y_val in zip(columns["x"], columns["series"]["function"]):
+            assert abs(y_val - x_val**2) < 1e-9
+    
+    def test_columnar_derivative_shares_x(self):
+        """Test that function and derivative share one x array with null gaps"""
+        request_data = {
+            "function_string": "1/x",
+            "start_x": -1,
+            "end_x": 1,
+            "point_format": "columnar"
+        }
+        response = client.post("/calculate-derivative", json=request_data)
+        assert response.status_code == 200
+        
+        columns = response.json()["columns"]
+        assert set(columns["series"]) == {"function", "derivative"}
+        assert len(columns["series"]["derivative"]) == len(columns["x"])
+        assert None in columns["series"]["function"]
+    
+    def test_unknown_point_format(self):
+        """Test that an unknown point format is rejected"""
+        request_data = {
+            "function_string": "x",
+            "start_x": 0,
+            "end_x": 1,
+            "point_format": "csv"
+        }
+        response = client.post("/find-critical-points", json=request_data)
+        assert response.status_code == 422
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,146 @@
+import pytest
+import sys
+import os
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import metrics
+from metrics import Counter, Histogram, Registry
+from response_cache import response_cache
+from main import app
+
+client = TestClient(app)
+
+
+def sample_value(text, sample):
+    """The value of one sample line (name plus labels) in Prometheus text output."""
+    for line in text.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+class TestMetricTypes:
+    """Test the counters and histograms behind /metrics"""
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test that each bucket counts every observation up to its bound"""
+        histogram = Histogram("t_seconds", "test", ("stage",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(("parse",), value)
+        text = "\n".join(histogram.render())
+        assert sample_value(text, 't_seconds_bucket{stage="parse",le="0.1"}') == 1
+        assert sample_value(text, 't_seconds_bucket{stage="parse",le="1"}') == 3
+        assert sample_value(text, 't_seconds_bucket{stage="parse",le="+Inf"}') == 4
+        assert sample_value(text, 't_seconds_count{stage="parse"}') == 4
+        assert sample_value(text, 't_seconds_sum{stage="parse"}') == pytest.approx(6.05)
+
+    def test_counter_per_label_set(self):
+        """Test that a counter keeps one series per label values"""
+        counter = Counter("t_total", "test", ("method",))
+        counter.inc(("quad",), 21)
+        counter.inc(("quad",), 21)
+        counter.inc(("cumulative",), 15)
+        text = "\n".join(counter.render())
+        assert "# TYPE t_total counter" in text
+        assert sample_value(text, 't_total{method="quad"}') == 42
+        assert sample_value(text, 't_total{method="cumulative"}') == 15
+
+    def test_events_are_folded_in_at_render(self):
+        """Test that recorded events only reach the registry when it is rendered or absorbs them"""
+        registry = Registry()
+        metrics.drain()
+        with metrics.timed("sampling"):
+            pass
+        metrics.record("evaluations", ("quad",), 63)
+        assert registry.stage_duration.series == {}
+        text = registry.render()
+        assert sample_value(text, 'area_stage_duration_seconds_count{stage="sampling"}') == 1
+        assert sample_value(text, 'area_integrand_evaluations_total{method="quad"}') == 63
+        assert metrics.drain() == []
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+    def test_forked_process_forgets_queued_events(self):
+        """Test that a forked process doesn't report the events its parent had queued"""
+        metrics.drain()
+        metrics.record("evaluations", ("quad",), 1)
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0 if metrics.drain() == [] else 1)
+        _, status = os.waitpid(pid, 0)
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert metrics.drain() == [("evaluations", ("quad",), 1)]
+
+    def test_collectors_run_at_scrape_time(self):
+        """Test that collector values are read when rendering, with their own type"""
+        registry = Registry()
+        calls = []
+        registry.add_collector(lambda: calls.append(1) or [("t_ready", "gauge", "test", (), 1)])
+        assert calls == []
+        text = registry.render()
+        assert "# TYPE t_ready gauge" in text
+        assert sample_value(text, "t_ready") == 1
+        assert calls == [1]
+
+
+class TestMetricsEndpoint:
+    """Test the /metrics endpoint"""
+
+    def test_prometheus_text(self):
+        """Test that /metrics is served in the Prometheus text format"""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert "# TYPE area_http_request_duration_seconds histogram" in response.text
+        assert "# TYPE area_stage_duration_seconds histogram" in response.text
+
+    def test_request_and_stage_timings(self):
+        """Test that a calculation is timed per endpoint and per stage, including worker stages"""
+        before = client.get("/metrics").text
+        requests = 'area_http_requests_total{path="/calculate-integral",method="POST",status="200"}'
+        response_cache.clear()
+        response = client.post("/calculate-integral", json={"function_string": "tan(x)", "start_x": 0, "end_x": 3})
+        assert response.status_code == 200
+        after = client.get("/metrics").text
+
+        assert sample_value(after, requests) == (sample_value(before, requests) or 0) + 1
+        assert sample_value(after, 'area_http_request_duration_seconds_count{path="/calculate-integral",method="POST"}')
+        for stage in ("parse", "sampling", "latex", "quad", "serialization"):
+            assert sample_value(after, f'area_stage_duration_seconds_count{{stage="{stage}"}}'), stage
+        # The pole leaves the interval to quad, which reports its evaluations
+        assert sample_value(after, 'area_integrand_evaluations_total{method="quad"}') > 0
+
+    def test_errors_by_type(self):
+        """Test that failed calculations are counted by endpoint and exception type"""
+        sample = 'area_calculation_errors_total{endpoint="limit",type="SyntaxError"}'
+        before = sample_value(client.get("/metrics").text, sample) or 0
+        response = client.post("/calculate-limit", json={"function_string": "x+", "approach_value": 1})
+        assert response.status_code == 400
+        assert sample_value(client.get("/metrics").text, sample) == before + 1
+
+    def test_unknown_paths_share_a_label(self):
+        """Test that requests to unknown paths don't create a series per path"""
+        client.get("/no-such-page-1")
+        client.get("/no-such-page-2")
+        text = client.get("/metrics").text
+        assert "no-such-page" not in text
+        assert sample_value(text, 'area_http_requests_total{path="other",method="GET",status="404"}') >= 2
+
+    def test_events_are_absorbed_without_a_scrape(self):
+        """Test that the API process's event queue is emptied after every request, scraped or not"""
+        for _ in range(5):
+            client.post("/calculate-integral", json={"function_string": "x^2", "start_x": 0, "end_x": 1})
+            metrics.record("stage", ("test",), 0.001)
+            client.get("/test")
+        assert metrics.drain() == []
+
+    def test_gauges_and_cache_ratios(self):
+        """Test that in-flight gauges and cache hit ratios are exported"""
+        text = client.get("/metrics").text
+        # The scrape itself is in flight
+        assert sample_value(text, 'area_http_requests_in_flight{path="/metrics"}') == 1
+        assert sample_value(text, "area_executor_in_flight") == 0
+        assert sample_value(text, 'area_cache_hit_ratio{cache="response"}') is not None
+        assert sample_value(text, 'area_cache_hit_ratio{cache="expression"}') is not None
@@ -0,0 +1,118 @@
+import pytest
+import sys
+import os
+import math
+import numpy as np
+from sympy import Symbol, cot, diff, exp, lambdify, sin, sympify
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from evaluator import CompiledExpression, Overflow
+from numeric_plan import NumericPlan, Uncompilable
+
+x = Symbol('x')
+
+EXPRESSIONS = [
+    "x**2 + 3*x - 1", "x*sin(x) + exp(-x**2)", "tan(sin(exp(x)))*log(x + 5)", "sqrt(1 + x**3)",
+    "Abs(x)/x", "floor(x)*sign(x)", "1/(2 + cos(x))", "x**(1/3)", "2**x", "x**x", "exp(-1/x**2)",
+    "asin(x/5) + acosh(x) + atanh(x/5)", "sec(x) + csc(x)", "acot(x) + asec(x)", "erf(x)*gamma(x)", "pi*x/3",
+]
+
+
+def reference(expr, x_values):
+    with np.errstate(all="ignore"):
+        y_values = np.broadcast_to(lambdify(x, expr, modules=["scipy", "numpy"])(x_values), x_values.shape)
+    return np.where(np.isfinite(y_values), y_values, np.nan)
+
+
+class TestNumericPlan:
+    """Test expressions compiled to NumPy instruction lists"""
+
+    @pytest.mark.parametrize("expression", EXPRESSIONS)
+    def test_matches_lambdify(self, expression):
+        """Test that a plan evaluates like the lambdified expression, NaN where undefined"""
+        expr = sympify(expression)
+        x_values = np.linspace(-4, 4, 161)
+        y_values = NumericPlan([expr], x).evaluate(x_values)[0]
+        assert np.allclose(y_values, reference(expr, x_values), rtol=1e-12, equal_nan=True)
+
+    def test_cot_squared(self):
+        """Test reciprocal functions under a power, which lambdify prints with the wrong precedence"""
+        expr = diff(cot(x), x)  # -cot(x)**2 - 1
+        assert NumericPlan([expr], x).evaluate([-5.0])[0, 0] == pytest.approx(float(expr.subs(x, -5)))
+
+    def test_shared_subexpressions_are_computed_once(self):
+        """Test that a term shared by several expressions takes one instruction"""
+        f = sin(x) * exp(x / 5)
+        plan = NumericPlan([f, diff(f, x)], x)
+        assert sum(ufunc is np.exp for ufunc, *_ in plan.instructions) == 1
+        assert sum(ufunc is np.sin for ufunc, *_ in plan.instructions) == 1
+        assert plan.evaluate(np.linspace(0, 1, 5)).shape == (2, 5)
+
+    def test_registers_are_reused(self):
+        """Test that a deep expression needs only a few scratch rows"""
+        expr = sympify("sin(cos(tan(exp(sin(cos(x + 1))))))")
+        plan = NumericPlan([expr], x)
+        assert len(plan.instructions) == 7
+        assert plan.scratch_count <= 1
+
+    def test_constant_and_repeated_rows(self):
+        """Test that constants, x itself and repeated expressions fill whole rows"""
+        rows = NumericPlan([sympify(2), x, x, x**2, x**2], x).evaluate([1.0, 3.0])
+        assert np.array_equal(rows, [[2, 2], [1, 3], [1, 3], [1, 9], [1, 9]])
+
+    def test_shape_is_kept(self):
+        """Test that the rows have the shape of the input"""
+        assert NumericPlan([x + 1], x).evaluate(np.zeros((3, 4))).shape == (1, 3, 4)
+
+    @pytest.mark.parametrize("expression", ["x + I", "factorial(x)", "Piecewise((x, x > 0), (0, True))",
+                                            "x*y", "Max(x, 1)"])
+    def test_uncompilable(self, expression):
+        """Test that expressions without a ufunc for every part are refused"""
+        with pytest.raises(Uncompilable):
+            NumericPlan([sympify(expression)], x)
+
+
+class TestScalarPath:
+    """Test a plan evaluated at single points"""
+
+    @pytest.mark.parametrize("expression", EXPRESSIONS)
+    def test_matches_vectorized(self, expression):
+        """Test that value_at agrees with evaluate wherever both are defined"""
+        plan = NumericPlan([sympify(expression)], x)
+        x_values = np.linspace(-4, 4, 41) + 0.01
+        y_values = plan.evaluate(x_values)[0]
+        for x_val, y_val in zip(x_values, y_values):
+            if not math.isnan(plan.value_at(x_val)):
+                assert plan.value_at(x_val) == pytest.approx(y_val, rel=1e-12)
+
+    def test_domain_errors_are_nan(self):
+        """Test that logs of negatives, poles and complex powers are undefined"""
+        for expression, x_val in [("log(x)", -1.0), ("1/x", 0.0), ("x**(1/3)", -8.0), ("exp(x)", 1000.0)]:
+            assert math.isnan(NumericPlan([sympify(expression)], x).value_at(x_val))
+
+    def test_overflow_is_not_undefined(self):
+        """Test that an overflowing intermediate carries on as inf, as in the vectorized path"""
+        for expression, x_val, expected in [("1/(1 + exp(-x))", -1000.0, 0.0), ("sech(100*x)", 10.0, 0.0),
+                                            ("exp(-exp(x))", 1000.0, 0.0), ("atan(cosh(x))", 800.0, math.pi / 2)]:
+            plan = NumericPlan([sympify(expression)], x)
+            assert plan.value_at(x_val) == expected
+            assert plan.evaluate([x_val])[0, 0] == expected
+
+    def test_out_of_range_values_can_be_told_from_undefined(self):
+        """Test that a value beyond float range is returned as `overflow`, and poles still as NaN"""
+        for expression, x_val in [("x**2", 1e200), ("x*x", 1e200), ("exp(x)", 1000.0)]:
+            assert NumericPlan([sympify(expression)], x).value_at(x_val, overflow=math.inf) == math.inf
+        for expression, x_val in [("1/x", 0.0), ("log(x)", -1.0)]:
+            assert math.isnan(NumericPlan([sympify(expression)], x).value_at(x_val, overflow=math.inf))
+        with pytest.raises(Overflow):
+            CompiledExpression(sympify("x**2"), x)(1e200)
+
+    def test_compiled_expression_uses_the_plan(self):
+        """Test that CompiledExpression evaluates through a plan and keeps its contract"""
+        compiled = CompiledExpression(sympify("log(x)"), x)
+        assert compiled._plan is not None
+        assert compiled(math.e) == pytest.approx(1.0)
+        with pytest.raises(ValueError):
+            compiled(-1.0)
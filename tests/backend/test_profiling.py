@@ -0,0 +1,88 @@
+import pytest
+import sys
+import os
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import main
+from calculations import compute_integral
+from models import IntegralRequest
+from profiling import ProfileStore, profile_call, summarize
+from main import app
+
+client = TestClient(app)
+
+TAN_INTEGRAL = {"function_string": "tan(x)", "start_x": 0, "end_x": 3}
+
+
+@pytest.fixture
+def profiling_enabled(monkeypatch):
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+
+
+class TestProfileCall:
+    """Test profiling a single calculation"""
+
+    def test_report_breakdown(self):
+        """Test that a report has stage times, evaluations, SymPy cache counters and top functions"""
+        result, report = profile_call(compute_integral, IntegralRequest(**TAN_INTEGRAL))
+        assert result.method == "quadrature"
+        assert report["total_ms"] > 0
+        assert {"parse", "sampling", "quad"} <= set(report["stages_ms"])
+        assert report["evaluations"]["quad"] > 0
+        assert set(report["sympy_cache"]) == {"hits", "misses"}
+        assert 0 < len(report["top_functions"]) <= 15
+        assert {"function", "calls", "own_ms", "cumulative_ms"} == set(report["top_functions"][0])
+
+    def test_summary_fits_a_header(self):
+        """Test that the header form is a single line with the id and the stages"""
+        _, report = profile_call(compute_integral, IntegralRequest(**TAN_INTEGRAL))
+        summary = summarize("abc", report)
+        assert "\n" not in summary
+        assert summary.startswith("id=abc; total=")
+        assert "quad=" in summary
+
+    def test_store_keeps_most_recent(self):
+        """Test that the store forgets the oldest reports beyond its size"""
+        store = ProfileStore(maxsize=2)
+        ids = [store.add({"n": i}) for i in range(3)]
+        assert store.get(ids[0]) is None
+        assert store.get(ids[2]) == {"n": 2}
+
+
+class TestProfilingEndpoints:
+    """Test requesting profiles over HTTP"""
+
+    def test_disabled_by_default(self):
+        """Test that the header is ignored unless profiling is enabled"""
+        response = client.post("/calculate-integral", json=TAN_INTEGRAL, headers={"X-Profile": "1"})
+        assert response.status_code == 200
+        assert "x-profile" not in response.headers
+
+    def test_header_opt_in(self, profiling_enabled):
+        """Test that X-Profile returns a summary and the full report stays available by id"""
+        response = client.post("/calculate-integral", json=TAN_INTEGRAL, headers={"X-Profile": "1"})
+        assert response.status_code == 200
+        assert response.json()["method"] == "quadrature"
+        summary = response.headers["x-profile"]
+        profile_id = summary.split(";")[0].removeprefix("id=")
+
+        report = client.get(f"/profiles/{profile_id}").json()
+        assert report["endpoint"] == "integral"
+        assert "serialization" in report["stages_ms"]
+        assert report["evaluations"]["quad"] > 0
+
+    def test_query_opt_in_bypasses_cache(self, profiling_enabled):
+        """Test that ?profile=1 works on GET variants and is never answered from the response cache"""
+        params = {"function_string": "x^2", "start_x": 0, "end_x": 1}
+        client.get("/calculate-integral", params=params)
+        response = client.get("/calculate-integral", params={**params, "profile": "1"})
+        assert response.status_code == 200
+        assert "x-profile" in response.headers
+        assert "parse=" in response.headers["x-profile"]
+
+    def test_unknown_profile(self):
+        """Test that an unknown profile id is a 404"""
+        assert client.get("/profiles/does-not-exist").status_code == 404
@@ -0,0 +1,102 @@
+import pytest
+import sys
+import os
+import time
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from models import IntegralRequest
+from response_cache import ResponseCache, request_key, response_cache
+from main import app
+
+client = TestClient(app)
+
+
+class TestResponseCache:
+    """Test the LRU/TTL cache of encoded responses"""
+
+    def test_hit_after_put(self):
+        """Test that a stored response is returned with its ETag"""
+        cache = ResponseCache(maxsize=4)
+        entry = cache.create(b'{"area": 1.0}')
+        cache.put("a", entry)
+        assert cache.get("a") is entry
+        assert cache.get("b") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = ResponseCache(maxsize=2)
+        for key in "abc":
+            cache.put(key, cache.create(key.encode()))
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+
+    def test_entries_expire(self):
+        """Test that entries are dropped after the TTL"""
+        cache = ResponseCache(maxsize=2, ttl=0.05)
+        cache.put("a", cache.create(b"1"))
+        time.sleep(0.1)
+        assert cache.get("a") is None
+        assert cache.stats()["expired"] == 1
+
+    def test_equivalent_requests_share_a_key(self):
+        """Test that defaults and number formatting don't change the key"""
+        first = IntegralRequest(function_string="x", start_x=0, end_x=1)
+        second = IntegralRequest(function_string="x", start_x=0.0, end_x=1.0, point_format="points")
+        assert request_key("integral", first) == request_key("integral", second)
+
+    def test_etag_matching(self):
+        """Test If-None-Match parsing, including lists and weak tags"""
+        entry = ResponseCache().create(b"body")
+        assert entry.matches(entry.etag)
+        assert entry.matches(f'"other", W/{entry.etag}')
+        assert entry.matches("*")
+        assert not entry.matches('"other"')
+        assert not entry.matches("")
+
+
+class TestCachedEndpoints:
+    """Test response caching and conditional GETs on the calculation endpoints"""
+
+    def setup_method(self):
+        response_cache.clear()
+
+    def test_repeated_post_is_served_from_cache(self):
+        """Test that an identical request is answered from the cache"""
+        request_data = {"function_string": "x^3", "start_x": 0, "end_x": 2}
+        first = client.post("/calculate-integral", json=request_data)
+        second = client.post("/calculate-integral", json=request_data)
+        assert first.content == second.content
+        assert first.headers["etag"] == second.headers["etag"]
+        assert response_cache.stats()["hits"] == 1
+
+    def test_get_variant(self):
+        """Test that the GET variant takes query parameters and is cacheable"""
+        response = client.get("/calculate-derivative", params={"function_string": "x^2", "eval_point": 3})
+        assert response.status_code == 200
+        assert abs(response.json()["derivative_value"] - 6) < 0.001
+        assert response.headers["cache-control"].startswith("public, max-age=")
+        assert response.headers["etag"]
+
+    def test_conditional_get(self):
+        """Test that a matching If-None-Match answers 304 without a body"""
+        params = {"function_string": "sin(x)/x", "approach_value": 0}
+        first = client.get("/calculate-limit", params=params)
+        second = client.get("/calculate-limit", params=params, headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["etag"] == first.headers["etag"]
+
+    def test_get_validation(self):
+        """Test that invalid query parameters are rejected like invalid bodies"""
+        response = client.get("/calculate-integral", params={"function_string": "x", "start_x": 0})
+        assert response.status_code == 422
+
+    def test_errors_are_not_cached(self):
+        """Test that failed calculations are recomputed rather than cached"""
+        client.post("/calculate-integral", json={"function_string": "", "start_x": 0, "end_x": 1})
+        assert response_cache.stats()["size"] == 0
@@ -0,0 +1,106 @@
+import pytest
+import sys
+import os
+import numpy as np
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+from expression_cache import parse_function
+from sampling import sample_function, DEFAULT_MAX_POINTS
+from main import app
+
+client = TestClient(app)
+
+
+def sample(function_string, start_x, end_x, **kwargs):
+    evaluate = parse_function(function_string).compiled.evaluate
+    x_values, (y_values,) = sample_function([evaluate], start_x, end_x, **kwargs)
+    return x_values, y_values
+
+
+class TestAdaptiveSampling:
+    """Test the adaptive, discontinuity-aware plot sampler"""
+
+    def test_flat_function_uses_few_points(self):
+        """Test that a straight line isn't refined at all"""
+        x_values, y_values = sample("2x+1", 0, 2)
+        assert len(x_values) < 100
+        assert np.allclose(y_values, 2 * x_values + 1)
+
+    def test_oscillating_function_is_refined(self):
+        """Test that steep or oscillating regions get more points than flat ones"""
+        x_values, _ = sample("sin(1/x)", 0.01, 1)
+        near_zero = np.sum(x_values < 0.1)
+        assert near_zero > np.sum(x_values > 0.5)
+
+    def test_budget_and_pixel_width(self):
+        """Test that the point budget and the client's pixel width are respected"""
+        x_values, _ = sample("sin(1/x)", 0.01, 1)
+        assert len(x_values) <= DEFAULT_MAX_POINTS
+        x_values, _ = sample("sin(1/x)", 0.01, 1, pixel_width=120)
+        assert len(x_values) <= 120
+
+    def test_pole_is_marked_as_gap(self):
+        """Test that the plot is broken at the poles of tan(x)"""
+        x_values, y_values = sample("tan(x)", -3, 3)
+        gaps = x_values[np.isnan(y_values)]
+        assert len(gaps) == 2
+        assert np.allclose(sorted(np.abs(gaps)), [np.pi / 2, np.pi / 2], atol=1e-4)
+
+    def test_gap_markers_fit_the_pixel_width(self):
+        """Test that gap markers don't push the point count past the pixel width"""
+        for start_x, end_x, pixel_width in [(-30, 30, 40), (-10, 10, 50)]:
+            x_values, y_values = sample("tan(x)", start_x, end_x, pixel_width=pixel_width)
+            assert len(x_values) <= pixel_width
+            assert np.isnan(y_values).any()
+            assert np.all(np.diff(x_values) > 0)
+
+    def test_steep_continuous_function_has_no_gap(self):
+        """Test that a steep but continuous curve isn't mistaken for a jump"""
+        _, y_values = sample("tanh(100x)", -1, 1)
+        assert not np.isnan(y_values).any()
+
+    def test_step_is_marked_as_gap(self):
+        """Test that jump discontinuities are marked"""
+        x_values, y_values = sample("floor(x)", 0.5, 1.5)
+        gaps = x_values[np.isnan(y_values)]
+        assert len(gaps) == 1
+        assert abs(gaps[0] - 1) < 1e-4
+
+    def test_reversed_interval_keeps_order(self):
+        """Test that start_x > end_x samples from start to end"""
+        x_values, _ = sample("x^2", 2, 0)
+        assert x_values[0] == 2 and x_values[-1] == 0
+        assert np.all(np.diff(x_values) < 0)
+
+
+class TestSampledEndpoints:
+    """Test the sampler through the plotting endpoints"""
+
+    def test_gap_markers_in_response(self):
+        """Test that undefined points are returned once per gap as y = None"""
+        response = client.post("/calculate-derivative", json={
+            "function_string": "1/x", "start_x": -1, "end_x": 1
+        })
+        assert response.status_code == 200
+        points = response.json()["function_points"]
+        gaps = [point for point in points if point["y"] is None]
+        assert len(gaps) == 1
+        assert abs(gaps[0]["x"]) < 1e-6
+
+    def test_pixel_width_caps_points(self):
+        """Test that pixel_width limits the number of returned points"""
+        response = client.post("/find-critical-points", json={
+            "function_string": "sin(10x)", "start_x": 0, "end_x": 10, "pixel_width": 50
+        })
+        assert response.status_code == 200
+        assert len(response.json()["function_points"]) <= 50
+
+    def test_invalid_pixel_width(self):
+        """Test that a nonsensical pixel width is rejected"""
+        response = client.post("/calculate-integral", json={
+            "function_string": "x", "start_x": 0, "end_x": 1, "pixel_width": 0
+        })
+        assert response.status_code == 422
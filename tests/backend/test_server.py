@@ -0,0 +1,79 @@
+import pytest
+import sys
+import os
+import json
+import socket
+import subprocess
+import time
+import urllib.request
+
+# Add the backend directory to Python path
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from server import compute_workers_per_server, default_workers
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class TestSizing:
+    """Test how the launcher divides the cores"""
+
+    def test_default_workers(self):
+        """Test that a few server processes are started, never more than there are cores"""
+        assert default_workers(1) == 1
+        assert default_workers(2) == 2
+        assert default_workers(64) == 4
+
+    def test_compute_workers_fill_the_cores(self):
+        """Test that server processes times compute workers, slow lane included, matches the core count"""
+        assert compute_workers_per_server(16, 4) == (3, 1)
+        assert compute_workers_per_server(6, 4) == (1, 0)
+        assert compute_workers_per_server(1, 1) == (1, 0)
+
+    def test_set_slow_workers_come_out_of_the_share(self):
+        """Test that an explicit slow-lane worker count is taken from each process's share"""
+        assert compute_workers_per_server(16, 4, slow_workers=0) == (4, 0)
+        assert compute_workers_per_server(16, 4, slow_workers=2) == (2, 2)
+        assert compute_workers_per_server(4, 4, slow_workers=1) == (1, 1)
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="the launcher forks")
+class TestLauncher:
+    """Test the multi-process launcher end to end"""
+
+    def test_processes_share_responses(self):
+        """Test that two forked server processes answer on one port and share cached responses"""
+        port = free_port()
+        env = dict(os.environ, AREA_WORKERS="1")
+        server = subprocess.Popen([sys.executable, "server.py", "--workers", "2", "--host", "127.0.0.1",
+                                   "--port", str(port), "--log-level", "warning"],
+                                  cwd=BACKEND_DIR, env=env, stderr=subprocess.PIPE)
+        base = f"http://127.0.0.1:{port}"
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    urllib.request.urlopen(f"{base}/ready", timeout=5)
+                    break
+                except OSError:
+                    assert time.monotonic() < deadline, "server did not become ready"
+                    time.sleep(0.1)
+
+            body = json.dumps({"function_string": "x^2 + 1", "start_x": 0, "end_x": 3}).encode()
+            for _ in range(6):
+                request = urllib.request.Request(f"{base}/calculate-integral", data=body,
+                                                 headers={"Content-Type": "application/json"})
+                assert json.load(urllib.request.urlopen(request, timeout=30))["area"] == pytest.approx(12)
+            stats = json.load(urllib.request.urlopen(f"{base}/stats", timeout=5))["response_cache"]
+            assert stats["shared"] is not None
+            assert stats["shared"]["size"] == 1
+        finally:
+            server.terminate()
+            server.wait(30)
+        assert b"with 2 processes" in server.stderr.read()
@@ -0,0 +1,144 @@
+import pytest
+import sys
+import os
+import time
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import asyncio
+import calculations
+import dispatch
+from main import app
+from single_flight import single_flight
+from response_cache import response_cache
+
+client = TestClient(app)
+
+
+def slow_limit(request):
+    time.sleep(30)
+
+
+class TestSession:
+    """Test the /ws/session WebSocket endpoint"""
+
+    def test_results_are_pushed(self):
+        """Test that each message gets a reply with its id and result"""
+        with client.websocket_connect("/ws/session") as websocket:
+            websocket.send_json({"id": 1, "type": "integral", "function_string": "x^2", "start_x": 0, "end_x": 1})
+            reply = websocket.receive_json()
+            assert reply["id"] == 1
+            assert reply["status"] == "ok"
+            assert abs(reply["result"]["area"] - 1/3) < 0.001
+
+            # The connection is reused for the next calculation
+            websocket.send_json({"id": 2, "type": "derivative", "function_string": "x^3", "eval_point": 2})
+            reply = websocket.receive_json()
+            assert reply["id"] == 2
+            assert abs(reply["result"]["derivative_value"] - 12) < 0.001
+
+    def test_errors_match_http_endpoints(self):
+        """Test that failures are reported with the status code the endpoint would use"""
+        with client.websocket_connect("/ws/session") as websocket:
+            websocket.send_json({"id": "a", "type": "integral", "function_string": "", "start_x": 0, "end_x": 1})
+            reply = websocket.receive_json()
+            assert reply["status"] == "error"
+            assert reply["status_code"] == 400
+
+            websocket.send_json({"id": "b", "type": "integral", "start_x": 0})
+            reply = websocket.receive_json()
+            assert reply["id"] == "b"
+            assert reply["status_code"] == 422
+
+            websocket.send_text("not json")
+            assert websocket.receive_json()["status_code"] == 400
+
+    def test_unusable_ids_are_rejected(self):
+        """Test that an id that isn't an integer or string gets a 422 and the session carries on"""
+        with client.websocket_connect("/ws/session") as websocket:
+            websocket.send_json({"id": 1.5, "type": "integral", "function_string": "x", "start_x": 0, "end_x": 1})
+            reply = websocket.receive_json()
+            assert reply["id"] is None
+            assert reply["status_code"] == 422
+
+            websocket.send_json({"id": [1], "type": "integral", "start_x": 0})
+            assert websocket.receive_json()["status_code"] == 422
+
+            websocket.send_json({"id": 3, "type": "integral", "function_string": "x", "start_x": 0, "end_x": 1})
+            assert websocket.receive_json()["status"] == "ok"
+
+    def test_unexpected_errors_are_answered(self, monkeypatch):
+        """Test that a calculation failing outside the endpoints' error handling still gets a reply"""
+        async def broken(endpoint, request):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr("sessions.cached_calculation", broken)
+        with client.websocket_connect("/ws/session") as websocket:
+            websocket.send_json({"id": 7, "type": "integral", "function_string": "x", "start_x": 0, "end_x": 1})
+            reply = websocket.receive_json()
+        assert reply["id"] == 7
+        assert reply["status"] == "error"
+        assert reply["status_code"] == 500
+
+    def test_new_message_supersedes_previous(self, monkeypatch):
+        """Test that a newer message on the same channel cancels the one in flight"""
+        monkeypatch.setitem(calculations.COMPUTATIONS, "limit", slow_limit)
+        started = time.perf_counter()
+        with client.websocket_connect("/ws/session") as websocket:
+            websocket.send_json({"id": 1, "type": "limit", "function_string": "x", "approach_value": 0})
+            websocket.send_json({"id": 2, "type": "integral", "channel": "limit",
+                                 "function_string": "x", "start_x": 0, "end_x": 2})
+            first, second = websocket.receive_json(), websocket.receive_json()
+        assert first == {"id": 1, "type": None, "status": "cancelled", "result": None,
+                         "status_code": None, "detail": None}
+        assert second["id"] == 2
+        assert abs(second["result"]["area"] - 2) < 0.001
+        assert time.perf_counter() - started < 10
+
+    def test_channels_run_independently(self):
+        """Test that messages on different channels don't cancel each other"""
+        with client.websocket_connect("/ws/session") as websocket:
+            websocket.send_json({"id": 1, "type": "integral", "function_string": "x", "start_x": 0, "end_x": 1})
+            websocket.send_json({"id": 2, "type": "limit", "function_string": "sin(x)/x", "approach_value": 0})
+            replies = {reply["id"]: reply for reply in (websocket.receive_json(), websocket.receive_json())}
+        assert replies[1]["status"] == replies[2]["status"] == "ok"
+
+    def test_results_are_cached(self):
+        """Test that session jobs use the response cache, shared with the HTTP endpoints"""
+        response_cache.clear()
+        hits_before = response_cache.stats()["hits"]
+        job = {"type": "integral", "function_string": "x^2 + 3x", "start_x": 0, "end_x": 1}
+        with client.websocket_connect("/ws/session") as websocket:
+            for message_id in (1, 2):
+                websocket.send_json(dict(job, id=message_id))
+                reply = websocket.receive_json()
+                assert reply["status"] == "ok"
+                assert abs(reply["result"]["area"] - 11/6) < 0.001
+        response = client.post("/calculate-integral", json=dict(job, function_string="3x + x^2"))
+        assert response.json() == reply["result"]
+        assert response_cache.stats()["hits"] - hits_before == 2
+
+    def test_identical_requests_are_coalesced(self, monkeypatch):
+        """Test that identical session jobs in flight at once share one calculation"""
+        real_run_calculation = dispatch.run_calculation
+        calls = []
+
+        async def slow_run_calculation(endpoint, request, profile=False, cost=None):
+            calls.append(request.function_string)
+            await asyncio.sleep(0.2)
+            return await real_run_calculation(endpoint, request, profile, cost)
+
+        monkeypatch.setattr(dispatch, "run_calculation", slow_run_calculation)
+        response_cache.clear()
+        coalesced_before = single_flight.coalesced
+        with client.websocket_connect("/ws/session") as websocket:
+            for message_id, function_string in ((1, "x^3 - x"), (2, "-x + x^3")):
+                websocket.send_json({"id": message_id, "channel": str(message_id), "type": "integral",
+                                     "function_string": function_string, "start_x": 0, "end_x": 2})
+            replies = [websocket.receive_json(), websocket.receive_json()]
+        assert [reply["status"] for reply in replies] == ["ok", "ok"]
+        assert replies[0]["result"] == replies[1]["result"]
+        assert len(calls) == 1
+        assert single_flight.coalesced - coalesced_before == 1
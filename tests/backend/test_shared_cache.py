@@ -0,0 +1,124 @@
+import pytest
+import sys
+import os
+import multiprocessing
+import sqlite3
+import time
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import shared_cache
+from shared_cache import SQLiteCache
+from response_cache import ResponseCache
+
+
+def write_entry(path, key, value):
+    SQLiteCache(path).put(key, value)
+
+
+class TestSQLiteCache:
+    """Test the SQLite store shared between server processes"""
+
+    def test_round_trip(self, tmp_path):
+        """Test that a stored value is returned with the time it has left"""
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+        cache.put("a", b"body", ttl=60)
+        value, remaining = cache.get("a")
+        assert value == b"body"
+        assert 59 < remaining <= 60
+        assert cache.get("b") is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_expired_entries_miss(self, tmp_path):
+        """Test that an entry past its expiry is not returned"""
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+        cache.put("a", b"body", ttl=0.01)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+
+    def test_entries_without_ttl_never_expire(self, tmp_path):
+        """Test that a value stored without a TTL has no expiry"""
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+        cache.put("a", b"body")
+        assert cache.get("a") == (b"body", None)
+
+    def test_size_cap(self, tmp_path, monkeypatch):
+        """Test that the oldest entries are pruned beyond maxsize"""
+        monkeypatch.setattr(shared_cache, "PRUNE_INTERVAL", 1)
+        cache = SQLiteCache(str(tmp_path / "cache.sqlite3"), maxsize=3)
+        for i in range(5):
+            cache.put(f"k{i}", b"x")
+        assert cache.stats()["size"] == 3
+        assert cache.get("k0") is None
+        assert cache.get("k4") is not None
+
+    def test_wal_mode(self, tmp_path):
+        """Test that the file is in WAL mode so readers don't block on writers"""
+        path = str(tmp_path / "cache.sqlite3")
+        SQLiteCache(path).put("a", b"x")
+        assert sqlite3.connect(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_shared_across_processes(self, tmp_path):
+        """Test that an entry written by another process is visible"""
+        path = str(tmp_path / "cache.sqlite3")
+        cache = SQLiteCache(path)
+        assert cache.get("a") is None
+        process = multiprocessing.get_context("spawn").Process(target=write_entry, args=(path, "a", b"from child"))
+        process.start()
+        process.join(30)
+        assert cache.get("a") == (b"from child", None)
+
+    def test_locked_cache_misses_quickly(self, tmp_path):
+        """Test that a write lock held elsewhere costs a short busy timeout, not a stall"""
+        path = str(tmp_path / "cache.sqlite3")
+        cache = SQLiteCache(path, busy_timeout=0.005)
+        cache.put("a", b"x")
+        writer = sqlite3.connect(path, isolation_level=None)
+        writer.execute("BEGIN IMMEDIATE")
+        try:
+            started = time.perf_counter()
+            cache.put("b", b"y")
+            assert time.perf_counter() - started < 1
+            assert cache.stats()["errors"] == 1
+            # WAL readers don't wait for the writer
+            assert cache.get("a") == (b"x", None)
+        finally:
+            writer.execute("ROLLBACK")
+            writer.close()
+
+    def test_errors_count_as_misses(self, tmp_path):
+        """Test that an unusable database file never raises"""
+        path = tmp_path / "cache.sqlite3"
+        path.write_bytes(b"this is not a database" * 100)
+        cache = SQLiteCache(str(path))
+        cache.put("a", b"x")
+        assert cache.get("a") is None
+        assert cache.stats()["errors"] >= 2
+
+
+class TestSharedResponseCache:
+    """Test the response cache backed by a shared SQLite file"""
+
+    def test_second_process_hits(self, tmp_path):
+        """Test that a response cached by one server process is served by another with the same ETag"""
+        path = str(tmp_path / "responses.sqlite3")
+        first = ResponseCache(maxsize=4, shared=SQLiteCache(path))
+        second = ResponseCache(maxsize=4, shared=SQLiteCache(path))
+        entry = first.create(b'{"area": 2.0}')
+        first.put("key", entry)
+
+        found = second.get("key")
+        assert found.body == entry.body
+        assert found.etag == entry.etag
+        assert second.stats()["shared_hits"] == 1
+        # Now kept in memory as well
+        assert second.get("key") is found
+        assert second.stats()["shared_hits"] == 1
+
+    def test_miss_everywhere(self, tmp_path):
+        """Test that a key in neither cache is a miss"""
+        cache = ResponseCache(maxsize=4, shared=SQLiteCache(str(tmp_path / "responses.sqlite3")))
+        assert cache.get("key") is None
+        assert cache.stats()["misses"] == 1
@@ -0,0 +1,169 @@
+import pytest
+import sys
+import os
+import asyncio
+
+import httpx
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import dispatch
+import main
+from single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent calls with the same key"""
+
+    def test_concurrent_calls_share_one_computation(self):
+        """Test that callers with the same key wait for one computation"""
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def scenario():
+            return await asyncio.gather(*(flight.run("key", compute) for _ in range(5)))
+
+        assert asyncio.run(scenario()) == ["result"] * 5
+        assert len(calls) == 1
+        assert flight.stats() == {"in_flight": 0, "started": 1, "coalesced": 4}
+
+    def test_different_keys_run_separately(self):
+        """Test that only identical keys are coalesced"""
+        flight = SingleFlight()
+
+        async def compute(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        async def scenario():
+            return await asyncio.gather(flight.run("a", lambda: compute(1)), flight.run("b", lambda: compute(2)))
+
+        assert asyncio.run(scenario()) == [1, 2]
+        assert flight.stats()["coalesced"] == 0
+
+    def test_exceptions_are_shared(self):
+        """Test that every waiting caller gets the computation's exception"""
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            raise ValueError("bad input")
+
+        async def scenario():
+            return await asyncio.gather(*(flight.run("key", compute) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        assert all(isinstance(result, ValueError) for result in results)
+
+    def test_finished_key_runs_again(self):
+        """Test that a key is computed afresh once its computation has finished"""
+        flight = SingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            return len(calls)
+
+        async def scenario():
+            return [await flight.run("key", compute), await flight.run("key", compute)]
+
+        assert asyncio.run(scenario()) == [1, 2]
+
+    def test_cancelled_caller_does_not_cancel_others(self):
+        """Test that the computation continues when the caller that started it goes away"""
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "result"
+
+        async def scenario():
+            first = asyncio.ensure_future(flight.run("key", compute))
+            second = asyncio.ensure_future(flight.run("key", compute))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+
+        assert asyncio.run(scenario()) == "result"
+
+    def test_abandoned_computation_is_cancelled(self):
+        """Test that the computation is cancelled once every caller has gone away"""
+        flight = SingleFlight()
+
+        async def compute():
+            await asyncio.sleep(10)
+
+        async def scenario():
+            callers = [asyncio.ensure_future(flight.run("key", compute)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            task = flight._flights["key"]
+            for caller in callers:
+                caller.cancel()
+            await asyncio.sleep(0.01)
+            return task.cancelled(), flight.stats()["in_flight"]
+
+        assert asyncio.run(scenario()) == (True, 0)
+
+
+class TestEndpointCoalescing:
+    """Test that identical concurrent requests to an endpoint are calculated once"""
+
+    def test_identical_requests_share_a_calculation(self, monkeypatch):
+        """Test that concurrent equivalent requests run one calculation and get the same response"""
+        real_run_calculation = dispatch.run_calculation
+        calls = []
+
+        async def slow_run_calculation(endpoint, request, profile=False, cost=None):
+            calls.append(request.function_string)
+            await asyncio.sleep(0.2)
+            return await real_run_calculation(endpoint, request, profile, cost)
+
+        monkeypatch.setattr(dispatch, "run_calculation", slow_run_calculation)
+        main.response_cache.clear()
+        coalesced_before = main.single_flight.coalesced
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                # Spelled differently, but the same function once canonicalized
+                bodies = [{"function_string": text, "start_x": -3, "end_x": 3, "method": "hybrid"}
+                          for text in ("x^3 - 3x", "x**3 - 3*x", "-3x + x^3")]
+                return await asyncio.gather(*(client.post("/find-critical-points", json=body) for body in bodies))
+
+        responses = asyncio.run(scenario())
+        assert [response.status_code for response in responses] == [200, 200, 200]
+        assert len(calls) == 1
+        assert len({response.content for response in responses}) == 1
+        assert main.single_flight.coalesced - coalesced_before == 2
+        rendered = main.registry.render()
+        assert 'area_requests_coalesced_total{endpoint="critical_points"} 2' in rendered
+
+    def test_api_process_does_not_parse(self, monkeypatch):
+        """Test that canonical keys come from the workers, and a known string skips its assessment"""
+        import expression_cache
+
+        def no_parse(function_string):
+            raise AssertionError(f"parsed {function_string!r} in the API process")
+
+        monkeypatch.setattr(expression_cache, "parse_function", no_parse)
+        main.response_cache.clear()
+        body = {"function_string": "x^2 + 7x", "start_x": 0, "end_x": 1}
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = await client.post("/calculate-integral", json=body)
+                assessed = dispatch.expression_keys.get("x^2 + 7x")
+                second = await client.post("/calculate-integral", json=body)
+                return first, assessed, second
+
+        first, assessed, second = asyncio.run(scenario())
+        assert first.status_code == 200
+        assert assessed == first.json()["canonical_key"]
+        assert second.headers["ETag"] == first.headers["ETag"]
@@ -0,0 +1,100 @@
+import pytest
+import sys
+import os
+import subprocess
+import time
+from fastapi.testclient import TestClient
+
+# Add the backend directory to Python path
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from executor import compute_executor
+from startup import WARMUP_REQUESTS, startup_state, warm_up
+from main import app
+
+
+class TestLazyImports:
+    """Test that importing the app leaves the heavy libraries for later"""
+
+    def test_app_import_skips_heavy_modules(self):
+        """Test that SymPy, SciPy, NumPy and the calculations aren't imported with the app"""
+        code = ("import sys, main; "
+                "print(','.join(m for m in ('sympy', 'scipy', 'numpy', 'calculations') if m in sys.modules))")
+        result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                timeout=60)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == ""
+
+    def test_requests_skip_heavy_modules(self):
+        """Test that serving calculations and stats leaves SymPy, SciPy and NumPy to the workers"""
+        code = ("import sys, main; from fastapi.testclient import TestClient; client = TestClient(main.app); "
+                "assert client.post('/calculate-integral', json={'function_string': 'x^2', 'start_x': 0, "
+                "'end_x': 1}).status_code == 200; "
+                "assert client.post('/batch', json={'jobs': [{'type': 'derivative', 'function_string': 'x^3'}]})"
+                ".status_code == 200; "
+                "assert client.get('/metrics').status_code == 200; "
+                "assert client.get('/stats').status_code == 200; "
+                "print(','.join(m for m in ('sympy', 'scipy', 'numpy', 'calculations', 'cost', 'expression_cache', "
+                "'symbolic_store') if m in sys.modules))")
+        env = dict(os.environ, AREA_WARMUP="0", AREA_SYMBOLIC_CACHE="")
+        result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                timeout=60, env=env)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == ""
+
+    def test_import_time_recorded(self):
+        """Test that the app's import time is recorded"""
+        assert startup_state.import_seconds > 0
+
+
+class TestWarmUp:
+    """Test the warm-up phase"""
+
+    def test_warm_up_runs_every_endpoint(self):
+        """Test that warm-up times the imports and one request per endpoint"""
+        timings = warm_up()
+        assert list(timings) == ["import"] + [endpoint for endpoint, _ in WARMUP_REQUESTS]
+        assert all(seconds >= 0 for seconds in timings.values())
+
+    def test_only_workers_warm_up(self):
+        """Test that the API process becomes ready without loading SymPy, SciPy or NumPy itself"""
+        code = ("import sys, time, main; from fastapi.testclient import TestClient\n"
+                "with TestClient(main.app) as client:\n"
+                "    deadline = time.monotonic() + 60\n"
+                "    while client.get('/ready').status_code == 503 and time.monotonic() < deadline:\n"
+                "        time.sleep(0.05)\n"
+                "    data = client.get('/ready').json()\n"
+                "    assert data['ready'] and data['error'] is None, data\n"
+                "    assert 'limit' in data['warmup_seconds'], data\n"
+                "print(','.join(m for m in ('sympy', 'scipy', 'numpy', 'calculations') if m in sys.modules))")
+        env = dict(os.environ, AREA_WORKERS="1", AREA_SLOW_WORKERS="0", AREA_SYMBOLIC_CACHE="")
+        env.pop("AREA_WARMUP", None)
+        result = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True,
+                                timeout=90, env=env)
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == ""
+
+    def test_ready_after_warm_up(self, monkeypatch):
+        """Test that /ready turns 200 once the app and its workers have warmed up"""
+        monkeypatch.setattr(compute_executor, "max_workers", 2)
+        monkeypatch.setattr(compute_executor, "prestart", False)
+        monkeypatch.setattr(compute_executor, "initializers", [])
+        monkeypatch.setattr(startup_state, "ready_seconds", None)
+        compute_executor.shutdown()
+        try:
+            with TestClient(app) as client:
+                deadline = time.monotonic() + 60
+                while client.get("/ready").status_code == 503 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                response = client.get("/ready")
+                assert response.status_code == 200
+                data = response.json()
+                assert data["ready"] is True
+                assert data["error"] is None
+                assert set(data["warmup_seconds"]) == {"import", "integral", "derivative", "critical_points", "limit"}
+                assert data["ready_seconds"] >= data["import_seconds"]
+                assert client.get("/stats").json()["executor"]["workers_started"] == 2
+                assert "area_ready 1" in client.get("/metrics").text
+        finally:
+            compute_executor.shutdown()
@@ -0,0 +1,135 @@
+import pytest
+import sys
+import os
+import sqlite3
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'backend'))
+
+import calculations
+import expression_cache
+import integration
+import symbolic_store
+from sympy import Symbol, cos, sin
+from cache_stats import combine_store_stats
+from expression_cache import ExpressionCache
+from models import CriticalPointsRequest, LimitRequest
+from symbolic_store import MISSING, SymbolicStore
+
+x = Symbol('x')
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A store in a temporary file, used by every calculation module."""
+    store = SymbolicStore(str(tmp_path / "cache" / "symbolic.sqlite3"))
+    for module in (calculations, expression_cache, integration):
+        monkeypatch.setattr(module, "symbolic_store", store)
+    expression_cache.expression_cache.clear()
+    yield store
+    expression_cache.expression_cache.clear()
+
+
+def fail(*args, **kwargs):
+    raise AssertionError("should have come from the store")
+
+
+class TestSymbolicStore:
+    """Test the on-disk store of symbolic results"""
+
+    def test_round_trip(self, tmp_path):
+        """Test that a stored SymPy result is read back equal, including None"""
+        store = SymbolicStore(str(tmp_path / "symbolic.sqlite3"))
+        store.put("derivative", ("sin(x)", 1), cos(x))
+        store.put("antiderivative", ("exp(x**2)",), None)
+        assert store.get("derivative", ("sin(x)", 1)) == cos(x)
+        assert store.get("antiderivative", ("exp(x**2)",)) is None
+        assert store.get("derivative", ("sin(x)", 2)) is MISSING
+
+    def test_survives_reopening(self, tmp_path):
+        """Test that a new store on the same file, as after a restart, finds earlier results"""
+        path = str(tmp_path / "symbolic.sqlite3")
+        SymbolicStore(path).put("solve", ("x**2 - 1",), [-1, 1])
+        assert SymbolicStore(path).get("solve", ("x**2 - 1",)) == [-1, 1]
+
+    def test_other_fingerprint_is_not_read(self, tmp_path, monkeypatch):
+        """Test that results written under other library versions are ignored"""
+        path = str(tmp_path / "symbolic.sqlite3")
+        SymbolicStore(path).put("derivative", ("sin(x)", 1), cos(x))
+        monkeypatch.setattr(symbolic_store, "FINGERPRINT", "0" * 12)
+        assert SymbolicStore(path).get("derivative", ("sin(x)", 1)) is MISSING
+
+    def test_corrupt_entry_is_a_miss(self, tmp_path):
+        """Test that an entry that doesn't unpickle is treated as absent"""
+        path = str(tmp_path / "symbolic.sqlite3")
+        store = SymbolicStore(path)
+        store.put("derivative", ("sin(x)", 1), cos(x))
+        with sqlite3.connect(path) as connection:
+            connection.execute("UPDATE entries SET value = ?", (b"not a pickle",))
+        assert store.get("derivative", ("sin(x)", 1)) is MISSING
+
+    def test_disabled_without_path(self):
+        """Test that a store without a path stores nothing and never fails"""
+        store = SymbolicStore("")
+        store.put("derivative", ("sin(x)", 1), cos(x))
+        assert store.get("derivative", ("sin(x)", 1)) is MISSING
+        assert store.stats()["path"] is None
+
+    def test_combine_stats(self):
+        """Test that per-worker stats are summed"""
+        combined = combine_store_stats([
+            {"path": "a", "hits": 3, "misses": 1, "errors": 0, "hit_ratio": 0.75},
+            {"path": "a", "hits": 1, "misses": 3, "errors": 1, "hit_ratio": 0.25},
+        ])
+        assert combined["hits"] == 4
+        assert combined["errors"] == 1
+        assert combined["hit_ratio"] == 0.5
+        assert combined["workers"] == 2
+
+
+class TestStoredCalculations:
+    """Test that calculations store their symbolic results and reuse them"""
+
+    def test_derivative(self, store, monkeypatch):
+        """Test that derivatives are stored and reused by a fresh process cache"""
+        parsed = ExpressionCache().get("sin(x)")
+        assert parsed.derivative(2) == -sin(x)
+        assert store.get("derivative", (parsed.canonical_key, 1)) == cos(x)
+
+        monkeypatch.setattr(expression_cache, "diff", fail)
+        assert ExpressionCache().get("sin(x)").derivative(2) == -sin(x)
+
+    def test_solve(self, store, monkeypatch):
+        """Test that solve() solutions are stored and reused"""
+        request = CriticalPointsRequest(function_string="x^3 - 3x", start_x=-3, end_x=3, method="symbolic")
+        first = calculations.compute_critical_points(request)
+        assert store.get("solve", (first.canonical_key,)) == [-1, 1]
+
+        expression_cache.expression_cache.clear()
+        monkeypatch.setattr(calculations, "solve", fail)
+        assert calculations.compute_critical_points(request).critical_points == first.critical_points
+
+    def test_limit(self, store, monkeypatch):
+        """Test that limit() results are stored by point and direction and reused"""
+        request = LimitRequest(function_string="x*sin(1/x)", approach_value=0)
+        first = calculations.compute_limit(request)
+        assert first.tier == "symbolic"
+        assert store.get("limit", (first.canonical_key, 0.0, None)) == 0
+        assert store.get("limit", (first.canonical_key, 0.0, "+")) is MISSING
+
+        expression_cache.expression_cache.clear()
+        monkeypatch.setattr(calculations, "limit", fail)
+        assert calculations.compute_limit(request).limit_value == first.limit_value
+
+    def test_antiderivative(self, store, monkeypatch):
+        """Test that closed forms and their absence are both stored and reused"""
+        closed = ExpressionCache().get("x*exp(x)")
+        none = ExpressionCache().get("exp(sin(x))")
+        assert integration.antiderivative(closed) is not None
+        assert integration.antiderivative(none) is None
+        assert store.get("antiderivative", (closed.canonical_key,)) is not None
+        assert store.get("antiderivative", (none.canonical_key,)) is None
+
+        monkeypatch.setattr(integration, "symbolic_integrate", fail)
+        assert integration.antiderivative(ExpressionCache().get("x*exp(x)")) is not None
+        assert integration.antiderivative(ExpressionCache().get("exp(sin(x))")) is None